@@ -4,14 +4,32 @@ AI module using Google Gemini API
 
 import os
 import json
-import google.generativeai as genai
 from typing import Dict, Any
 from sqlalchemy.orm import Session
-from crud import get_marks_by_student, get_attendance_by_student
+import rollups
+
+# A subject with any mark below this is weak (also used by the at-risk scores, risk.py)
+WEAK_MARK = 70
 
 
 # ---------------- CONFIGURE GEMINI ---------------- #
 
+# google.generativeai costs about a second of import time, so it is only
+# imported when the first report is generated, not when the app starts
+_genai = None
+
+
+def load_genai():
+    """Import the Gemini SDK on first use"""
+    global _genai
+
+    if _genai is None:
+        import google.generativeai
+        _genai = google.generativeai
+
+    return _genai
+
+
 def configure_gemini():
     """Configure Gemini API with environment variable"""
 
@@ -20,7 +38,9 @@ def configure_gemini():
     if not api_key:
         raise ValueError("GEMINI_API_KEY environment variable not set")
 
+    genai = load_genai()
     genai.configure(api_key=api_key)
+    return genai
 
 
 # ---------------- MAIN AI FUNCTION ---------------- #
@@ -28,12 +48,12 @@ def configure_gemini():
 def generate_student_report(student_id: int, db: Session) -> Dict[str, Any]:
     """Generate AI report for a student"""
 
-    # Fetch data safely
-    marks = get_marks_by_student(db, student_id) or []
-    attendance = get_attendance_by_student(db, student_id) or []
+    # Fetch pre-aggregated data (cost doesn't grow with history)
+    subjects = rollups.subject_summary(db, student_id)
+    attendance = rollups.attendance_totals(db, student_id)
 
     # If no marks → return early
-    if len(marks) == 0:
+    if len(subjects) == 0:
         return {
             "weak_subjects": [],
             "tips": ["No marks data available for analysis"],
@@ -45,43 +65,39 @@ def generate_student_report(student_id: int, db: Session) -> Dict[str, Any]:
 
     # ---------------- CALCULATIONS ---------------- #
 
-    # Total + Average marks (safe)
-    total_marks = sum(
-        m.marks for m in marks if m.marks is not None
-    )
+    # Total + Average marks over every entry
+    total_marks = sum(s["average"] * s["count"] for s in subjects)
+    total_entries = sum(s["count"] for s in subjects)
 
     average_marks = (
-        total_marks / len(marks)
-        if len(marks) > 0 else 0
+        total_marks / total_entries
+        if total_entries > 0 else 0
     )
 
     # Attendance stats
-    total_days = len(attendance)
-
-    present_days = len([
-        a for a in attendance
-        if a.status and a.status.lower() == "present"
-    ])
+    present_days = attendance["present"]
+    total_days = attendance["total"]
 
     attendance_percentage = (
         (present_days / total_days) * 100
         if total_days > 0 else 0
     )
 
-    # Weak subjects
+    # Weak subjects (any mark below 70)
     weak_subjects = [
-        m.subject
-        for m in marks
-        if m.marks is not None and m.marks < 70
+        s["subject"]
+        for s in subjects
+        if s["min"] < WEAK_MARK
     ]
 
     # Prepare marks data for AI
     marks_data = [
         {
-            "subject": m.subject,
-            "marks": m.marks
+            "subject": s["subject"],
+            "average_marks": round(s["average"], 2),
+            "entries": s["count"]
         }
-        for m in marks
+        for s in subjects
     ]
 
 
@@ -90,7 +106,7 @@ def generate_student_report(student_id: int, db: Session) -> Dict[str, Any]:
     try:
 
         # Setup Gemini
-        configure_gemini()
+        genai = configure_gemini()
 
         model = genai.GenerativeModel("gemini-pro")
 
@@ -144,7 +160,7 @@ weak_subjects, tips, study_plan, summary
     except Exception:
 
         return generate_fallback_report(
-            marks,
+            marks_data,
             weak_subjects,
             average_marks,
             attendance_percentage
@@ -0,0 +1,199 @@
+"""
+Bitmap attendance index
+
+Attendance is one bit per student per school day. For every student and term
+(academic year, see partitions.py) we keep two bitmaps: days on which attendance
+was recorded and days on which the student was present. Counts, percentages and
+streaks are then popcounts and shifts over Python ints instead of row scans.
+
+The index is updated in the same transaction as every attendance insert.
+Rebuild it from the attendance tables with:
+
+    python attendance_index.py rebuild
+"""
+import sys
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Attendance, AttendanceBitmap
+from partitions import academic_year, academic_year_bounds, archived_years, partition_table
+
+# Bitmaps are stored little-endian, one byte per 8 days (a term is at most 366 days)
+TERM_BYTES = 46
+
+
+# ---------------- BIT HELPERS ---------------- #
+
+def to_bits(blob: bytes) -> int:
+    return int.from_bytes(blob, "little")
+
+
+def to_blob(bits: int) -> bytes:
+    return bits.to_bytes(TERM_BYTES, "little")
+
+
+def day_offset(day: date) -> Tuple[int, int]:
+    """(term, bit index) of a date"""
+    term = academic_year(day)
+    return term, (day - academic_year_bounds(term)[0]).days
+
+
+def range_mask(term: int, start: Optional[date], end: Optional[date]) -> int:
+    """Bits of `term` falling inside [start, end] (either side open when None)"""
+    term_start, term_end = academic_year_bounds(term)
+    first = max(start, term_start) if start else term_start
+    last = min(end, term_end - timedelta(days=1)) if end else term_end - timedelta(days=1)
+
+    if first > last:
+        return 0
+
+    low = (first - term_start).days
+    high = (last - term_start).days + 1
+    return ((1 << high) - 1) ^ ((1 << low) - 1)
+
+
+# ---------------- WRITES ---------------- #
+
+def record_day(db: Session, student_id: int, day: date, status: str):
+    """Set a day's bits for a student (caller commits)
+
+    Call this after the attendance row has been flushed: the INSERT holds
+    SQLite's write lock, so this read-modify-write cannot race another writer.
+    """
+    term, bit = day_offset(day)
+    row = db.get(AttendanceBitmap, (student_id, term))
+
+    if row is None:
+        row = AttendanceBitmap(student_id=student_id, term=term, recorded=to_blob(0), present=to_blob(0))
+        db.add(row)
+
+    row.recorded = to_blob(to_bits(row.recorded) | (1 << bit))
+
+    # Last write for a day wins, like re-taking roll call
+    if status and status.lower() == "present":
+        row.present = to_blob(to_bits(row.present) | (1 << bit))
+    else:
+        row.present = to_blob(to_bits(row.present) & ~(1 << bit))
+
+
+def delete_bitmaps(db: Session, student_ids):
+    """Drop the index for the given student ids (or id subquery)"""
+    return db.query(AttendanceBitmap).filter(
+        AttendanceBitmap.student_id.in_(student_ids)
+    ).delete(synchronize_session=False)
+
+
+def rebuild(db: Session, student_id: Optional[int] = None) -> int:
+    """Recompute bitmaps from the attendance tables (all students when None)"""
+    bitmaps: Dict[Tuple[int, int], list] = {}
+    tables = [partition_table(year) for year in archived_years(db)] + [Attendance.__table__]
+
+    for table in tables:
+        query = select(table.c.student_id, table.c.date, table.c.status).order_by(table.c.id)
+        if student_id is not None:
+            query = query.where(table.c.student_id == student_id)
+
+        for sid, day, status in db.execute(query):
+            term, bit = day_offset(day)
+            bits = bitmaps.setdefault((sid, term), [0, 0])
+            bits[0] |= 1 << bit
+            if status and status.lower() == "present":
+                bits[1] |= 1 << bit
+            else:
+                bits[1] &= ~(1 << bit)
+
+    if student_id is None:
+        db.query(AttendanceBitmap).delete(synchronize_session=False)
+    else:
+        delete_bitmaps(db, [student_id])
+
+    db.bulk_insert_mappings(AttendanceBitmap, [
+        {"student_id": sid, "term": term, "recorded": to_blob(recorded), "present": to_blob(present)}
+        for (sid, term), (recorded, present) in bitmaps.items()
+    ])
+    db.commit()
+
+    return len(bitmaps)
+
+
+# ---------------- QUERIES ---------------- #
+
+def load(db: Session, student_id: int, term: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+    """{term: (recorded_bits, present_bits)} for a student"""
+    query = select(AttendanceBitmap.term, AttendanceBitmap.recorded, AttendanceBitmap.present).where(
+        AttendanceBitmap.student_id == student_id
+    )
+    if term is not None:
+        query = query.where(AttendanceBitmap.term == term)
+
+    return {t: (to_bits(recorded), to_bits(present)) for t, recorded, present in db.execute(query)}
+
+
+def attendance_counts(
+    db: Session,
+    student_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Tuple[int, int]:
+    """(present_days, recorded_days), optionally limited to a date range"""
+    present_days = total_days = 0
+
+    for term, (recorded, present) in load(db, student_id).items():
+        if start or end:
+            mask = range_mask(term, start, end)
+            recorded &= mask
+            present &= mask
+
+        total_days += recorded.bit_count()
+        present_days += (present & recorded).bit_count()
+
+    return present_days, total_days
+
+
+def attendance_percentage(
+    db: Session,
+    student_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> float:
+    """Percentage of recorded days the student was present"""
+    present_days, total_days = attendance_counts(db, student_id, start, end)
+    return (present_days / total_days) * 100 if total_days > 0 else 0
+
+
+def streaks(db: Session, student_id: int, term: Optional[int] = None) -> Dict[str, int]:
+    """Current and longest runs of present days (days without roll call don't break a run)"""
+    current = longest = 0
+
+    for _, (recorded, present) in sorted(load(db, student_id, term).items()):
+        absent = recorded & ~present
+
+        # Every absence closes a run: its length is the recorded days below it
+        while absent:
+            lowest = absent & -absent
+            longest = max(longest, current + (recorded & (lowest - 1)).bit_count())
+            current = 0
+            recorded &= ~((lowest << 1) - 1)
+            absent ^= lowest
+
+        current += recorded.bit_count()
+        longest = max(longest, current)
+
+    return {"current": current, "longest": longest}
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python attendance_index.py rebuild")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild(db)} attendance bitmaps")
+    finally:
+        db.close()
@@ -6,20 +6,21 @@ from typing import Dict, Optional
 from datetime import datetime, timedelta
 from typing import Optional
 from models import User
-from database import SessionLocal
+from database import DEFAULT_TENANT
 # In-memory token storage
 tokens: Dict[str, dict] = {}
 
 class TokenManager:
     @staticmethod
-    def create_token(user_id: int, user_role: str) -> str:
-        """Create a new UUID token and store it in memory"""
+    def create_token(user_id: int, user_role: str, tenant: str = DEFAULT_TENANT) -> str:
+        """Create a new UUID token and store it in memory (tenant: the user's school)"""
         token = str(uuid.uuid4())
         
         # Store token with user info and expiration (24 hours)
         tokens[token] = {
             "user_id": user_id,
             "role": user_role,
+            "tenant": tenant,
             "created_at": datetime.now(),
             "expires_at": datetime.now() + timedelta(hours=24)
         }
@@ -78,6 +79,12 @@ class TokenManager:
         token_data = TokenManager.validate_token(token)
         return token_data["role"] if token_data else None
     
+    @staticmethod
+    def get_tenant(token: Optional[str]) -> str:
+        """School of the token's user (default school for missing tokens; validation happens later)"""
+        token_data = tokens.get(token) if token else None
+        return token_data["tenant"] if token_data else DEFAULT_TENANT
+    
     @staticmethod
     def list_tokens():
         """List all active tokens (for debugging)"""
@@ -104,7 +111,8 @@ def get_user_by_token(token: str) -> Optional[User]:
 
     user_id = token_data["user_id"]
 
-    db = SessionLocal()
+    import tenants
+    db = tenants.get(token_data["tenant"]).session_factory()
 
     try:
         return db.query(User).filter(User.id == user_id).first()
@@ -0,0 +1,278 @@
+"""
+Online backups through SQLite's backup API
+
+Copying database.db with cp while the app writes can produce a torn file.
+A backup here copies the live database page by page, from its own
+connection, into
+
+    <BACKUP_DIR>/<school>/<school>-<YYYYmmdd-HHMMSS-micros>.db
+
+How it copies depends on the database's journal mode:
+
+    WAL               one step: the copy reads a snapshot and writers keep
+                      committing to the WAL meanwhile
+    rollback journal  (SQLite's default) readers block commits, so each step
+                      copies BACKUP_PAGES pages under a shared lock, then
+                      sleeps BACKUP_SLEEP with no lock held; writers waiting
+                      to commit get in between steps instead of behind the
+                      whole copy
+
+SQLite restarts a stepped backup when another connection writes between its
+steps; after each restart the steps grow GROWTH times, and the last attempt
+copies everything in one step, so a busy database still gets its backup
+(with longer lock holds). Under steady writes that costs restarts, and
+benchmarks/backup_impact.py shows WAL doing better on both read and write
+p99: switch a database with `PRAGMA journal_mode = WAL` (it persists).
+
+The copy is written to a .partial file, checked with PRAGMA quick_check and
+only then renamed into place. The newest BACKUP_KEEP backups per school are
+kept. With BACKUP_INTERVAL_HOURS > 0 the app backs up every school on that
+interval (run it on one worker, or use cron with `python backups.py run`).
+
+    python backups.py run [school]
+    python backups.py list [school]
+    python backups.py prune [school]
+    python backups.py restore <backup file> [school]
+
+Restore copies the backup over the school's database in one transaction,
+after backing up the current state. Stop the app first: its caches and
+tokens would otherwise describe the replaced data.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import tenants
+from database import BACKUP_DIR, BACKUP_INTERVAL_HOURS, BACKUP_KEEP, DEFAULT_TENANT, engine
+
+BACKUP_PAGES = 256  # pages per step (1 MB with 4 KB pages)
+BACKUP_SLEEP = 0.01  # seconds between steps, no lock held
+GROWTH = 4  # step growth after a restart
+MAX_ATTEMPTS = 5  # the last attempt copies in one step
+BUSY_TIMEOUT = 30  # seconds a step waits for a writer's lock
+MAX_HISTORY = 50
+
+_history_lock = threading.Lock()
+_history: "deque[Dict[str, Any]]" = deque(maxlen=MAX_HISTORY)
+
+
+class _Restarted(Exception):
+    """A write from another connection restarted the copy"""
+
+
+def source_path(school: str = DEFAULT_TENANT) -> str:
+    if school == DEFAULT_TENANT:
+        return engine.url.database
+    return tenants.database_path(school)
+
+
+def school_dir(school: str = DEFAULT_TENANT, directory: str = BACKUP_DIR) -> str:
+    return os.path.join(directory, school)
+
+
+def _quick_check(path: str) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+
+
+# ---------------- BACKUP ---------------- #
+
+def _copy(source: sqlite3.Connection, target_path: str, pages: int, sleep: float, counts: Dict[str, int]):
+    """One attempt (steps are added to counts); raises _Restarted"""
+    last = {"remaining": None}
+
+    def after_step(status, remaining, total):
+        counts["steps"] += 1
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            raise _Restarted()
+        last["remaining"] = remaining
+        # sqlite3 only sleeps between steps when the source is busy
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, progress=after_step)
+    finally:
+        target.close()
+
+
+def run(
+    school: str = DEFAULT_TENANT,
+    directory: str = BACKUP_DIR,
+    pages: Optional[int] = None,
+    sleep: float = BACKUP_SLEEP,
+    keep: Optional[int] = BACKUP_KEEP
+) -> Dict[str, Any]:
+    """Back up a school's database; returns the file and how the copy went (pages=None: by journal mode)"""
+    path = source_path(school)
+    if not os.path.exists(path):
+        raise tenants.UnknownTenant(school)
+
+    target_dir = school_dir(school, directory)
+    os.makedirs(target_dir, exist_ok=True)
+    final = os.path.join(target_dir, f"{school}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+    partial = final + ".partial"
+
+    start = time.perf_counter()
+    counts = {"steps": 0, "restarts": 0}
+    source = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+        if pages is None:
+            pages = -1 if journal_mode == "wal" else BACKUP_PAGES
+        for attempt in range(MAX_ATTEMPTS):
+            step_pages = pages * GROWTH ** attempt if pages > 0 and attempt < MAX_ATTEMPTS - 1 else -1
+            try:
+                _copy(source, partial, step_pages, sleep, counts)
+                break
+            except _Restarted:
+                counts["restarts"] += 1
+        page_count = source.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        source.close()
+
+    check = _quick_check(partial)
+    if check != "ok":
+        os.remove(partial)
+        raise RuntimeError(f"Backup of {school} failed its integrity check: {check}")
+    os.replace(partial, final)
+
+    result = {
+        "school": school,
+        "file": final,
+        "bytes": os.path.getsize(final),
+        "pages": page_count,
+        "journal_mode": journal_mode,
+        "steps": counts["steps"],
+        "restarts": counts["restarts"],
+        "seconds": time.perf_counter() - start,
+        "finished_at": datetime.now().isoformat(timespec="seconds")
+    }
+    with _history_lock:
+        _history.append(result)
+
+    removed = prune(school, keep, directory) if keep else []
+    print(f"💾 Backed up {school}: {result['bytes'] / 1e6:.1f} MB in {result['seconds']:.2f}s "
+          f"({counts['steps']} steps, {counts['restarts']} restarts, {len(removed)} old backups removed)")
+    return result
+
+
+# ---------------- RETENTION AND RESTORE ---------------- #
+
+def list_backups(school: str = DEFAULT_TENANT, directory: str = BACKUP_DIR) -> List[Dict[str, Any]]:
+    """Completed backups of a school, newest first"""
+    target_dir = school_dir(school, directory)
+    if not os.path.isdir(target_dir):
+        return []
+    names = sorted(
+        (name for name in os.listdir(target_dir) if name.startswith(f"{school}-") and name.endswith(".db")),
+        reverse=True
+    )
+    return [
+        {"file": os.path.join(target_dir, name), "bytes": os.path.getsize(os.path.join(target_dir, name))}
+        for name in names
+    ]
+
+
+def prune(school: str = DEFAULT_TENANT, keep: int = BACKUP_KEEP, directory: str = BACKUP_DIR) -> List[str]:
+    """Delete all but the newest `keep` backups of a school"""
+    removed = [backup["file"] for backup in list_backups(school, directory)[keep:]]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def restore(backup_file: str, school: str = DEFAULT_TENANT, directory: str = BACKUP_DIR) -> Dict[str, Any]:
+    """Replace a school's database with a backup; returns the backup of what it replaced"""
+    check = _quick_check(backup_file)
+    if check != "ok":
+        raise RuntimeError(f"{backup_file} failed its integrity check: {check}")
+
+    # No pruning here: it could delete the very backup being restored
+    previous = run(school, directory, keep=None)
+
+    source = sqlite3.connect(backup_file)
+    target = sqlite3.connect(source_path(school), timeout=BUSY_TIMEOUT)
+    try:
+        source.backup(target)  # one step: a single write transaction on the target
+    finally:
+        target.close()
+        source.close()
+    return previous
+
+
+def history(school: str = DEFAULT_TENANT) -> List[Dict[str, Any]]:
+    """Recent backup runs of a school in this process, newest first"""
+    with _history_lock:
+        return [result for result in reversed(_history) if result["school"] == school]
+
+
+# ---------------- SCHEDULE ---------------- #
+
+class BackupScheduler:
+    """Backs up every school every `interval_hours` from a background thread"""
+
+    def __init__(self, interval_hours: float = BACKUP_INTERVAL_HOURS):
+        self.interval_hours = interval_hours
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval_hours > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="backups", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_hours * 3600):
+            for school in tenants.registry.names():
+                try:
+                    run(school)
+                except Exception as e:
+                    print(f"❌ Backup of {school} failed: {e}")
+
+
+scheduler = BackupScheduler()
+
+
+def start():
+    scheduler.start()
+
+
+def stop():
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ("run", "list", "prune"):
+        school = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TENANT
+        if command == "run":
+            run(school)
+        elif command == "list":
+            for backup in list_backups(school):
+                print(f"{backup['file']}  {backup['bytes'] / 1e6:.1f} MB")
+        else:
+            print(f"Removed {len(prune(school))} old backups")
+    elif command == "restore" and len(sys.argv) > 2:
+        school = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_TENANT
+        previous = restore(sys.argv[2], school)
+        print(f"✅ Restored {school} from {sys.argv[2]} (previous state saved as {previous['file']})")
+    else:
+        print("Usage: python backups.py run|list|prune [school] | restore <backup file> [school]")
+        sys.exit(1)
@@ -0,0 +1,325 @@
+"""
+API benchmark suite: drive the endpoints in main.py at fixed concurrency
+
+    python benchmarks/api.py                                  # in-process, fresh seeded school
+    python benchmarks/api.py --db ../bench.db                 # in-process, a database seeded with seed.py
+    python benchmarks/api.py --url http://127.0.0.1:8000 --email teacher1@school.com
+    python benchmarks/api.py --save benchmarks/baselines/main.json
+    python benchmarks/api.py --compare benchmarks/baselines/main.json
+
+Each endpoint gets a short warm-up and then `--requests` requests from
+`--concurrency` concurrent clients. Reported per endpoint: latency
+percentiles, throughput, errors and SQL statements per request. In-process
+runs call the ASGI app through httpx's ASGI transport (the same middleware
+and threadpool as under uvicorn). Statements are read from the
+X-DB-Statements header (sql_metrics.py): in-process runs turn SQL_DEBUG on,
+and against a server they are null unless it runs with SQL_DEBUG=1.
+
+Not driven: /api/ai-report (calls Gemini), /api/events (an open stream),
+deletes and logout (destructive), /api/snapshot and the debug endpoints.
+In-process runs admit every request past the rate limiter (ratelimit.py), so
+/api/export measures the export and not its 429s; against a server it is
+limited as usual.
+
+--save writes the results as JSON; --compare prints the change against such
+a baseline and exits with status 1 when an endpoint's p50 or p99 regressed by
+more than --threshold percent.
+
+Needs httpx (the client behind FastAPI's TestClient).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+# (method, path, json body), built per request from the seeded ids
+Request = Tuple[str, str, Optional[dict]]
+
+
+# ---------------- SCENARIOS ---------------- #
+
+def scenarios(students: List[dict], rng: random.Random) -> Dict[str, Callable[[], Request]]:
+    """Every benchmarked endpoint, as a factory for one request"""
+    classes = sorted({student["class_name"] for student in students})
+    names = [student["name"] for student in students]
+
+    def student_id():
+        return rng.choice(students)["id"]
+
+    def class_name():
+        return rng.choice(classes)
+
+    def prefix():
+        return rng.choice(names)[:3]
+
+    return {
+        "GET /api/me": lambda: ("GET", "/api/me", None),
+        "GET /api/bootstrap": lambda: ("GET", "/api/bootstrap", None),
+        "GET /api/dashboard": lambda: ("GET", "/api/dashboard", None),
+        "GET /api/teachers": lambda: ("GET", "/api/teachers", None),
+        "GET /api/students": lambda: ("GET", "/api/students", None),
+        "GET /api/students?fast": lambda: ("GET", "/api/students?fast=true", None),
+        "GET /api/students?fields": lambda: ("GET", "/api/students?fields=id,class_name,roll_no,user.name", None),
+        "GET /api/students/search": lambda: ("GET", f"/api/students/search?q={prefix()}", None),
+        "GET /api/students/{id}/rank": lambda: ("GET", f"/api/students/{student_id()}/rank", None),
+        "GET /api/marks/{id}": lambda: ("GET", f"/api/marks/{student_id()}", None),
+        "GET /api/attendance/{id}": lambda: ("GET", f"/api/attendance/{student_id()}", None),
+        "GET /api/attendance/{id}/summary": lambda: ("GET", f"/api/attendance/{student_id()}/summary", None),
+        "GET /api/classes/{c}/analytics": lambda: ("GET", f"/api/classes/{class_name()}/analytics", None),
+        "GET /api/classes/{c}/leaderboard": lambda: ("GET", f"/api/classes/{class_name()}/leaderboard", None),
+        "GET /api/changes": lambda: ("GET", "/api/changes?since=0&limit=100", None),
+        "GET /api/export/marks": lambda: ("GET", f"/api/export/marks?student_id={student_id()}", None),
+        "POST /api/marks": lambda: ("POST", "/api/marks", {
+            "student_id": student_id(), "subject": "Math", "marks": round(rng.uniform(30, 100), 1)
+        }),
+        "POST /api/attendance": lambda: ("POST", "/api/attendance", {
+            "student_id": student_id(), "date": date.today().isoformat(),
+            "status": "present" if rng.random() < 0.9 else "absent"
+        }),
+    }
+
+
+# ---------------- RUNNER ---------------- #
+
+def _unlimited_backend():
+    """Limiter backend that admits everything (in-process runs)"""
+    # Imported late like main: database.py reads DATABASE_URL on import
+    from ratelimit import LimiterBackend
+
+    class Unlimited(LimiterBackend):
+        def take(self, key: str, rate: float, burst: int) -> float:
+            return 0.0
+
+        def acquire(self, name: str, limit: int) -> bool:
+            return True
+
+        def release(self, name: str):
+            pass
+
+    return Unlimited()
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+async def _one(client: httpx.AsyncClient, token: str, request: Request) -> Tuple[float, bool, Optional[int]]:
+    method, path, body = request
+    separator = "&" if "?" in path else "?"
+
+    start = time.perf_counter()
+    response = await client.request(method, f"{path}{separator}token={token}", json=body)
+    await response.aread()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    statements = response.headers.get("x-db-statements")
+    return elapsed, response.status_code < 400, int(statements) if statements is not None else None
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    token: str,
+    make_request: Callable[[], Request],
+    requests: int,
+    concurrency: int,
+    warmup: int = 5
+) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await _one(client, token, make_request())
+
+    latencies: List[float] = []
+    statements: List[int] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            elapsed, ok, count = await _one(client, token, make_request())
+            latencies.append(elapsed)
+            statements.append(count)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / wall,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1],
+        "queries_per_request": sum(statements) / len(statements) if None not in statements else None
+    }
+
+
+def _in_process_client(db_path: Optional[str]) -> Tuple[httpx.AsyncClient, str, Any]:
+    """ASGI client for main.app on a seeded database, teacher credentials and the app"""
+    os.environ["SQL_DEBUG"] = "1"
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="api-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+        import seed
+        from database import engine
+        print(f"Seeding a small school into {db_path} ...")
+        seed.seed(engine, seed.SchoolConfig())
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(db_path)}"
+
+    import main
+    import ratelimit
+    from database import engine
+    from models import User
+
+    ratelimit.set_backend(_unlimited_backend())
+
+    with engine.connect() as conn:
+        email = conn.execute(
+            User.__table__.select().where(User.role == "teacher").order_by(User.id).limit(1)
+        ).first().email
+
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60), email, main.app
+
+
+async def run(args) -> Dict[str, Any]:
+    lifespan = contextlib.nullcontext()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        email = args.email
+        mode = "server"
+    else:
+        client, email, app = _in_process_client(args.db)
+        # The ASGI transport doesn't send lifespan events: run startup here
+        lifespan = app.router.lifespan_context(app)
+        mode = "in-process"
+
+    async with lifespan, client:
+        login = await client.post("/api/login", json={"email": email, "password": args.password})
+        login.raise_for_status()
+        token = login.json()["token"]
+
+        bootstrap = (await client.get(f"/api/bootstrap?token={token}")).json()
+        rng = random.Random(args.seed)
+        endpoints = scenarios(bootstrap["students"], rng)
+        if args.only:
+            endpoints = {name: make for name, make in endpoints.items() if args.only in name}
+
+        results = {}
+        for name, make_request in endpoints.items():
+            results[name] = await run_endpoint(
+                client, token, make_request, args.requests, args.concurrency
+            )
+            print(_format_row(name, results[name]))
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "mode": mode,
+            "target": args.url or args.db or "fresh seeded school",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "students": len(bootstrap["students"])
+        },
+        "results": results
+    }
+
+
+# ---------------- REPORTING ---------------- #
+
+HEADER = f"{'endpoint':36s} {'p50 ms':>8s} {'p90 ms':>8s} {'p99 ms':>8s} {'rps':>8s} {'err':>5s} {'q/req':>6s}"
+
+
+def _format_row(name: str, result: Dict[str, Any]) -> str:
+    queries = result["queries_per_request"]
+    return (
+        f"{name:36s} {result['p50_ms']:8.2f} {result['p90_ms']:8.2f} {result['p99_ms']:8.2f} "
+        f"{result['throughput_rps']:8.1f} {result['errors']:5d} "
+        f"{queries if queries is None else round(queries, 1)!s:>6s}"
+    )
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print the change per endpoint; True if anything regressed beyond threshold %"""
+    regressed = False
+    print(f"\nAgainst baseline from {baseline['meta']['created_at']} ({baseline['meta']['target']}):")
+    print(f"{'endpoint':36s} {'p50':>9s} {'p99':>9s} {'rps':>9s} {'q/req':>9s}")
+
+    def change(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:36s} (new)")
+            continue
+
+        p50 = change(result["p50_ms"], old["p50_ms"])
+        p99 = change(result["p99_ms"], old["p99_ms"])
+        rps = change(result["throughput_rps"], old["throughput_rps"])
+        queries = ""
+        if result["queries_per_request"] is not None and old.get("queries_per_request") is not None:
+            queries = f"{result['queries_per_request'] - old['queries_per_request']:+.1f}"
+
+        flag = p50 > threshold or p99 > threshold
+        regressed |= flag
+        print(f"{name:36s} {p50:+8.1f}% {p99:+8.1f}% {rps:+8.1f}% {queries:>9s}{'  REGRESSION' if flag else ''}")
+
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints")
+    parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--db", help="in-process: seeded SQLite file to use (default: seed a fresh one)")
+    parser.add_argument("--email", default="teacher1@school.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", help="only endpoints whose name contains this")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=15.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    print(HEADER)
+    current = asyncio.run(run(args))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: attendance percentage from ORM rows vs the bitmap index
+
+Builds a throwaway SQLite database with 1,000 students and 200 school days,
+then times the old ORM path of ai.generate_student_report (load every
+Attendance object, lower-case each status) against attendance_index.
+
+    python benchmarks/attendance_bitmap.py [students] [days]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import attendance_index
+from models import Attendance, Base, Student, User
+
+
+def school_days(start: date, count: int):
+    """Weekdays starting at `start`"""
+    days = []
+    day = start
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def seed(engine, students: int, days: int):
+    """Bulk insert students and one attendance row per student per school day"""
+    rng = random.Random(42)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "name": f"Student {i}", "email": f"s{i}@school.com", "password": "x", "role": "student"}
+            for i in range(1, students + 1)
+        ])
+        conn.execute(insert(Student), [
+            {"id": i, "user_id": i, "class_name": f"{i % 10}A", "roll_no": str(i), "teacher_id": 1}
+            for i in range(1, students + 1)
+        ])
+        for day in school_days(date(2025, 9, 1), days):
+            conn.execute(insert(Attendance), [
+                {"student_id": i, "date": day, "status": "present" if rng.random() < 0.9 else "absent"}
+                for i in range(1, students + 1)
+            ])
+
+
+def orm_percentage(db, student_id: int) -> float:
+    """The original report code path"""
+    attendance = db.query(Attendance).filter(Attendance.student_id == student_id).all()
+    total_days = len(attendance)
+    present_days = len([a for a in attendance if a.status and a.status.lower() == "present"])
+    return (present_days / total_days) * 100 if total_days > 0 else 0
+
+
+def timed(label: str, fn, students: int):
+    start = time.perf_counter()
+    results = [fn(i) for i in range(1, students + 1)]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms total  {elapsed / students * 1e6:8.1f} us/student")
+    return results
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"Seeding {students} students x {days} days ...")
+    seed(engine, students, days)
+
+    db = Session()
+    start = time.perf_counter()
+    attendance_index.rebuild(db)
+    print(f"Index rebuild: {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"Database size: {os.path.getsize(path) / 1e6:.1f} MB\n")
+
+    orm = timed("ORM rows + list comprehension", lambda sid: orm_percentage(db, sid), students)
+    db.expunge_all()
+    bitmap = timed("Bitmap popcount", lambda sid: attendance_index.attendance_percentage(db, sid), students)
+
+    october = (date(2025, 10, 1), date(2025, 10, 31))
+    timed("Bitmap range (one month)", lambda sid: attendance_index.attendance_percentage(db, sid, *october), students)
+    timed("Bitmap streaks", lambda sid: attendance_index.streaks(db, sid), students)
+
+    assert all(abs(a - b) < 1e-9 for a, b in zip(orm, bitmap)), "bitmap and ORM results differ"
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark: request latency while online backups run
+
+A freshly seeded database serves `--readers` clients reading marks and
+`--writers` clients posting marks, in three phases of `--seconds` each:
+
+    no backup          baseline
+    one-step copy      backups taken back to back with pages=-1: the whole
+                       file is copied under one read lock (in WAL mode: from
+                       one snapshot, which doesn't hold writers back)
+    stepped copy       backups taken back to back with BACKUP_PAGES per step
+                       and BACKUP_SLEEP between steps
+
+Reported per phase: backups completed, their average duration and restarts,
+read and write latency p50/p99, and failed requests (e.g. "database is
+locked"). Runs in a child process on its own database (DATABASE_URL is read
+at import).
+
+    python benchmarks/backup_impact.py
+    python benchmarks/backup_impact.py --wal
+    python benchmarks/backup_impact.py --classes 96 --seconds 20
+
+52 MB database, 1 CPU, p99 in ms (read / write):
+
+                   rollback journal     WAL
+    no backup        230 / 432        217 / 243
+    one-step copy    548 / 706        236 / 283
+    stepped copy     417 / 789        311 / 344   (9 and 12 restarts)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+PHASES = ("no backup", "one-step copy", "stepped copy")
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+async def drive(args) -> Dict[str, Dict]:
+    """Runs inside the child process: seed, then run the three phases"""
+    import seed
+    from database import engine
+    seed.seed(engine, seed.SchoolConfig(classes=args.classes, years=args.years))
+    if args.wal:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
+    import backups
+    import main
+
+    backup_dir = tempfile.mkdtemp(prefix="backup-bench-")
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            login = await client.post("/api/login", json={"email": "teacher1@school.com", "password": "password"})
+            token = login.json()["token"]
+            students = [s["id"] for s in (await client.get(f"/api/bootstrap?token={token}")).json()["students"]]
+
+            async def phase(label: str) -> Dict:
+                reads: List[float] = []
+                writes: List[float] = []
+                runs: List[Dict] = []
+                failed = 0
+                deadline = time.perf_counter() + args.seconds
+
+                async def client_loop(number: int, writing: bool):
+                    nonlocal failed
+                    rng = random.Random(number)
+                    while time.perf_counter() < deadline:
+                        student_id = rng.choice(students)
+                        start = time.perf_counter()
+                        if writing:
+                            response = await client.post(
+                                f"/api/marks?token={token}",
+                                json={"student_id": student_id, "subject": "Math", "marks": 75}
+                            )
+                        else:
+                            response = await client.get(f"/api/marks/{student_id}?token={token}")
+                        (writes if writing else reads).append((time.perf_counter() - start) * 1000)
+                        if response.status_code >= 500:
+                            failed += 1
+
+                async def backup_loop():
+                    pages = -1 if label == "one-step copy" else backups.BACKUP_PAGES
+                    while time.perf_counter() < deadline:
+                        runs.append(await loop.run_in_executor(
+                            None, lambda: backups.run(directory=backup_dir, pages=pages, keep=1)
+                        ))
+
+                tasks = [client_loop(number, False) for number in range(args.readers)]
+                tasks += [client_loop(args.readers + number, True) for number in range(args.writers)]
+                if label != "no backup":
+                    tasks.append(backup_loop())
+                await asyncio.gather(*tasks)
+
+                reads.sort()
+                writes.sort()
+                return {
+                    "backups": len(runs),
+                    "backup_s": sum(run["seconds"] for run in runs) / len(runs) if runs else 0.0,
+                    "restarts": sum(run["restarts"] for run in runs),
+                    "mb": runs[-1]["bytes"] / 1e6 if runs else 0.0,
+                    "read_p50": percentile(reads, 50),
+                    "read_p99": percentile(reads, 99),
+                    "write_p50": percentile(writes, 50),
+                    "write_p99": percentile(writes, 99),
+                    "failed": failed
+                }
+
+            for label in PHASES:
+                results[label] = await phase(label)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency during online backups")
+    parser.add_argument("--classes", type=int, default=48)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--wal", action="store_true", help="put the database in WAL mode first")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(drive(args))))
+        return
+
+    path = os.path.join(tempfile.mkdtemp(prefix="backup-bench-"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"] + sys.argv[1:],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    results = json.loads(output.strip().splitlines()[-1])
+
+    journal = "WAL" if args.wal else "rollback journal"
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per phase, {journal}")
+    print(f"{'phase':15s} {'backups':>8s} {'backup s':>9s} {'restarts':>9s} {'read p50':>9s} {'read p99':>9s} "
+          f"{'write p50':>10s} {'write p99':>10s} {'failed':>7s}")
+    for label in PHASES:
+        result = results[label]
+        print(
+            f"{label:15s} {result['backups']:8d} {result['backup_s']:9.2f} {result['restarts']:9d} "
+            f"{result['read_p50']:9.2f} {result['read_p99']:9.2f} {result['write_p50']:10.2f} "
+            f"{result['write_p99']:10.2f} {result['failed']:7d}"
+        )
+    print(f"database size: {results['stepped copy']['mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
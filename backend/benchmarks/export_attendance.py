@@ -0,0 +1,80 @@
+"""
+Benchmark: stream one million attendance rows through export.stream_export
+
+Seeds a throwaway SQLite database (5,000 students x 200 days by default),
+then exports all attendance as NDJSON and CSV, reporting throughput, output
+size and peak Python memory. Peak memory is also measured for a 10x smaller
+export to show it stays flat as the row count grows.
+
+    python benchmarks/export_attendance.py [students] [days]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import export
+from models import Attendance, Base
+
+
+def seed(engine, students: int, days: int):
+    """One attendance row per student per day"""
+    start = date(2025, 9, 1)
+
+    with engine.begin() as conn:
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            conn.execute(insert(Attendance), [
+                {"student_id": i, "date": day, "status": "present" if (i + offset) % 7 else "absent"}
+                for i in range(1, students + 1)
+            ])
+
+
+def run(label: str, session_factory, fmt: str, filters=None):
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    size = lines = 0
+    for chunk in export.stream_export("attendance", fmt, filters, session_factory=session_factory):
+        size += len(chunk)
+        lines += chunk.count("\n")
+
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:<22} {lines:>9,} lines  {elapsed:6.2f} s  {lines / elapsed:>9,.0f} rows/s  "
+        f"{size / 1e6:7.1f} MB out  peak {peak / 1e6:5.1f} MB"
+    )
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+
+    print(f"Seeding {students * days:,} attendance rows ...")
+    seed(engine, students, days)
+
+    # Roughly a tenth of the rows, for comparing peak memory
+    tenth = {"end": date(2025, 9, 1) + timedelta(days=days // 10 - 1)}
+
+    run("ndjson (1/10 rows)", session_factory, "ndjson", tenth)
+    run("ndjson", session_factory, "ndjson")
+    run("csv", session_factory, "csv")
+
+
+if __name__ == "__main__":
+    main()
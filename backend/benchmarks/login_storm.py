@@ -0,0 +1,149 @@
+"""
+Benchmark: other endpoints' latency during a login storm
+
+Measures a mix of cheap authenticated reads (me, teacher list, search,
+leaderboard) twice, first on an idle app and then while `--storm` clients
+POST /api/login in a loop. Every login costs one scrypt hash on the hashing
+pool (passwords.py), so the reads should keep their latency. The logins
+themselves are limited by the pool's size (HASH_WORKERS), and beyond
+HASH_MAX_PENDING queued hashes the app answers 503.
+
+    python benchmarks/login_storm.py
+    python benchmarks/login_storm.py --storm 64 --requests 400
+    python benchmarks/login_storm.py --url http://127.0.0.1:8000 --email teacher1@school.com
+
+Reported: read p50/p99 idle vs during the storm, login throughput and
+latency, and how many logins were shed (503).
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def in_process_client() -> Tuple[httpx.AsyncClient, object]:
+    """ASGI client for main.app on a freshly seeded temporary database"""
+    path = os.path.join(tempfile.mkdtemp(prefix="login-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    import seed
+    from database import engine
+    seed.seed(engine, seed.SchoolConfig(classes=4))
+
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60), main.app
+
+
+async def reads(client: httpx.AsyncClient, token: str, requests: int, concurrency: int, rng: random.Random) -> List[float]:
+    paths = ["/api/me", "/api/teachers", "/api/students/search?q=pri", "/api/classes/1A/leaderboard"]
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            path = rng.choice(paths)
+            separator = "&" if "?" in path else "?"
+            start = time.perf_counter()
+            response = await client.get(f"{path}{separator}token={token}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies)
+
+
+async def storm(client: httpx.AsyncClient, credentials: dict, clients: int, stop: asyncio.Event):
+    """Log in as fast as possible until stopped; returns (latencies, ok, shed)"""
+    latencies: List[float] = []
+    counts = {"ok": 0, "shed": 0}
+
+    async def worker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = await client.post("/api/login", json=credentials)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code == 503:
+                counts["shed"] += 1
+                await asyncio.sleep(0.05)
+            else:
+                response.raise_for_status()
+                counts["ok"] += 1
+
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return sorted(latencies), counts
+
+
+def row(label: str, latencies: List[float]) -> str:
+    return f"{label:28s} p50 {percentile(latencies, 50):8.2f} ms   p99 {percentile(latencies, 99):8.2f} ms"
+
+
+async def run(args):
+    lifespan = contextlib.nullcontext()
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        client, app = in_process_client()
+        lifespan = app.router.lifespan_context(app)
+
+    credentials = {"email": args.email, "password": args.password}
+    rng = random.Random(1)
+
+    async with lifespan, client:
+        login = await client.post("/api/login", json=credentials)
+        login.raise_for_status()
+        token = login.json()["token"]
+
+        await reads(client, token, 20, 2, rng)
+        idle = await reads(client, token, args.requests, args.concurrency, rng)
+
+        stop = asyncio.Event()
+        storm_task = asyncio.create_task(storm(client, credentials, args.storm, stop))
+        await asyncio.sleep(0.5)  # let the hashing pool fill up
+
+        start = time.perf_counter()
+        during = await reads(client, token, args.requests, args.concurrency, rng)
+        stop.set()
+        logins, counts = await storm_task
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.storm} clients logging in, {args.concurrency} clients reading")
+    print(row("reads, idle", idle))
+    print(row("reads, during login storm", during))
+    print(row("logins", logins))
+    print(f"{'login throughput':28s} {counts['ok'] / elapsed:8.1f} /s   shed (503): {counts['shed']}")
+
+    if not args.url:
+        import passwords
+        print(f"{'hashing pool':28s} {passwords.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read latency during a login storm")
+    parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--email", default="teacher1@school.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--storm", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--requests", type=int, default=300, help="reads per phase")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent reading clients")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
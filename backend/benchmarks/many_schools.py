@@ -0,0 +1,138 @@
+"""
+Benchmark: one process serving many schools, with and without an engine LRU
+
+`--schools` small schools are seeded, each in its own database file. Their
+teachers then call GET /api/bootstrap, picking schools with a skewed
+(Zipf-like) popularity: a few busy schools, a long tail of quiet ones. Each
+setting runs in its own process:
+
+    unbounded   MAX_OPEN_TENANTS = number of schools (every engine stays open)
+    lru         MAX_OPEN_TENANTS = --max-open
+
+Reported per setting: warm and cold request latency (cold = the school's
+engine had to be opened first), evictions, and the process's open file
+descriptors and resident memory at the end.
+
+    python benchmarks/many_schools.py
+    python benchmarks/many_schools.py --schools 200 --max-open 16 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def drive(schools: int, requests: int) -> dict:
+    """Runs inside the child process: seed the schools, then read round the skewed mix"""
+    import seed
+    import tenants
+
+    names = [f"school{number:03d}" for number in range(schools)]
+    for name in names:
+        tenant = tenants.registry.get(name, create=True)
+        seed.seed(tenant.engine, seed.SchoolConfig(classes=2, students_per_class=30, years=1))
+    tenants.registry.close_all()
+
+    import main
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    rng = random.Random(7)
+    warm: List[float] = []
+    cold: List[float] = []
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            tokens = {}
+            for name in names:
+                login = await client.post(
+                    "/api/login", json={"email": "teacher1@school.com", "password": "password", "school": name}
+                )
+                tokens[name] = login.json()["token"]
+
+            for _ in range(requests):
+                name = names[min(schools, int(rng.paretovariate(1.0))) - 1]
+                was_open = any(entry["school"] == name for entry in tenants.stats()["open"])
+                start = time.perf_counter()
+                response = await client.get(f"/api/bootstrap?token={tokens[name]}")
+                elapsed = (time.perf_counter() - start) * 1000
+                response.raise_for_status()
+                (warm if was_open else cold).append(elapsed)
+
+            result = {
+                "warm_p50_ms": percentile(sorted(warm), 50),
+                "cold_p50_ms": percentile(sorted(cold), 50),
+                "cold_requests": len(cold),
+                "evicted": tenants.stats()["evicted"],
+                "open_engines": len(tenants.stats()["open"]),
+                "open_files": len(os.listdir("/proc/self/fd")),
+                "rss_mb": rss_mb()
+            }
+    return result
+
+
+def run_setting(max_open: int, args) -> dict:
+    directory = tempfile.mkdtemp(prefix="tenant-bench-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(directory, 'default.db')}",
+        TENANTS_DIR=os.path.join(directory, "schools"),
+        MAX_OPEN_TENANTS=str(max_open)
+    )
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--schools", str(args.schools),
+         "--requests", str(args.requests)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Many schools in one process, with and without an engine LRU")
+    parser.add_argument("--schools", type=int, default=100)
+    parser.add_argument("--max-open", type=int, default=16, help="LRU size for the lru setting")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(drive(args.schools, args.requests))))
+        return
+
+    print(f"{args.schools} schools, {args.requests} requests")
+    print(f"{'setting':16s} {'warm p50':>9s} {'cold p50':>9s} {'cold':>6s} {'evicted':>8s} "
+          f"{'engines':>8s} {'fds':>6s} {'RSS MB':>7s}")
+    for label, max_open in (("unbounded", args.schools), (f"lru {args.max_open}", args.max_open)):
+        result = run_setting(max_open, args)
+        print(
+            f"{label:16s} {result['warm_p50_ms']:9.2f} {result['cold_p50_ms']:9.2f} {result['cold_requests']:6d} "
+            f"{result['evicted']:8d} {result['open_engines']:8d} {result['open_files']:6d} {result['rss_mb']:7.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
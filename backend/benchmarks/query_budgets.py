@@ -0,0 +1,116 @@
+"""
+Check: SQL statements per request stay within budget (N+1 guard)
+
+Seeds a small school and requests each endpoint below once, as a teacher and
+as a student, inside sql_metrics.query_budget. Exits non-zero listing the
+statements of every request over its budget, so it can run in CI or before
+merging changes to the read paths. Budgets are per request, warm caches
+(each endpoint is requested once before it is measured), and include the
+token's user lookup.
+
+    python benchmarks/query_budgets.py
+    python benchmarks/query_budgets.py --show      # print every count
+
+Runs in a child process on its own database (DATABASE_URL is read at import).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (role, method, path, budget); {student} is the student's id
+BUDGETS = [
+    ("teacher", "GET", "/api/me", 1),
+    ("teacher", "GET", "/api/dashboard", 6),
+    ("teacher", "GET", "/api/bootstrap", 8),
+    ("teacher", "GET", "/api/students", 1),
+    ("teacher", "GET", "/api/marks/{student}", 2),
+    ("teacher", "GET", "/api/attendance/{student}", 3),
+    ("teacher", "GET", "/api/attendance/{student}/summary", 3),
+    ("teacher", "POST", "/api/ai-report", 4),
+    ("student", "GET", "/api/dashboard", 6),
+    ("student", "GET", "/api/bootstrap", 8),
+    ("student", "GET", "/api/marks/{student}", 3),
+    ("student", "GET", "/api/attendance/{student}", 4),
+    ("student", "POST", "/api/ai-report", 4),
+]
+
+
+def drive(args):
+    """Runs inside the child process: one result per BUDGETS entry"""
+    import seed
+    from database import engine
+    seed.seed(engine, seed.SchoolConfig(classes=2, years=1))
+
+    from fastapi.testclient import TestClient
+    import main
+    import sql_metrics
+
+    results = []
+    with TestClient(main.app) as client:
+        teacher = client.post("/api/login", json={"email": "teacher1@school.com", "password": "password"}).json()
+        first = client.get(f"/api/students?token={teacher['token']}").json()[0]
+        student_id = first["id"]
+        student = client.post("/api/login", json={"email": first["user"]["email"], "password": "password"}).json()
+        tokens = {"teacher": teacher["token"], "student": student["token"]}
+
+        def request(role, method, path):
+            url = f"{path.format(student=student_id)}?token={tokens[role]}"
+            if method == "POST":
+                return client.post(url, json={"student_id": student_id})
+            return client.get(url)
+
+        for role, method, path, budget in BUDGETS:
+            request(role, method, path)  # warm caches and lazy imports
+            try:
+                with sql_metrics.query_budget(budget) as stats:
+                    response = request(role, method, path)
+                listing = ""
+            except sql_metrics.QueryBudgetExceeded as e:
+                listing = str(e)
+                response = None
+            results.append({
+                "role": role, "method": method, "path": path, "budget": budget,
+                "statements": stats.statements, "status": response.status_code if response else None,
+                "listing": listing
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL statement budgets per endpoint")
+    parser.add_argument("--show", action="store_true", help="print every endpoint's count")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(drive(args)))
+        return
+
+    path = os.path.join(tempfile.mkdtemp(prefix="budget-check-"), "check.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"] + sys.argv[1:],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    results = json.loads(output.strip().splitlines()[-1])
+
+    over = [result for result in results if result["listing"]]
+    for result in results:
+        if args.show or result["listing"]:
+            flag = "OVER" if result["listing"] else "ok"
+            print(f"{flag:4s} {result['role']:8s} {result['method']:4s} {result['path']:36s} "
+                  f"{result['statements']:3d} / {result['budget']}  (HTTP {result['status']})")
+    for result in over:
+        print(f"\n{result['role']} {result['method']} {result['path']}: {result['listing']}")
+
+    print(f"{len(results) - len(over)} of {len(results)} requests within budget")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: ORM hydration vs column projection for the roster endpoint
+
+Times and measures peak Python memory for building the /api/students
+payload (validated List[StudentResponse]) from
+  - the old path: db.query(Student).all(), user loaded lazily per student
+  - read_models.list_students: one joined column select into slotted records
+
+    python benchmarks/read_path.py [students ...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import read_models
+from models import Base, Student, User
+from schemas import StudentResponse
+
+adapter = TypeAdapter(List[StudentResponse])
+
+
+def make_session(students: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "name": f"Student {i}", "email": f"student{i}@school.com", "password": "x" * 64, "role": "student"}
+            for i in range(1, students + 1)
+        ])
+        conn.execute(insert(Student), [
+            {"id": i, "user_id": i, "class_name": f"Class {i % 12 + 1}", "roll_no": str(i), "teacher_id": 1}
+            for i in range(1, students + 1)
+        ])
+
+    return sessionmaker(bind=engine)
+
+
+def orm_path(db):
+    return adapter.validate_python(db.query(Student).all(), from_attributes=True)
+
+
+def projection_path(db):
+    return adapter.validate_python(read_models.list_students(db), from_attributes=True)
+
+
+def measure(session_factory, fn):
+    """(result, seconds, peak bytes); timed without tracemalloc, which slows allocation down"""
+    db = session_factory()
+    start = time.perf_counter()
+    result = fn(db)
+    elapsed = time.perf_counter() - start
+    db.close()
+
+    db = session_factory()
+    tracemalloc.start()
+    fn(db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+
+    return result, elapsed, peak
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 5000, 20000]
+
+    print(f"{'students':>9}  {'ORM ms':>9}  {'ORM MB':>7}  {'proj ms':>9}  {'proj MB':>7}  speedup  memory")
+    for students in sizes:
+        session_factory = make_session(students)
+        orm, orm_time, orm_peak = measure(session_factory, orm_path)
+        proj, proj_time, proj_peak = measure(session_factory, projection_path)
+
+        assert orm == proj, "projection changed the payload"
+        print(
+            f"{students:>9}  {orm_time * 1000:>9.1f}  {orm_peak / 1e6:>7.1f}  "
+            f"{proj_time * 1000:>9.1f}  {proj_peak / 1e6:>7.1f}  "
+            f"{orm_time / proj_time:>6.1f}x  {orm_peak / proj_peak:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: at-risk scoring, full rebuild vs incremental refresh
+
+Seeds a school, then times:
+
+    full run          every student rescored (first run, or --full)
+    incremental run   after `--changed` students each get a new mark
+    no-op run         nothing changed since the last run
+    /api/at-risk      a teacher's at-risk list (p50 / p99 over 200 requests)
+
+Runs in a child process on its own database (DATABASE_URL is read at import).
+
+    python benchmarks/risk_job.py
+    python benchmarks/risk_job.py --classes 96 --changed 50
+
+48 classes (1440 students), 1 CPU: full 1151 ms, 20 changed students 23 ms,
+no-op 3 ms; /api/at-risk p50 12 ms, p99 29 ms.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(sorted_samples, pct):
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def drive(args):
+    """Runs inside the child process"""
+    import seed
+    from database import SessionLocal, engine
+    seed.seed(engine, seed.SchoolConfig(classes=args.classes, years=args.years))
+
+    from fastapi.testclient import TestClient
+    import main
+    import risk
+
+    results = {}
+    with TestClient(main.app) as client:
+        token = client.post("/api/login", json={"email": "teacher1@school.com", "password": "password"}).json()["token"]
+        students = [s["id"] for s in client.get(f"/api/bootstrap?token={token}").json()["students"]]
+
+        db = SessionLocal()
+        try:
+            results["full"] = risk.run(db, full=True)
+            rng = random.Random(0)
+            for student_id in rng.sample(students, min(args.changed, len(students))):
+                client.post(f"/api/marks?token={token}", json={"student_id": student_id, "subject": "Math", "marks": 40})
+            results["incremental"] = risk.run(db)
+            results["no-op"] = risk.run(db)
+        finally:
+            db.close()
+
+        samples = []
+        for _ in range(200):
+            start = time.perf_counter()
+            client.get(f"/api/at-risk?token={token}")
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results["endpoint"] = {"p50": percentile(samples, 50), "p99": percentile(samples, 99)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="At-risk scoring: full vs incremental")
+    parser.add_argument("--classes", type=int, default=48)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--changed", type=int, default=20)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(drive(args)))
+        return
+
+    path = os.path.join(tempfile.mkdtemp(prefix="risk-bench-"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", RISK_INTERVAL_MINUTES="0")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"] + sys.argv[1:],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    results = json.loads(output.strip().splitlines()[-1])
+
+    for label in ("full", "incremental", "no-op"):
+        run = results[label]
+        print(f"{label:12s} {run['students']:6d} students {run['seconds'] * 1000:9.1f} ms")
+    print(f"/api/at-risk p50 {results['endpoint']['p50']:.2f} ms, p99 {results['endpoint']['p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
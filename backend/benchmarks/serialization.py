@@ -0,0 +1,88 @@
+"""
+Benchmark: serializing a 5,000-student roster
+
+Compares the default FastAPI path (response-model validation with
+from_attributes, dump, standard json) with fast_json (trusted field copy +
+orjson), and reports bytes on the wire with and without gzip.
+
+    python benchmarks/serialization.py [students]
+"""
+import gzip
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from fast_json import trusted_dump
+from models import Base, Student, User
+from schemas import StudentResponse
+
+REPEAT = 5
+
+
+def load_roster(students: int):
+    """Seed an in-memory database and load the roster with users attached"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "name": f"Student Number {i}", "email": f"student{i}@school.com", "password": "x", "role": "student"}
+            for i in range(1, students + 1)
+        ])
+        conn.execute(insert(Student), [
+            {"id": i, "user_id": i, "class_name": f"Class {i % 12 + 1}", "roll_no": f"R{i:05d}", "teacher_id": 1}
+            for i in range(1, students + 1)
+        ])
+
+    db = sessionmaker(bind=engine)()
+    return db.query(Student).options(joinedload(Student.user)).all()
+
+
+def default_path(roster) -> bytes:
+    """What FastAPI does for response_model=List[StudentResponse]"""
+    adapter = TypeAdapter(List[StudentResponse])
+    content = adapter.dump_python(adapter.validate_python(roster, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast_path(roster) -> bytes:
+    return orjson.dumps([trusted_dump(student, StudentResponse) for student in roster])
+
+
+def measure(label: str, fn, roster):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.process_time()
+        body = fn(roster)
+        best = min(best, time.process_time() - start)
+
+    compressed = gzip.compress(body, compresslevel=6)
+    print(
+        f"{label:<10} {best * 1000:8.1f} ms CPU   {len(body) / 1024:8.1f} KB raw   "
+        f"{len(compressed) / 1024:7.1f} KB gzip ({len(compressed) / len(body):.0%})"
+    )
+    return body
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    roster = load_roster(students)
+    print(f"{students} students, best of {REPEAT} runs\n")
+
+    before = measure("default", default_path, roster)
+    after = measure("fast", fast_path, roster)
+
+    assert json.loads(before) == json.loads(after), "fast path changed the payload"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: worker cold start
+
+Each run starts a fresh interpreter, so nothing is warm but the OS page
+cache. Reported as median / max over the runs:
+
+    import main         python -c "import main" (what every worker and tool pays)
+    first response      uvicorn spawned -> first 200 from GET / (import,
+                        lifespan startup: schema check, warm-up)
+    first API request   ... -> first 200 from GET /api/bootstrap after login
+
+Also times the imports that are deferred to first use (Gemini SDK, pyarrow)
+for reference: they used to be part of "import main".
+
+    python benchmarks/startup.py [runs]
+
+Runs against a throwaway database seeded once with seed.py. Needs uvicorn
+and httpx.
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(module: str, env) -> float:
+    """Seconds for a fresh interpreter to import module"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_worker(env, email: str, password: str, timeout: float = 60):
+    """Seconds from spawning a uvicorn worker to its first response and first API response"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=base, timeout=5) as client:
+            while True:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError("worker did not come up")
+                try:
+                    if client.get("/").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.01)
+            first_response = time.perf_counter() - start
+
+            token = client.post("/api/login", json={"email": email, "password": password}).json()["token"]
+            client.get("/api/bootstrap", params={"token": token}).raise_for_status()
+            first_api = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    return first_response, first_api
+
+
+def report(label: str, samples):
+    print(f"{label:28s} median {statistics.median(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+
+def main(runs: int):
+    directory = tempfile.mkdtemp(prefix="startup-bench-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.db')}")
+
+    subprocess.run([sys.executable, "seed.py"], cwd=BACKEND, env=env, check=True, stdout=subprocess.DEVNULL)
+    email = "teacher1@school.com"
+
+    imports, responses, api = [], [], []
+    for _ in range(runs):
+        imports.append(time_import("main", env))
+        first_response, first_api = time_worker(env, email, "password")
+        responses.append(first_response)
+        api.append(first_api)
+
+    print(f"{runs} runs, Python {sys.version.split()[0]}")
+    report("import main", imports)
+    report("first response", responses)
+    report("first API request", api)
+
+    print("\nDeferred to first use:")
+    for module in ("google.generativeai", "snapshot"):
+        try:
+            report(f"import {module}", [time_import(module, env) for _ in range(runs)])
+        except subprocess.CalledProcessError:
+            print(f"{'import ' + module:28s} (not installed)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,97 @@
+"""
+Benchmark: FTS5 student search vs a LIKE scan over the joined roster
+
+Builds a school of N students in a temporary database (index filled by the
+insert triggers) and times typeahead-style prefix queries through
+search.search_students against a LIKE '%q%' scan that also has to order its
+matches (by name) before taking the top 20.
+
+    python benchmarks/student_search.py [students]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Student, User
+from search import init_search, search_students
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Rohan", "Saanvi",
+         "Arjun", "Priya", "Kabir", "Nisha", "Dev", "Tara", "Yash", "Zoya", "Farhan", "Leela"]
+LAST = ["Sharma", "Verma", "Iyer", "Nair", "Reddy", "Gupta", "Khan", "Das", "Patel", "Mehta",
+        "Joshi", "Rao", "Singh", "Bose", "Menon", "Kapoor", "Chopra", "Pillai", "Sen", "Malhotra"]
+
+QUERIES = ["aa", "pri", "meera", "sharma", "kab kh", "12", "class 7", "rohan iyer", "zo", "mal"]
+
+LIKE_SQL = """
+    SELECT s.id, u.name, u.email, s.roll_no, s.class_name
+    FROM students s JOIN users u ON u.id = s.user_id
+    WHERE u.name LIKE :q OR u.email LIKE :q OR s.roll_no LIKE :q OR s.class_name LIKE :q
+    ORDER BY u.name
+    LIMIT 20
+"""
+
+
+def build(path: str, students: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    init_search(engine)
+
+    rng = random.Random(7)
+    users, rows = [], []
+    for i in range(1, students + 1):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        users.append({
+            "id": i, "name": f"{first} {last}", "email": f"{first.lower()}.{last.lower()}{i}@school.com",
+            "password": "x" * 64, "role": "student"
+        })
+        rows.append({"id": i, "user_id": i, "class_name": f"Class {i % 12 + 1}", "roll_no": str(i), "teacher_id": 1})
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        conn.execute(insert(Student), rows)
+    print(f"Inserted {students} students (index maintained by triggers) in {time.perf_counter() - start:.2f}s")
+
+    return engine
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main(students: int, rounds: int = 20):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build(os.path.join(directory, "search.db"), students)
+        db = sessionmaker(bind=engine)()
+
+        fts, like = [], []
+        for _ in range(rounds):
+            for q in QUERIES:
+                start = time.perf_counter()
+                search_students(db, q)
+                fts.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                db.execute(text(LIKE_SQL), {"q": f"%{q}%"}).all()
+                like.append((time.perf_counter() - start) * 1000)
+
+        print(f"Sample: 'pri' -> {[row['name'] for row in search_students(db, 'pri', limit=3)]}")
+        for label, samples in (("FTS5 prefix + bm25", fts), ("LIKE scan", like)):
+            p50, p95 = percentiles(samples)
+            print(f"{label:20s} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
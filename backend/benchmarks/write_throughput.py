@@ -0,0 +1,133 @@
+"""
+Benchmark: sustained mark/attendance write throughput, with and without group commit
+
+Each mode runs in its own process on its own freshly seeded database
+(GROUP_COMMIT is read at import). `--clients` teachers then POST marks and
+attendance, half each, for `--seconds`. The app is called in-process through
+httpx's ASGI transport (same threadpool as under uvicorn), and every write
+is a real SQLite commit with its fsync.
+
+    python benchmarks/write_throughput.py
+    python benchmarks/write_throughput.py --clients 16 --seconds 20
+
+Reported per mode: writes/s, latency p50/p99, failed writes (5xx, e.g.
+"database is locked") and, with group commit, the average batch size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+MODES = {"per-request commit": "0", "group commit": "1"}
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+async def drive(clients: int, seconds: float) -> dict:
+    """Runs inside the child process: seed, start the app, write until time is up"""
+    import seed
+    from database import engine
+    seed.seed(engine, seed.SchoolConfig(classes=4))
+
+    import main
+    import write_queue
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    latencies: List[float] = []
+    failed = 0
+
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            login = await client.post("/api/login", json={"email": "teacher1@school.com", "password": "password"})
+            token = login.json()["token"]
+            students = [s["id"] for s in (await client.get(f"/api/bootstrap?token={token}")).json()["students"]]
+            today = date.today().isoformat()
+
+            async def teacher(number: int):
+                nonlocal failed
+                rng = random.Random(number)
+                while time.perf_counter() < deadline:
+                    if rng.random() < 0.5:
+                        path, body = "/api/marks", {
+                            "student_id": rng.choice(students), "subject": "Math", "marks": round(rng.uniform(30, 100), 1)
+                        }
+                    else:
+                        path, body = "/api/attendance", {
+                            "student_id": rng.choice(students), "date": today, "status": "present"
+                        }
+                    start = time.perf_counter()
+                    response = await client.post(f"{path}?token={token}", json=body)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status_code >= 500:
+                        failed += 1
+
+            deadline = time.perf_counter() + seconds
+            start = time.perf_counter()
+            await asyncio.gather(*(teacher(number) for number in range(clients)))
+            elapsed = time.perf_counter() - start
+            # Before shutdown, which drops the writer
+            average_batch = write_queue.stats()["average_batch"]
+
+    latencies.sort()
+    return {
+        "writes_per_s": (len(latencies) - failed) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "failed": failed,
+        "average_batch": average_batch
+    }
+
+
+def run_mode(group_commit: str, args) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="write-bench-"), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", GROUP_COMMIT=group_commit)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--clients", str(args.clients), "--seconds", str(args.seconds)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write throughput with and without group commit")
+    # Above ~40 clients (the threadpool size) per-request commits can stall on
+    # the connection pool for its 30 s timeout: keep the default below that
+    parser.add_argument("--clients", type=int, default=32, help="concurrent writing teachers")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(drive(args.clients, args.seconds))
+        print(json.dumps(result))
+        return
+
+    print(f"{args.clients} clients, {args.seconds:g}s per mode")
+    print(f"{'mode':22s} {'writes/s':>9s} {'p50 ms':>8s} {'p99 ms':>8s} {'failed':>7s} {'batch':>6s}")
+    for label, group_commit in MODES.items():
+        result = run_mode(group_commit, args)
+        batch = f"{result['average_batch']:.1f}" if group_commit == "1" else "-"
+        print(
+            f"{label:22s} {result['writes_per_s']:9.1f} {result['p50_ms']:8.2f} {result['p99_ms']:8.2f} "
+            f"{result['failed']:7d} {batch:>6s}"
+        )
+
+
+if __name__ == "__main__":
+    main()
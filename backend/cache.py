@@ -0,0 +1,274 @@
+"""
+In-process cache for read-mostly reference data (teacher list, rosters)
+
+Entries are read-only records from read_models, never ORM objects, so they
+can be shared between requests and sessions. Keys are versioned per
+namespace:
+
+    ("students", <version>, <args>)
+
+Invalidating a namespace bumps its version, which makes every older entry
+unreachable at once; the stale entries then age out of the LRU. The LRU is
+bounded by entry count and by approximate size (MAX_BYTES), since a whole
+roster is one entry. Per-class namespaces of a deleted or archived class are
+forgotten (entries and version dropped), so versions don't pile up. The write
+path (changes.publish, after each commit) invalidates by entity:
+
+    user            -> teachers
+    student, class  -> students
+    mark            -> leaderboard:<its class>
+
+Per-class entries are also keyed by the version of their parent namespace
+("leaderboard"), so students moving between classes can invalidate every
+class at once. Namespaces of schools other than the default one are prefixed
+with the school ("<school>/students"): each school has its own versions and
+shares only the LRU's capacity.
+
+Each process has its own cache. To keep several workers coherent, plug an
+InvalidationChannel into set_channel(): invalidations are published on it
+and versions are bumped when other workers' messages arrive. LocalChannel
+is an in-process stand-in with the same interface as a real pub/sub
+(e.g. Redis) channel.
+"""
+import json
+import sys
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from database import DEFAULT_TENANT
+
+MAX_ENTRIES = 256
+MAX_BYTES = 32 * 1024 * 1024  # approximate, see approx_size()
+
+# Which cached namespaces a change to each entity makes stale
+INVALIDATES = {
+    "user": ("teachers",),
+    "student": ("students",),
+    "class": ("students",),
+}
+
+# Per-class namespaces ("<parent>:<class_name>") stale after a change in that class
+CLASS_INVALIDATES = {
+    "mark": ("leaderboard",),
+    "student": ("leaderboard",),
+    "class": ("leaderboard",),
+}
+
+
+# ---------------- INVALIDATION CHANNEL ---------------- #
+
+class InvalidationChannel(ABC):
+    """Pub/sub between workers: publish(origin, namespace, forget), subscribe(callback)
+
+    forget=True: the namespace is gone for good (e.g. a deleted class), drop
+    it instead of bumping its version.
+    """
+
+    @abstractmethod
+    def publish(self, origin: str, namespace: str, forget: bool = False):
+        ...
+
+    @abstractmethod
+    def subscribe(self, callback: Callable[[str, str, bool], None]):
+        ...
+
+
+class LocalChannel(InvalidationChannel):
+    """Delivers synchronously to every subscriber in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[str, str, bool], None]] = []
+
+    def publish(self, origin: str, namespace: str, forget: bool = False):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(origin, namespace, forget)
+
+    def subscribe(self, callback: Callable[[str, str, bool], None]):
+        with self._lock:
+            self._callbacks.append(callback)
+
+
+# ---------------- CACHE ---------------- #
+
+def approx_size(value: Any) -> int:
+    """Rough deep size in bytes of a cached value (records, lists, dicts, scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(approx_size(item) for item in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(approx_size(getattr(value, name, None)) for name in value.__slots__)
+    return size
+
+
+class VersionedLRUCache:
+    """LRU bounded by entry count and by approximate size (whole rosters are single entries)"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._versions: Dict[str, int] = {}
+        self._forgets = 0
+        self._channel: Optional[InvalidationChannel] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Cached value for key, calling loader() on a miss"""
+        with self._lock:
+            # Version is read before loading: an invalidation during the load
+            # files the result under the old version, where nobody reads it
+            full_key = (namespace, self._versions.get(namespace, 0), key)
+            forgets = self._forgets
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key][0]
+            self.misses += 1
+
+        value = loader()
+        size = approx_size(value)
+
+        with self._lock:
+            # A namespace forgotten during the load restarts at version 0: don't
+            # file a stale result where its next reader would find it
+            if forgets != self._forgets or size > self.max_bytes:
+                return value
+            if full_key in self._entries:
+                self._bytes -= self._entries[full_key][1]
+            self._entries[full_key] = (value, size)
+            self._entries.move_to_end(full_key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+        return value
+
+    def _bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            self.invalidations += 1
+
+    def invalidate(self, namespace: str):
+        """Make every cached entry of a namespace stale, here and in other workers"""
+        self._bump(namespace)
+        if self._channel is not None:
+            self._channel.publish(self.origin, namespace)
+
+    def _forget(self, namespace: str):
+        with self._lock:
+            self._versions.pop(namespace, None)
+            for full_key in [full_key for full_key in self._entries if full_key[0] == namespace]:
+                self._bytes -= self._entries.pop(full_key)[1]
+            self._forgets += 1
+            self.invalidations += 1
+
+    def forget(self, namespace: str):
+        """Drop a namespace that won't be used again (its entries and version), here and in other workers"""
+        self._forget(namespace)
+        if self._channel is not None:
+            self._channel.publish(self.origin, namespace, forget=True)
+
+    def version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def _on_message(self, origin: str, namespace: str, forget: bool = False):
+        if origin != self.origin:
+            if forget:
+                self._forget(namespace)
+            else:
+                self._bump(namespace)
+
+    def set_channel(self, channel: InvalidationChannel):
+        self._channel = channel
+        channel.subscribe(self._on_message)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "versions": dict(self._versions)
+            }
+
+
+reference_cache = VersionedLRUCache()
+
+
+def fields_key(fields: Optional[dict]) -> str:
+    """Hashable form of a (nested) sparse fieldset"""
+    return json.dumps(fields, sort_keys=True)
+
+
+def _scoped(namespace: str, tenant: str) -> str:
+    return namespace if tenant == DEFAULT_TENANT else f"{tenant}/{namespace}"
+
+
+def cached(namespace: str, key: Hashable, loader: Callable[[], Any], tenant: str = DEFAULT_TENANT) -> Any:
+    return reference_cache.get_or_load(_scoped(namespace, tenant), key, loader)
+
+
+def cached_for_class(parent: str, class_name: str, loader: Callable[[], Any], tenant: str = DEFAULT_TENANT) -> Any:
+    """Per-class entry, stale when either its class or the parent is invalidated"""
+    parent = _scoped(parent, tenant)
+    return reference_cache.get_or_load(
+        f"{parent}:{class_name}", reference_cache.version(parent), loader
+    )
+
+
+def invalidate_entity(
+    entity: str,
+    op: Optional[str] = None,
+    class_name: Optional[str] = None,
+    tenant: str = DEFAULT_TENANT
+):
+    """Drop the namespaces a committed change to this entity makes stale"""
+    for namespace in INVALIDATES.get(entity, ()):
+        reference_cache.invalidate(_scoped(namespace, tenant))
+
+    for parent in CLASS_INVALIDATES.get(entity, ()):
+        parent = _scoped(parent, tenant)
+        # An update may have moved the student out of a class we can't name here
+        if class_name is None or (entity == "student" and op == "update"):
+            reference_cache.invalidate(parent)
+        elif entity == "class":
+            # Deleted or archived: its per-class namespace won't be read again
+            reference_cache.forget(f"{parent}:{class_name}")
+        else:
+            reference_cache.invalidate(f"{parent}:{class_name}")
+
+
+def set_channel(channel: InvalidationChannel):
+    reference_cache.set_channel(channel)
+
+
+def stats() -> Dict[str, Any]:
+    return reference_cache.stats()
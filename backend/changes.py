@@ -0,0 +1,225 @@
+"""
+Change feed for delta sync
+
+Every write handler stages what it changed in change_log within the write's
+own transaction, so a write and its entry commit (or fail) together. The row
+id is a monotonically increasing cursor: clients keep the last one they've
+seen and call
+
+    GET /api/changes?since=<cursor>
+
+to fetch only the creates, updates and deletes since then, instead of
+reloading whole lists. Students only see changes to their own records.
+Each change is also pushed to open dashboards once it commits (see events.py).
+
+Old entries can be dropped with:
+
+    python changes.py prune [days]
+
+A client whose cursor predates the oldest kept entry gets reset=True and
+should reload everything from /api/bootstrap.
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import cache
+import events
+from database import DEFAULT_TENANT, tenant_of
+from models import ChangeLog
+
+CHANGES_PAGE_SIZE = 500
+KEEP_DAYS = 30
+
+# Columns clients cache for each entity (the bootstrap summary shapes)
+USER_FIELDS = ["id", "name", "email", "role"]
+MARK_FIELDS = ["id", "student_id", "subject", "marks"]
+ATTENDANCE_FIELDS = ["id", "student_id", "date", "status"]
+
+
+# ---------------- PAYLOADS ---------------- #
+
+def _row(obj, columns) -> Dict[str, Any]:
+    return {column: getattr(obj, column) for column in columns}
+
+
+def user_payload(user) -> Dict[str, Any]:
+    return _row(user, USER_FIELDS)
+
+
+def student_payload(student, user) -> Dict[str, Any]:
+    return {
+        "id": student.id,
+        "class_name": student.class_name,
+        "roll_no": student.roll_no,
+        "name": user.name,
+        "teacher_id": student.teacher_id
+    }
+
+
+def mark_payload(mark) -> Dict[str, Any]:
+    return _row(mark, MARK_FIELDS)
+
+
+def attendance_payload(attendance) -> Dict[str, Any]:
+    return _row(attendance, ATTENDANCE_FIELDS)
+
+
+# ---------------- WRITE PATH ---------------- #
+
+def _values(
+    entity: str,
+    op: str,
+    entity_id: Optional[int],
+    payload: Optional[dict],
+    student_id: Optional[int],
+    class_name: Optional[str]
+) -> Dict[str, Any]:
+    return {
+        "entity": entity,
+        "entity_id": entity_id,
+        "op": op,
+        "student_id": student_id,
+        "class_name": class_name,
+        "payload": json.dumps(payload, default=str) if payload is not None else None,
+        "created_at": datetime.utcnow()
+    }
+
+
+def stage(
+    db: Session,
+    entity: str,
+    op: str,
+    entity_id: Optional[int] = None,
+    payload: Optional[dict] = None,
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None
+) -> ChangeLog:
+    """Append one change to the feed in the caller's transaction (publish it after commit)"""
+    change = ChangeLog(**_values(entity, op, entity_id, payload, student_id, class_name))
+    db.add(change)
+    db.flush()
+    return change
+
+
+def stage_on(
+    conn: Connection,
+    entity: str,
+    op: str,
+    entity_id: Optional[int] = None,
+    payload: Optional[dict] = None,
+    student_id: Optional[int] = None,
+    class_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """stage() for writes made on a raw connection; returns the event to publish after commit"""
+    values = _values(entity, op, entity_id, payload, student_id, class_name)
+    cursor = conn.execute(insert(ChangeLog).values(**values)).inserted_primary_key[0]
+    return {
+        "cursor": cursor,
+        "entity": entity,
+        "entity_id": entity_id,
+        "op": op,
+        "student_id": student_id,
+        "class_name": class_name,
+        "payload": payload
+    }
+
+
+def publish(event: Dict[str, Any], tenant: str = DEFAULT_TENANT):
+    """After commit: drop stale cache entries and push the change to the school's subscribers"""
+    cache.invalidate_entity(event["entity"], event["op"], event["class_name"], tenant)
+    events.publish(event, tenant)
+
+
+def commit(db: Session, *staged: ChangeLog):
+    """Commit the caller's write together with its staged changes, then publish them"""
+    pending = [to_dict(change) for change in staged]
+    db.commit()
+    for event in pending:
+        publish(event, tenant_of(db))
+
+
+# ---------------- READ PATH ---------------- #
+
+def latest_cursor(db: Session) -> int:
+    """Id of the newest change (0 if nothing was ever recorded)"""
+    seq = db.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = :table"),
+        {"table": ChangeLog.__tablename__}
+    ).scalar()
+    return seq or 0
+
+
+def oldest_kept(db: Session, latest: int) -> int:
+    """Cursor below which entries have been pruned"""
+    oldest = db.query(func.min(ChangeLog.id)).scalar()
+    return oldest - 1 if oldest is not None else latest
+
+
+def to_dict(change: ChangeLog) -> Dict[str, Any]:
+    return {
+        "cursor": change.id,
+        "entity": change.entity,
+        "entity_id": change.entity_id,
+        "op": change.op,
+        "student_id": change.student_id,
+        "class_name": change.class_name,
+        "payload": json.loads(change.payload) if change.payload else None
+    }
+
+
+def changes_since(
+    db: Session,
+    since: int,
+    student_id: Optional[int] = None,
+    limit: int = CHANGES_PAGE_SIZE
+) -> Dict[str, Any]:
+    """Changes after a cursor, oldest first, optionally scoped to one student"""
+    # Read the head first so nothing committed meanwhile is skipped
+    latest = latest_cursor(db)
+
+    if since < oldest_kept(db, latest):
+        return {"cursor": latest, "changes": [], "more": False, "reset": True}
+
+    query = db.query(ChangeLog).filter(ChangeLog.id > since, ChangeLog.id <= latest)
+    if student_id is not None:
+        query = query.filter(ChangeLog.student_id == student_id)
+
+    rows = query.order_by(ChangeLog.id).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "cursor": rows[-1].id if more else latest,
+        "changes": [to_dict(row) for row in rows],
+        "more": more,
+        "reset": False
+    }
+
+
+def prune(db: Session, keep_days: int = KEEP_DAYS) -> int:
+    """Drop changes older than keep_days"""
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    removed = db.query(ChangeLog).filter(ChangeLog.created_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if len(sys.argv) < 2 or sys.argv[1] != "prune":
+        print("Usage: python changes.py prune [days]")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else KEEP_DAYS
+        print(f"Pruned {prune(db, days)} changes older than {days} days")
+    finally:
+        db.close()
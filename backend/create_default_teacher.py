@@ -7,17 +7,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
 from database import engine, SessionLocal
-from models import Base, User
-import hashlib
-
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+from models import User
+from migrate import init_db
+from passwords import hash_password
 
 def create_default_teacher():
     """Create default teacher account if it doesn't exist"""
     
     # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
+    init_db(engine)
     
     db = SessionLocal()
     
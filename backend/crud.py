@@ -1,17 +1,41 @@
 """
 CRUD operations for database
 """
+from typing import Optional
+from datetime import timedelta
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from models import User, Student, Mark, Attendance
-import hashlib
+from models import User, Student, Mark, Attendance, StudentRisk
+from database import tenant_of
+from partitions import (
+    insert_attendance,
+    get_attendance,
+    recent_attendance,
+    delete_student_attendance,
+    archived_years,
+    partition_name,
+    academic_year_bounds
+)
+from attendance_index import record_day, attendance_counts, delete_bitmaps
+import rollups
+import read_models
+import cache
+import changes
+import passwords
+
 
 def hash_password(password: str) -> str:
-    """Hash password using SHA256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password with salted scrypt (on the hashing pool)"""
+    return passwords.hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return hash_password(plain_password) == hashed_password
+    """Verify password against hash (scrypt or legacy SHA-256)"""
+    return passwords.verify_password(plain_password, hashed_password)
+
+def set_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Store a rehashed password for a user"""
+    db.query(User).filter(User.id == user_id).update({"password": hashed_password})
+    db.commit()
 
 # User operations
 def get_user_by_email(db: Session, email: str):
@@ -34,9 +58,13 @@ def create_user(db: Session, name: str, email: str, password: str, role: str):
     db.refresh(db_user)
     return db_user
 
-def get_all_teachers(db: Session):
-    """Get all teachers"""
-    return db.query(User).filter(User.role == "teacher").all()
+def get_all_teachers(db: Session, fields: Optional[dict] = None):
+    """Get all teachers (cached until a teacher changes)"""
+    return cache.cached(
+        "teachers", cache.fields_key(fields),
+        lambda: read_models.list_users(db, role="teacher", fields=fields),
+        tenant_of(db)
+    )
 
 # Student operations
 def create_student(db: Session, student_data, teacher_id: int):
@@ -80,17 +108,34 @@ def get_student_by_id(db: Session, student_id: int):
     """Get student by ID"""
     return db.query(Student).filter(Student.id == student_id).first()
 
-def get_students_by_teacher(db: Session, teacher_id: int):
-    """Get all students created by a teacher"""
-    return db.query(Student).filter(Student.teacher_id == teacher_id).all()
+def get_students_by_teacher(db: Session, teacher_id: int, fields: Optional[dict] = None):
+    """Get all students created by a teacher (cached until a student changes)"""
+    return cache.cached(
+        "students", (teacher_id, cache.fields_key(fields)),
+        lambda: read_models.list_students(db, teacher_id=teacher_id, fields=fields),
+        tenant_of(db)
+    )
+
+def count_students_by_teacher(db: Session, teacher_id: int):
+    """Count students created by a teacher"""
+    return db.query(Student).filter(Student.teacher_id == teacher_id).count()
+
+def get_all_students(db: Session, fields: Optional[dict] = None):
+    """Get all students (cached until a student changes)"""
+    return cache.cached(
+        "students", (None, cache.fields_key(fields)),
+        lambda: read_models.list_students(db, fields=fields),
+        tenant_of(db)
+    )
 
-def get_all_students(db: Session):
-    """Get all students"""
-    return db.query(Student).all()
+def get_student_by_user(db: Session, user_id: int, fields: Optional[dict] = None):
+    """Get the student profile of a user as a read-only record"""
+    students = read_models.list_students(db, user_id=user_id, fields=fields)
+    return students[0] if students else None
 
 # Marks operations
-def create_mark(db: Session, mark_data):
-    """Create new marks entry"""
+def stage_mark(db: Session, mark_data):
+    """Add a marks entry and its rollup to the caller's transaction (flushed, not committed)"""
     db_mark = Mark(
         student_id=mark_data.student_id,
         subject=mark_data.subject,
@@ -98,50 +143,91 @@ def create_mark(db: Session, mark_data):
     )
     
     db.add(db_mark)
+    rollups.record_mark(db, db_mark.student_id, db_mark.subject, db_mark.marks)
+    db.flush()
+    return db_mark
+
+def create_mark(db: Session, mark_data):
+    """Create new marks entry"""
+    db_mark = stage_mark(db, mark_data)
     db.commit()
     db.refresh(db_mark)
     return db_mark
 
-def get_marks_by_student(db: Session, student_id: int):
+def get_marks_by_student(db: Session, student_id: int, fields: Optional[dict] = None):
     """Get all marks for a student"""
-    return db.query(Mark).filter(Mark.student_id == student_id).all()
+    return read_models.list_marks(db, student_id, fields)
 
 # Attendance operations
-def create_attendance(db: Session, attendance_data):
-    """Create new attendance entry"""
-    db_attendance = Attendance(
+def stage_attendance(db: Session, attendance_data, class_name: Optional[str] = None):
+    """Record a day's attendance, its bitmap bit and rollups in the caller's transaction
+
+    Returns the row and "create", or "update" when the day was already recorded.
+    """
+    db_attendance, previous = insert_attendance(
+        db,
         student_id=attendance_data.student_id,
-        date=attendance_data.date,
+        day=attendance_data.date,
         status=attendance_data.status
     )
-    
-    db.add(db_attendance)
+
+    # Keep the bitmap index and rollups in the same transaction
+    record_day(db, db_attendance.student_id, db_attendance.date, db_attendance.status)
+    rollups.record_attendance(
+        db, db_attendance.student_id, db_attendance.date, db_attendance.status, class_name, previous
+    )
+    return db_attendance, "create" if previous is None else "update"
+
+def create_attendance(db: Session, attendance_data, class_name: Optional[str] = None):
+    """Create new attendance entry (raises ValueError for archived years)"""
+    db_attendance, _ = stage_attendance(db, attendance_data, class_name)
     db.commit()
     db.refresh(db_attendance)
     return db_attendance
 
-def get_attendance_by_student(db: Session, student_id: int):
-    """Get all attendance for a student"""
-    return db.query(Attendance).filter(Attendance.student_id == student_id).all()
+def get_attendance_by_student(
+    db: Session,
+    student_id: int,
+    year: Optional[int] = None,
+    fields: Optional[dict] = None
+):
+    """Get attendance for a student, for one academic year or all years"""
+    return get_attendance(db, student_id, year, fields)
+
+def get_attendance_counts(db: Session, student_id: int, year: Optional[int] = None):
+    """Get (present_days, total_days) for a student from the bitmap index"""
+    if year is None:
+        return attendance_counts(db, student_id)
+
+    start, end = academic_year_bounds(year)
+    return attendance_counts(db, student_id, start, end - timedelta(days=1))
 
 # Dashboard operations
-def get_dashboard_stats(db: Session):
-    """Get dashboard statistics"""
-    total_students = db.query(Student).count()
-    total_teachers = db.query(User).filter(User.role == "teacher").count()
+def get_dashboard_stats(db: Session, fields: Optional[dict] = None):
+    """Get dashboard statistics (only the requested keys when a field tree is given)"""
+    def wanted(key):
+        return fields is None or key in fields
+
+    def subtree(key):
+        return fields[key] if fields else None
+
+    stats = {}
+
+    if wanted("total_students"):
+        stats["total_students"] = db.query(Student).count()
+
+    if wanted("total_teachers"):
+        stats["total_teachers"] = db.query(User).filter(User.role == "teacher").count()
     
     # Get recent marks (last 10)
-    recent_marks = db.query(Mark).order_by(Mark.id.desc()).limit(10).all()
+    if wanted("recent_marks"):
+        stats["recent_marks"] = read_models.recent_marks(db, limit=10, fields=subtree("recent_marks"))
     
     # Get recent attendance (last 10)
-    recent_attendance = db.query(Attendance).order_by(Attendance.date.desc()).limit(10).all()
+    if wanted("recent_attendance"):
+        stats["recent_attendance"] = recent_attendance(db, limit=10, fields=subtree("recent_attendance"))
     
-    return {
-        "total_students": total_students,
-        "total_teachers": total_teachers,
-        "recent_marks": recent_marks,
-        "recent_attendance": recent_attendance
-    }
+    return stats
 
 def update_teacher(db, teacher_id: int, name: str, email: str, password: str):
     teacher = db.query(User).filter(
@@ -194,26 +280,139 @@ def update_student(
     # Update user table
     user.name = name
     user.email = email
-    user.password = password
+    user.password = hash_password(password)
 
-    # Update student table
+    # Update student table (daily class presence follows the student)
+    rollups.move_student(db, student.id, student.class_name, class_name)
+    db.query(StudentRisk).filter(StudentRisk.student_id == student.id).update(
+        {"class_name": class_name}, synchronize_session=False
+    )
     student.class_name = class_name
     student.roll_no = roll_no
 
-    db.commit()
-    db.refresh(student)
+    db.flush()
     return student
 
 
 def delete_student(db, student_id: int):
-    student = db.query(Student).filter(Student.id == student_id).first()
+    """Delete a student with their user, marks and attendance using set-based deletes (caller commits)"""
+    row = db.query(Student.user_id, Student.class_name).filter(Student.id == student_id).first()
 
-    if not student:
+    if row is None:
         return False
 
-    user = db.query(User).filter(User.id == student.user_id).first()
+    user_id, class_name = row
 
-    db.delete(student)
-    db.delete(user)
-    db.commit()
+    # Rollups first: the class counts are derived from the attendance rows
+    rollups.remove_student(db, student_id, class_name)
+
+    # Bulk deletes: child rows are never loaded into the session
+    db.query(Mark).filter(Mark.student_id == student_id).delete(synchronize_session=False)
+    delete_student_attendance(db, [student_id])
+    delete_bitmaps(db, [student_id])
+    db.query(StudentRisk).filter(StudentRisk.student_id == student_id).delete(synchronize_session=False)
+    db.query(Student).filter(Student.id == student_id).delete(synchronize_session=False)
+    db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
     return True
+
+
+# ---------------- CLASS ARCHIVAL ---------------- #
+
+# Tables touched by a class archive, in the order rows are copied out
+ARCHIVE_TABLES = ["users", "students", "marks", "attendance"]
+
+# Row filters selecting everything that belongs to one class
+CLASS_ROW_FILTERS = {
+    "users": "id IN (SELECT user_id FROM main.students WHERE class_name = :class_name)",
+    "students": "class_name = :class_name",
+    "marks": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+    "attendance": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+    "attendance_bitmaps": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+    "student_month_attendance": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+    "student_subject_marks": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+    "class_day_presence": "class_name = :class_name",
+    "student_risk": "student_id IN (SELECT id FROM main.students WHERE class_name = :class_name)",
+}
+
+# Children first, students last: the other filters depend on the students rows
+CLASS_DELETE_ORDER = [
+    "attendance",
+    "attendance_bitmaps",
+    "student_month_attendance",
+    "student_subject_marks",
+    "class_day_presence",
+    "student_risk",
+    "marks",
+    "users",
+    "students"
+]
+
+
+def archive_class(db, class_name: str, archive_path: Optional[str] = None):
+    """Remove a whole class in one transaction, optionally copying it to an archive database
+
+    The class delete is added to the change feed in the same transaction and
+    published after it commits. Returns the number of rows removed per table,
+    or None if the class has no students.
+    """
+    if db.query(Student.id).filter(Student.class_name == class_name).first() is None:
+        return None
+
+    # Archived attendance years are removed and archived alongside the hot table
+    partitions = [partition_name(year) for year in archived_years(db)]
+    attendance_filter = CLASS_ROW_FILTERS["attendance"]
+
+    # Run on a dedicated connection: ATTACH/DETACH are not allowed inside a transaction
+    with db.get_bind().connect() as conn:
+        if archive_path:
+            conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (archive_path,))
+            conn.commit()
+
+        params = {"class_name": class_name}
+        removed = {}
+
+        try:
+            with conn.begin():
+                if archive_path:
+                    for table in ARCHIVE_TABLES:
+                        conn.exec_driver_sql(
+                            f"CREATE TABLE IF NOT EXISTS archive.{table} "
+                            f"AS SELECT * FROM main.{table} WHERE 0"
+                        )
+                        conn.execute(text(
+                            f"INSERT INTO archive.{table} "
+                            f"SELECT * FROM main.{table} WHERE {CLASS_ROW_FILTERS[table]}"
+                        ), params)
+
+                    for partition in partitions:
+                        conn.execute(text(
+                            f"INSERT INTO archive.attendance (id, student_id, date, status) "
+                            f"SELECT id, student_id, date, status FROM main.{partition} "
+                            f"WHERE {attendance_filter}"
+                        ), params)
+
+                archived_attendance = 0
+                for partition in partitions:
+                    archived_attendance += conn.execute(text(
+                        f"DELETE FROM main.{partition} WHERE {attendance_filter}"
+                    ), params).rowcount
+
+                for table in CLASS_DELETE_ORDER:
+                    result = conn.execute(text(
+                        f"DELETE FROM main.{table} WHERE {CLASS_ROW_FILTERS[table]}"
+                    ), params)
+                    removed[table] = result.rowcount
+
+                removed["attendance"] += archived_attendance
+                event = changes.stage_on(conn, "class", "delete", class_name=class_name)
+        finally:
+            if archive_path:
+                conn.exec_driver_sql("DETACH DATABASE archive")
+                conn.commit()
+
+    # Rows vanished underneath the request session
+    db.expire_all()
+    changes.publish(event, tenant_of(db))
+
+    print(f"Class {class_name} removed: {removed} (archive: {archive_path or 'none'})")
+    return removed
@@ -1,20 +1,62 @@
 """
 Database configuration and session management
 """
+import os
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Create SQLite database engine
-SQLALCHEMY_DATABASE_URL = "sqlite:///../database.db"
+# Create SQLite database engine (DATABASE_URL points seeding and benchmarks elsewhere)
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///../database.db")
+
+# Create missing tables on app startup (0 when a deploy step runs migrate.py)
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP", "1") == "1"
+
+# Per-request SQL statement count and DB time as response headers
+SQL_DEBUG = os.environ.get("SQL_DEBUG", "0") == "1"
+
+# Statements slower than this are logged with their call site
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Commit mark/attendance writes in groups from one writer thread (write_queue.py)
+GROUP_COMMIT = os.environ.get("GROUP_COMMIT", "0") == "1"
+
+# Online backups (backups.py): where they go, how many are kept per school, and
+# how often the app takes them (0 = only on demand / from cron)
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "../backups")
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", 7))
+BACKUP_INTERVAL_HOURS = float(os.environ.get("BACKUP_INTERVAL_HOURS", 0))
+
+# Minutes between at-risk score refreshes in the app
+# (0 = only on demand / `python risk.py run`)
+RISK_INTERVAL_MINUTES = float(os.environ.get("RISK_INTERVAL_MINUTES", 0))
+
+# SQLite file that archived classes are moved into
+ARCHIVE_DATABASE_PATH = "../archive.db"
+
+# Directory holding the columnar analytics snapshot
+SNAPSHOT_DIR = "../snapshot"
+
+# Multi-school: the default school is the database above, every other school
+# has its own file (and archive, snapshot) under TENANTS_DIR (see tenants.py)
+DEFAULT_TENANT = "default"
+TENANTS_DIR = os.environ.get("TENANTS_DIR", "../schools")
+
+# Schools with an open engine at once; the least recently used is closed beyond this
+MAX_OPEN_TENANTS = int(os.environ.get("MAX_OPEN_TENANTS", 32))
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"tenant": DEFAULT_TENANT})
 
 Base = declarative_base()
 
+def tenant_of(db) -> str:
+    """School a session belongs to"""
+    return db.info.get("tenant", DEFAULT_TENANT)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,189 @@
+"""
+Live push of change-feed entries to open dashboards (Server-Sent Events)
+
+changes.publish() hands every change here once it commits. Each open
+
+    GET /api/events?token=...[&class_name=10A | &mine=true]
+
+stream holds a bounded queue on the event loop and receives the entries in
+its scope as `data: {...}` frames, the same shape /api/changes returns:
+
+    unscoped   (teachers)  every change
+    class_name (teachers)  students, marks and attendance of one class
+    mine       (teachers)  students, marks and attendance of their own students
+    students               always scoped to their own records
+
+Publishing happens on worker threads; delivery is handed to each stream's
+loop with call_soon_threadsafe, and scope matching runs there. A stream whose
+queue overflows gets a `reset` event and is closed; the client resyncs from
+/api/changes. Subscribers are per process: with several workers each process
+only pushes the writes it handled itself. A stream only receives changes of
+its user's school (student and class ids repeat across schools).
+"""
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from database import DEFAULT_TENANT, tenant_of
+from models import Student
+
+QUEUE_SIZE = 256
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 5000
+
+
+class Subscription:
+    """One open event stream and the records it may see"""
+
+    def __init__(
+        self,
+        role: str,
+        class_name: Optional[str] = None,
+        teacher_id: Optional[int] = None,
+        student_ids: Optional[Set[int]] = None,
+        tenant: str = DEFAULT_TENANT
+    ):
+        self.role = role
+        self.tenant = tenant
+        self.class_name = class_name
+        self.teacher_id = teacher_id
+        # None = every student; otherwise grows/shrinks as students move in or out of scope
+        self.student_ids = student_ids
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def in_scope(self, student: Dict[str, Any]) -> bool:
+        if self.class_name is not None:
+            return student["class_name"] == self.class_name
+        if self.teacher_id is not None:
+            return student["teacher_id"] == self.teacher_id
+        return False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        """Scope check; runs on the subscriber's loop, so it may update student_ids"""
+        student_id = event["student_id"]
+
+        # Teacher list and class archives: teachers only
+        if student_id is None:
+            if self.role != "teacher":
+                return False
+            return self.class_name is None or event["class_name"] == self.class_name
+
+        if self.student_ids is None:
+            return True
+
+        known = student_id in self.student_ids
+
+        if event["entity"] == "student" and self.role == "teacher":
+            if event["op"] == "delete":
+                self.student_ids.discard(student_id)
+            elif self.in_scope(event["payload"]):
+                self.student_ids.add(student_id)
+                return True
+            else:
+                # Moved out of scope: deliver once so the client can drop it
+                self.student_ids.discard(student_id)
+
+        return known
+
+    def offer(self, event: Dict[str, Any]):
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broadcaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+
+    def add(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.append(subscription)
+
+    def remove(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def publish(self, event: Dict[str, Any], tenant: str = DEFAULT_TENANT):
+        """Hand an event to every stream of its school (safe to call from any thread)"""
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.tenant == tenant]
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Loop already closed (server shutting down)
+                self.remove(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+broadcaster = Broadcaster()
+
+
+def publish(event: Dict[str, Any], tenant: str = DEFAULT_TENANT):
+    broadcaster.publish(event, tenant)
+
+
+def resolve_scope(
+    db: Session,
+    user_id: int,
+    role: str,
+    class_name: Optional[str] = None,
+    mine: bool = False
+) -> Dict[str, Any]:
+    """Subscription arguments for a user (students are always scoped to themselves)"""
+    tenant = tenant_of(db)
+
+    if role != "teacher":
+        student_id = db.query(Student.id).filter(Student.user_id == user_id).scalar()
+        return {"role": role, "student_ids": {student_id} if student_id else set(), "tenant": tenant}
+
+    if class_name is not None:
+        ids = db.query(Student.id).filter(Student.class_name == class_name)
+        return {"role": role, "class_name": class_name, "student_ids": {row.id for row in ids}, "tenant": tenant}
+
+    if mine:
+        ids = db.query(Student.id).filter(Student.teacher_id == user_id)
+        return {"role": role, "teacher_id": user_id, "student_ids": {row.id for row in ids}, "tenant": tenant}
+
+    return {"role": role, "tenant": tenant}
+
+
+def _frame(event: Dict[str, Any]) -> str:
+    return f"id: {event['cursor']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def stream(scope: Dict[str, Any], is_disconnected) -> AsyncIterator[str]:
+    """SSE frames for one client until it disconnects or falls behind"""
+    subscription = Subscription(**scope)
+    broadcaster.add(subscription)
+
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        while not await is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield _frame(event)
+
+            if subscription.overflowed and subscription.queue.empty():
+                yield "event: reset\ndata: {}\n\n"
+                break
+    finally:
+        broadcaster.remove(subscription)
@@ -0,0 +1,148 @@
+"""
+Streaming gradebook export (NDJSON / CSV)
+
+Rows are read with `yield_per`, so SQLite hands them over in batches through
+a server-side cursor and nothing is accumulated: memory stays flat whether the
+school has a hundred rows or millions. Each export opens its own session,
+because the response body is produced after the request handler returns.
+"""
+import csv
+import io
+import json
+from datetime import date
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import select
+
+from database import SessionLocal
+from models import Attendance, Mark, Student, User
+from partitions import academic_year, archived_years, partition_table
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched from SQLite per batch, also the number of lines per chunk sent
+BATCH_SIZE = 1000
+
+
+# ---------------- QUERIES ---------------- #
+
+def students_queries(db, filters: Dict):
+    query = select(
+        Student.id,
+        Student.user_id,
+        User.name,
+        User.email,
+        Student.class_name,
+        Student.roll_no,
+        Student.teacher_id
+    ).join(User, User.id == Student.user_id)
+
+    if filters.get("class_name"):
+        query = query.where(Student.class_name == filters["class_name"])
+    if filters.get("student_id"):
+        query = query.where(Student.id == filters["student_id"])
+
+    yield query.order_by(Student.id)
+
+
+def marks_queries(db, filters: Dict):
+    query = select(Mark.id, Mark.student_id, Mark.subject, Mark.marks)
+
+    if filters.get("class_name"):
+        query = query.where(Mark.student_id.in_(
+            select(Student.id).where(Student.class_name == filters["class_name"])
+        ))
+    if filters.get("student_id"):
+        query = query.where(Mark.student_id == filters["student_id"])
+    if filters.get("subject"):
+        query = query.where(Mark.subject == filters["subject"])
+
+    yield query.order_by(Mark.id)
+
+
+def attendance_queries(db, filters: Dict):
+    start: Optional[date] = filters.get("start")
+    end: Optional[date] = filters.get("end")
+
+    # Archived years outside the requested range are skipped entirely
+    tables = [
+        partition_table(year) for year in archived_years(db)
+        if (not start or year >= academic_year(start)) and (not end or year <= academic_year(end))
+    ] + [Attendance.__table__]
+
+    for table in tables:
+        query = select(table.c.id, table.c.student_id, table.c.date, table.c.status)
+
+        if filters.get("class_name"):
+            query = query.where(table.c.student_id.in_(
+                select(Student.id).where(Student.class_name == filters["class_name"])
+            ))
+        if filters.get("student_id"):
+            query = query.where(table.c.student_id == filters["student_id"])
+        if start:
+            query = query.where(table.c.date >= start)
+        if end:
+            query = query.where(table.c.date <= end)
+
+        yield query
+
+
+EXPORTS = {
+    "students": (
+        ["id", "user_id", "name", "email", "class_name", "roll_no", "teacher_id"],
+        students_queries
+    ),
+    "marks": (["id", "student_id", "subject", "marks"], marks_queries),
+    "attendance": (["id", "student_id", "date", "status"], attendance_queries),
+}
+
+
+# ---------------- STREAMING ---------------- #
+
+def _batches(kind: str, filters: Dict, session_factory) -> Iterator:
+    """Row batches straight from the cursor"""
+    _, build_queries = EXPORTS[kind]
+    db = session_factory()
+
+    try:
+        for query in build_queries(db, filters):
+            result = db.execute(query.execution_options(yield_per=BATCH_SIZE))
+            for batch in result.partitions():
+                yield batch
+    finally:
+        db.close()
+
+
+def stream_export(
+    kind: str,
+    fmt: str = "ndjson",
+    filters: Optional[Dict] = None,
+    session_factory=SessionLocal
+) -> Iterator[str]:
+    """Yield the export as text chunks of up to BATCH_SIZE lines"""
+    columns, _ = EXPORTS[kind]
+    filters = filters or {}
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        for batch in _batches(kind, filters, session_factory):
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        # Header of an empty export
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    for batch in _batches(kind, filters, session_factory):
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in batch
+        )
@@ -0,0 +1,106 @@
+"""
+Sparse fieldsets: `?fields=` on list endpoints
+
+`fields` is a comma-separated list of response fields, with dots reaching
+into nested objects and lists, e.g.
+
+    /api/students?fields=id,roll_no,user.name
+    /api/dashboard?fields=total_students,recent_marks.subject,recent_marks.marks
+
+Paths are checked against the endpoint's response schema (unknown fields,
+and dots after a field that is not an object, are a 400). The parsed field tree is passed to the read layer so only those
+columns are selected, and `project` trims the serialized output to match.
+"""
+from typing import Any, Dict, Optional, Type, get_args
+
+from fastapi import HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from fast_json import trusted_dump
+
+# {field: None (whole field) or a nested tree}
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+
+def nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """Model inside an annotation such as UserResponse, List[MarkResponse] or Optional[...]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+
+    for arg in get_args(annotation):
+        model = nested_model(arg)
+        if model:
+            return model
+
+    return None
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[FieldTree]:
+    """Parse and validate a fields parameter (None means every field)"""
+    if not fields:
+        return None
+
+    tree: FieldTree = {}
+
+    for path in filter(None, (part.strip() for part in fields.split(","))):
+        node, model = tree, schema
+        names = path.split(".")
+
+        for depth, name in enumerate(names):
+            if model is None or name not in model.model_fields:
+                raise ValueError(f"Unknown field: {path}")
+
+            if depth == len(names) - 1:
+                node[name] = None
+                continue
+
+            nested = nested_model(model.model_fields[name].annotation)
+            if nested is None:
+                raise ValueError(f"Not an object field: {'.'.join(names[:depth + 1])} (in {path})")
+            if name in node and node[name] is None:
+                # The whole object was already requested
+                break
+            node, model = node.setdefault(name, {}), nested
+
+    return tree
+
+
+def fieldset(schema: Type[BaseModel]):
+    """Dependency parsing `?fields=` against a response schema"""
+    def dependency(fields: Optional[str] = Query(None)) -> Optional[FieldTree]:
+        try:
+            return parse_fields(fields, schema)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return dependency
+
+
+def _get(obj: Any, name: str):
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name)
+
+
+def project(obj: Any, tree: FieldTree, schema: Type[BaseModel]) -> Dict[str, Any]:
+    """Serialize only the fields in the tree"""
+    data = {}
+
+    for name, subtree in tree.items():
+        value = _get(obj, name)
+        model = nested_model(schema.model_fields[name].annotation)
+
+        if model is None or value is None:
+            data[name] = value
+            continue
+
+        dump = (lambda item: trusted_dump(item, model)) if subtree is None else (
+            lambda item: project(item, subtree, model)
+        )
+        data[name] = [dump(item) for item in value] if isinstance(value, list) else dump(value)
+
+    return data
+
+
+def projected_response(items, tree: FieldTree, schema: Type[BaseModel]) -> ORJSONResponse:
+    """List response trimmed to a field tree"""
+    return ORJSONResponse([project(item, tree, schema) for item in items])
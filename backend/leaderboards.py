@@ -0,0 +1,104 @@
+"""
+Class leaderboards: rank-in-class and rank-in-subject
+
+Ranks are computed in SQL with window functions over the per-subject
+rollups (student_subject_marks), so a class costs one pass over
+students x subjects rows, never over individual marks:
+
+    overall   mean of a student's subject averages (each subject weighs the same)
+    subjects  a student's average mark in the subject
+
+    rank        DENSE_RANK, 1 = best, ties share a rank
+    percentile  PERCENT_RANK * 100, 100 = best, 0 = lowest; 100 for everyone
+                when all share one average (e.g. a student alone in a subject)
+
+A class's leaderboard is cached (cache.py, namespace "leaderboard:<class>")
+until a mark in that class is written or students join, leave or move.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import cache
+from database import tenant_of
+
+CACHE_NAMESPACE = "leaderboard"
+
+_SUBJECT_RANKS = text("""
+    WITH per_subject AS (
+        SELECT m.student_id, m.subject, m.total * 1.0 / m.count AS average
+        FROM student_subject_marks m
+        JOIN students s ON s.id = m.student_id
+        WHERE s.class_name = :class_name
+    )
+    SELECT student_id, subject, average,
+           DENSE_RANK() OVER (PARTITION BY subject ORDER BY average DESC) AS rank,
+           CASE WHEN MIN(average) OVER subject_scores = MAX(average) OVER subject_scores THEN 100.0
+                ELSE PERCENT_RANK() OVER (subject_scores ORDER BY average) * 100 END AS percentile
+    FROM per_subject
+    WINDOW subject_scores AS (PARTITION BY subject)
+    ORDER BY subject, rank, student_id
+""")
+
+_OVERALL_RANKS = text("""
+    WITH per_student AS (
+        SELECT s.id AS student_id, u.name AS name, AVG(m.total * 1.0 / m.count) AS average
+        FROM students s
+        JOIN users u ON u.id = s.user_id
+        JOIN student_subject_marks m ON m.student_id = s.id
+        WHERE s.class_name = :class_name
+        GROUP BY s.id, u.name
+    )
+    SELECT student_id, name, average,
+           DENSE_RANK() OVER (ORDER BY average DESC) AS rank,
+           CASE WHEN MIN(average) OVER () = MAX(average) OVER () THEN 100.0
+                ELSE PERCENT_RANK() OVER (ORDER BY average) * 100 END AS percentile
+    FROM per_student
+    ORDER BY rank, student_id
+""")
+
+
+def _compute(db: Session, class_name: str) -> Dict[str, Any]:
+    params = {"class_name": class_name}
+
+    overall = [dict(row._mapping) for row in db.execute(_OVERALL_RANKS, params)]
+
+    subjects: Dict[str, List[Dict[str, Any]]] = {}
+    for row in db.execute(_SUBJECT_RANKS, params):
+        entry = dict(row._mapping)
+        subjects.setdefault(entry.pop("subject"), []).append(entry)
+
+    return {"class_name": class_name, "overall": overall, "subjects": subjects}
+
+
+def class_leaderboard(db: Session, class_name: str) -> Dict[str, Any]:
+    """Overall and per-subject ranks for a class (cached; treat as read-only)"""
+    return cache.cached_for_class(
+        CACHE_NAMESPACE, class_name, lambda: _compute(db, class_name), tenant_of(db)
+    )
+
+
+def student_rank(db: Session, student_id: int, class_name: str) -> Dict[str, Any]:
+    """One student's rank in class and in each subject, read from the class leaderboard"""
+    board = class_leaderboard(db, class_name)
+
+    def find(entries) -> Optional[Dict[str, Any]]:
+        for entry in entries:
+            if entry["student_id"] == student_id:
+                return {key: entry[key] for key in ("average", "rank", "percentile")}
+        return None
+
+    subjects = {}
+    for subject, entries in board["subjects"].items():
+        rank = find(entries)
+        if rank is not None:
+            subjects[subject] = dict(rank, ranked=len(entries))
+
+    return {
+        "student_id": student_id,
+        "class_name": class_name,
+        "ranked": len(board["overall"]),
+        "overall": find(board["overall"]),
+        "subjects": subjects
+    }
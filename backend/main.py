@@ -1,15 +1,19 @@
 """
 FastAPI application main file
 """
-from fastapi import FastAPI, Depends, HTTPException, Query
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 from fastapi import FastAPI, Depends, HTTPException, Query, status
-from database import get_db
-from database import engine
-from models import Base, User, Student, Mark, Attendance
+from database import engine, SessionLocal, DEFAULT_TENANT, MIGRATE_ON_STARTUP, GROUP_COMMIT, BACKUP_INTERVAL_HOURS, RISK_INTERVAL_MINUTES, tenant_of
+from tenants import Tenant, UnknownTenant, current_tenant, get_db
+from models import User, Student, Mark, Attendance
 from schemas import (
     LoginResponse,
     UserLogin,
@@ -17,34 +21,101 @@ from schemas import (
     UserResponse,
     StudentCreate,
     StudentResponse,
+    StudentSearchResult,
     MarkCreate,
     MarkResponse,
     AttendanceCreate,
     AttendanceResponse,
+    AttendanceSummary,
+    DashboardResponse,
+    BootstrapResponse,
+    ChangesResponse,
     AIReportRequest,
-    AIReportResponse
+    AIReportResponse,
+    AtRiskStudent
 )
 
 from crud import (
     get_user_by_email,
     get_all_teachers,
     get_all_students,
+    get_student_by_user,
     get_student_by_id,
     get_students_by_teacher,
+    count_students_by_teacher,
     get_marks_by_student,
     get_attendance_by_student,
     get_dashboard_stats,
-    verify_password,
-    hash_password
+    hash_password,
+    set_password_hash,
+    archive_class,
+    stage_attendance,
+    stage_mark,
+    update_student as edit_student,
+    delete_student as remove_student
 )
 from auth import TokenManager
+from migrate import init_db
+from passwords import PasswordHasherBusy, verify_password_async
+import sql_metrics
+import profiler
+import ratelimit
+import write_queue
+import tenants
+import backups
+import risk
+from search import search_students
+import attendance_index
+import rollups
+import leaderboards
+import export
+import changes
+import events
+import cache
+from fast_json import fast_response
+from fieldsets import fieldset, project, projected_response
 import ai
 
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Columns behind the bootstrap's roster and teacher summaries
+STUDENT_SUMMARY_FIELDS = {
+    "id": None, "class_name": None, "roll_no": None, "teacher_id": None, "user": {"name": None}
+}
+TEACHER_SUMMARY_FIELDS = {"id": None, "name": None, "email": None}
 
-app = FastAPI(title="AI School Management System")
+
+def warm_up():
+    """Open the first pooled connection and preload the bootstrap's cached lists"""
+    db = SessionLocal()
+    try:
+        get_all_teachers(db, TEACHER_SUMMARY_FIELDS)
+        get_all_students(db, STUDENT_SUMMARY_FIELDS)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema setup and warm-up run once per worker before it takes traffic,
+    # not at import time (tools importing main don't touch the database)
+    if MIGRATE_ON_STARTUP:
+        init_db(engine)
+    warm_up()
+    if GROUP_COMMIT:
+        write_queue.start()
+    if BACKUP_INTERVAL_HOURS:
+        backups.start()
+    if RISK_INTERVAL_MINUTES:
+        risk.start()
+    print("✅ Startup complete")
+    yield
+    risk.stop()
+    backups.stop()
+    write_queue.stop()
+    tenants.registry.close_all()
+
+
+app = FastAPI(title="AI School Management System", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -54,6 +125,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+EVENTS_PATH = "/api/events"
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip, except for the event stream (gzip would hold events back in its buffer)"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress responses above ~1 KB for clients that accept gzip
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=6)
+
+# Teachers can profile a single request with ?profile=1 (inside the SQL metrics)
+app.add_middleware(profiler.ProfilerMiddleware)
+
+# Statement count and DB time per request (slow-query log, SQL_DEBUG headers)
+sql_metrics.install(engine)
+app.add_middleware(sql_metrics.SQLMetricsMiddleware)
+
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    """Shed logins instead of queueing them behind a full hashing pool"""
+    print(f"⚠️ Password hashing saturated: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many logins in progress, try again shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(UnknownTenant)
+def unknown_tenant(request: Request, exc: UnknownTenant):
+    """A token's school whose database is gone"""
+    print(f"❌ Unknown school: {exc}")
+    return JSONResponse(status_code=404, content={"detail": "School not found"})
+
+@app.exception_handler(ratelimit.RateLimited)
+def rate_limited(request: Request, exc: ratelimit.RateLimited):
+    """429 for requests over their cost class's rate or concurrency limit"""
+    print(f"⚠️ Rate limited {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Too many {exc.cost_class} requests ({exc.reason}), try again later"},
+        headers={"Retry-After": exc.retry_after_header}
+    )
+
 
 # Dependency to validate token
 # Dependency to validate token
@@ -87,18 +205,49 @@ def require_teacher(user: User = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Teacher access required")
     return user
 
+def rate_limit(cost_class: str):
+    """Dependency: admit the request under its cost class's limits (see ratelimit.py)"""
+    async def admit(current_user: User = Depends(get_current_user), tenant: Tenant = Depends(current_tenant)):
+        with ratelimit.admit(cost_class, current_user.id, tenant.name):
+            yield
+    return admit
+
 # API Endpoints
 
 @app.post("/api/login", response_model=LoginResponse)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
-    """Login endpoint"""
-    user = get_user_by_email(db, credentials.email)
-    
-    if not user or not verify_password(credentials.password, user.password):
+async def login(credentials: UserLogin):
+    """Login endpoint (the password check runs on the hashing pool, off this loop)"""
+    user = None
+    try:
+        # Opening a school's engine the first time may migrate its database
+        tenant = await run_in_threadpool(tenants.get, credentials.school or DEFAULT_TENANT)
+    except UnknownTenant:
+        # Unknown school: same answer (and cost) as an unknown email
+        tenant = None
+    else:
+        db = tenant.session_factory()
+        user = await run_in_threadpool(get_user_by_email, db, credentials.email)
+
+        # Hand the connection back to the pool while the hash is computed: logins
+        # waiting on a busy hashing pool must not starve other requests of connections
+        db.close()
+
+    # Unknown emails are checked against a dummy hash: same cost as a wrong password
+    valid, new_hash = await verify_password_async(credentials.password, user.password if user else None)
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Legacy SHA-256 hash: store the scrypt hash computed during the check
+    if new_hash:
+        try:
+            await run_in_threadpool(set_password_hash, db, user.id, new_hash)
+        finally:
+            db.close()
+        print(f"🔐 Rehashed legacy password for user {user.id}")
     
-    # Generate token
-    token = TokenManager.create_token(user.id, user.role)
+    # Generate token (it carries the school every later request is routed to)
+    token = TokenManager.create_token(user.id, user.role, tenant.name)
     
     return {
         "token": token,
@@ -131,23 +280,32 @@ def create_teacher(
     new_teacher = User(
         name=user_data.name,
         email=user_data.email,
-        password=user_data.password,
+        password=hash_password(user_data.password),
         role="teacher"
     )
 
     db.add(new_teacher)
-    db.commit()
+    db.flush()
+
+    change = changes.stage(db, "user", "create", new_teacher.id, changes.user_payload(new_teacher))
+    changes.commit(db, change)
     db.refresh(new_teacher)
 
     return new_teacher
 
 @app.get("/api/teachers", response_model=List[UserResponse])
 def get_teachers(
+    fast: bool = Query(False),
+    fields: Optional[dict] = Depends(fieldset(UserResponse)),
     current_user: User = Depends(require_teacher),
     db: Session = Depends(get_db)
 ):
     """Get all teachers"""
-    return get_all_teachers(db)
+    teachers = get_all_teachers(db, fields)
+
+    if fields:
+        return projected_response(teachers, fields, UserResponse)
+    return fast_response(teachers, UserResponse) if fast else teachers
 
 # Student endpoints
 @app.post("/api/students")
@@ -170,13 +328,12 @@ def create_student(
     new_user = User(
         name=student.name,
         email=student.email,
-        password=student.password,
+        password=hash_password(student.password),
         role="student"
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
 
     # Create student profile
     new_student = Student(
@@ -187,7 +344,15 @@ def create_student(
     )
 
     db.add(new_student)
-    db.commit()
+    db.flush()
+
+    # User, student and feed entry commit together
+    change = changes.stage(
+        db, "student", "create", new_student.id,
+        changes.student_payload(new_student, new_user),
+        student_id=new_student.id, class_name=new_student.class_name
+    )
+    changes.commit(db, change)
 
     return {
         "message": "Student created successfully",
@@ -202,16 +367,33 @@ def create_student(
 
 @app.get("/api/students", response_model=List[StudentResponse])
 def get_students(
+    fast: bool = Query(False),
+    fields: Optional[dict] = Depends(fieldset(StudentResponse)),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all students (teachers see all, students see only themselves)"""
     if current_user.role == "teacher":
-        return get_all_students(db)
+        students = get_all_students(db, fields)
     else:
         # Students can only see their own profile
-        student = db.query(Student).filter(Student.user_id == current_user.id).first()
-        return [student] if student else []
+        student = get_student_by_user(db, current_user.id, fields)
+        students = [student] if student else []
+
+    if fields:
+        return projected_response(students, fields, StudentResponse)
+    return fast_response(students, StudentResponse) if fast else students
+
+@app.get("/api/students/search", response_model=List[StudentSearchResult])
+def search_students_endpoint(
+    q: str = Query(..., min_length=1),
+    class_name: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(require_teacher),
+    db: Session = Depends(get_db)
+):
+    """Typeahead search over name, email, roll number and class (best match first)"""
+    return search_students(db, q, class_name, limit)
 
 # Marks endpoints
 @app.post("/api/marks", response_model=MarkResponse)
@@ -228,15 +410,20 @@ def create_mark(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # ✅ Create mark
-    new_mark = Mark(
-        student_id=mark_data.student_id,
-        subject=mark_data.subject,
-        marks=mark_data.marks
+    # Group commit: the writer thread commits this with other marks arriving now
+    # (hand the connection back first: the writer needs one from the same pool)
+    if GROUP_COMMIT:
+        student_id, class_name = student.id, student.class_name
+        db.close()
+        return write_queue.submit("mark", mark_data, student_id, class_name, tenant_of(db))
+
+    # ✅ Create mark (the subject rollup and feed entry commit with it)
+    new_mark = stage_mark(db, mark_data)
+    change = changes.stage(
+        db, "mark", "create", new_mark.id, changes.mark_payload(new_mark),
+        student_id=student.id, class_name=student.class_name
     )
-
-    db.add(new_mark)
-    db.commit()
+    changes.commit(db, change)
     db.refresh(new_mark)
 
     return new_mark
@@ -245,6 +432,8 @@ def create_mark(
 @app.get("/api/marks/{student_id}", response_model=List[MarkResponse])
 def get_marks(
     student_id: int,
+    fast: bool = Query(False),
+    fields: Optional[dict] = Depends(fieldset(MarkResponse)),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -256,8 +445,11 @@ def get_marks(
         if not student or student.id != student_id:
             raise HTTPException(status_code=403, detail="Access denied")
     
-    marks = get_marks_by_student(db, student_id)
-    return marks
+    marks = get_marks_by_student(db, student_id, fields)
+
+    if fields:
+        return projected_response(marks, fields, MarkResponse)
+    return fast_response(marks, MarkResponse) if fast else marks
 
 # Attendance endpoints
 @app.post("/api/attendance", response_model=AttendanceResponse)
@@ -274,15 +466,21 @@ def create_attendance(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # ✅ Create attendance
-    new_attendance = Attendance(
-        student_id=attendance_data.student_id,
-        date=attendance_data.date,
-        status=attendance_data.status
+    # ✅ Create attendance (routed to the current academic year's partition)
+    try:
+        if GROUP_COMMIT:
+            student_id, class_name = student.id, student.class_name
+            db.close()
+            return write_queue.submit("attendance", attendance_data, student_id, class_name, tenant_of(db))
+        new_attendance, op = stage_attendance(db, attendance_data, student.class_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    change = changes.stage(
+        db, "attendance", op, new_attendance.id, changes.attendance_payload(new_attendance),
+        student_id=student.id, class_name=student.class_name
     )
-
-    db.add(new_attendance)
-    db.commit()
+    changes.commit(db, change)
     db.refresh(new_attendance)
 
     return new_attendance
@@ -291,10 +489,13 @@ def create_attendance(
 @app.get("/api/attendance/{student_id}", response_model=List[AttendanceResponse])
 def get_attendance(
     student_id: int,
+    year: Optional[int] = Query(None),
+    fast: bool = Query(False),
+    fields: Optional[dict] = Depends(fieldset(AttendanceResponse)),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get attendance for a student"""
+    """Get attendance for a student (optionally a single academic year)"""
     # Authorization check
     if current_user.role == "student":
         # Students can only see their own attendance
@@ -302,28 +503,152 @@ def get_attendance(
         if not student or student.id != student_id:
             raise HTTPException(status_code=403, detail="Access denied")
     
-    attendance = get_attendance_by_student(db, student_id)
-    return attendance
+    attendance = get_attendance_by_student(db, student_id, year, fields)
+
+    if fields:
+        return projected_response(attendance, fields, AttendanceResponse)
+    return fast_response(attendance, AttendanceResponse) if fast else attendance
+
+@app.get("/api/attendance/{student_id}/summary", response_model=AttendanceSummary)
+def get_attendance_summary(
+    student_id: int,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Attendance counts, percentage and streaks from the bitmap index"""
+    # Authorization check
+    if current_user.role == "student":
+        # Students can only see their own attendance
+        student = db.query(Student).filter(Student.user_id == current_user.id).first()
+        if not student or student.id != student_id:
+            raise HTTPException(status_code=403, detail="Access denied")
+
+    present_days, total_days = attendance_index.attendance_counts(db, student_id, start, end)
+
+    return {
+        "student_id": student_id,
+        "present_days": present_days,
+        "total_days": total_days,
+        "percentage": (present_days / total_days) * 100 if total_days > 0 else 0,
+        "streaks": attendance_index.streaks(db, student_id)
+    }
 
 # Dashboard endpoint
 @app.get("/api/dashboard")
 def get_dashboard(
+    fields: Optional[dict] = Depends(fieldset(DashboardResponse)),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get dashboard data"""
-    stats = get_dashboard_stats(db)
+    """Get dashboard data (?fields= trims it to the requested keys)"""
+    stats = get_dashboard_stats(db, fields)
     
     # For teachers, add their student count
     if current_user.role == "teacher":
-        my_students = get_students_by_teacher(db, current_user.id)
-        stats["my_students_count"] = len(my_students)
-        stats["my_students"] = my_students
+        if fields is None or "my_students" in fields:
+            my_students = get_students_by_teacher(
+                db, current_user.id, fields["my_students"] if fields else None
+            )
+            stats["my_students_count"] = len(my_students)
+            stats["my_students"] = my_students
+        elif "my_students_count" in fields:
+            stats["my_students_count"] = count_students_by_teacher(db, current_user.id)
     
+    if fields:
+        return ORJSONResponse(project(stats, fields, DashboardResponse))
     return stats
 
+@app.get("/api/me", response_model=UserResponse)
+def get_me(current_user: User = Depends(get_current_user)):
+    """Current user (cheap token check)"""
+    return current_user
+
+@app.get("/api/bootstrap", response_model=BootstrapResponse)
+def get_bootstrap(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Everything the dashboard needs on load, from one session"""
+    # Read the feed position first: changes after it are replayed by the client
+    cursor = changes.latest_cursor(db)
+    dashboard = get_dashboard_stats(db)
+    teachers = []
+
+    if current_user.role == "teacher":
+        dashboard["my_students_count"] = count_students_by_teacher(db, current_user.id)
+        students = get_all_students(db, STUDENT_SUMMARY_FIELDS)
+        teachers = get_all_teachers(db, TEACHER_SUMMARY_FIELDS)
+    else:
+        student = get_student_by_user(db, current_user.id, STUDENT_SUMMARY_FIELDS)
+        students = [student] if student else []
+
+    return {
+        "user": current_user,
+        "dashboard": dashboard,
+        "students": [
+            {
+                "id": s.id,
+                "class_name": s.class_name,
+                "roll_no": s.roll_no,
+                "name": s.user.name,
+                "teacher_id": s.teacher_id
+            }
+            for s in students
+        ],
+        "teachers": teachers,
+        "cursor": cursor
+    }
+
+@app.get("/api/changes", response_model=ChangesResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(changes.CHANGES_PAGE_SIZE, ge=1, le=5000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Creates, updates and deletes after a cursor (students see only their own)"""
+    student_id = None
+    if current_user.role == "student":
+        student = get_student_by_user(db, current_user.id, {"id": None})
+        student_id = student.id if student else 0
+
+    return changes.changes_since(db, since, student_id, limit)
+
+def _event_scope(tenant: Tenant, user_id: int, role: str, class_name: Optional[str], mine: bool):
+    db = tenant.session_factory()
+    try:
+        return events.resolve_scope(db, user_id, role, class_name, mine)
+    finally:
+        db.close()
+
+@app.get(EVENTS_PATH)
+async def stream_events(
+    request: Request,
+    token: str = Query(...),
+    class_name: Optional[str] = Query(None),
+    mine: bool = Query(False)
+):
+    """Push change events as they happen (Server-Sent Events)"""
+    # No get_db here: a session must not stay checked out for the life of the stream
+    token_data = TokenManager.validate_token(token)
+    if not token_data:
+        raise HTTPException(status_code=401, detail="Invalid or expired token. Please login again.")
+
+    tenant = await run_in_threadpool(tenants.get, token_data["tenant"])
+    scope = await run_in_threadpool(
+        _event_scope, tenant, token_data["user_id"], token_data["role"], class_name, mine
+    )
+
+    return StreamingResponse(
+        events.stream(scope, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # AI Report endpoint
-@app.post("/api/ai-report", response_model=AIReportResponse)
+@app.post("/api/ai-report", response_model=AIReportResponse, dependencies=[Depends(rate_limit("ai"))])
 def generate_ai_report(
     report_request: AIReportRequest,
     current_user: User = Depends(get_current_user),
@@ -345,7 +670,7 @@ def generate_ai_report(
     # Generate AI report
     report = ai.generate_student_report(report_request.student_id, db)
     return report
-@app.get("/api/debug/students")
+@app.get("/api/debug/students", dependencies=[Depends(rate_limit("debug"))])
 def debug_students(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -383,6 +708,156 @@ def debug_students(
         }
     except Exception as e:
         return {"error": str(e)}
+@app.get("/api/debug/cache")
+def debug_cache(current_user: User = Depends(require_teacher)):
+    """Hit/miss counters of the reference-data cache"""
+    return cache.stats()
+
+@app.get("/api/debug/writes")
+def debug_writes(current_user: User = Depends(require_teacher), tenant: Tenant = Depends(current_tenant)):
+    """Group-commit writer counters of this school (batches, average batch size)"""
+    return write_queue.stats(tenant.name)
+
+@app.get("/api/debug/tenants")
+def debug_tenants(current_user: User = Depends(require_teacher), tenant: Tenant = Depends(current_tenant)):
+    """Open school engines (least recently used first), opened/evicted counters"""
+    # Lists every school: teachers of the default (operator's) school only
+    if tenant.name != DEFAULT_TENANT:
+        raise HTTPException(status_code=403, detail="Teacher access required")
+    return tenants.stats()
+
+@app.get("/api/debug/ratelimits")
+def debug_ratelimits(current_user: User = Depends(require_teacher)):
+    """Admitted/rejected counters and limits per cost class"""
+    return ratelimit.stats()
+
+@app.get("/api/debug/profiles")
+def debug_profiles(current_user: User = Depends(require_teacher), tenant: Tenant = Depends(current_tenant)):
+    """Recent request profiles (newest first); profile a request with ?profile=1"""
+    return profiler.list_profiles(tenant.name)
+
+@app.get("/api/debug/profiles/{profile_id}")
+def debug_profile(
+    profile_id: str,
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """Call tree, collapsed stacks and SQL timings of one profiled request"""
+    profile = profiler.get_profile(profile_id, tenant.name)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.get("/api/debug/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def debug_profile_collapsed(
+    profile_id: str,
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """Collapsed stacks, for flamegraph.pl or speedscope"""
+    profile = profiler.get_profile(profile_id, tenant.name)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile["collapsed"]
+
+@app.get("/api/export/{kind}", dependencies=[Depends(rate_limit("export"))])
+def export_data(
+    kind: str,
+    format: str = Query("ndjson"),
+    class_name: Optional[str] = Query(None),
+    student_id: Optional[int] = Query(None),
+    subject: Optional[str] = Query(None),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """Stream students, marks or attendance as NDJSON or CSV"""
+    if kind not in export.EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {kind}")
+
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+
+    filters = {
+        "class_name": class_name,
+        "student_id": student_id,
+        "subject": subject,
+        "start": start,
+        "end": end
+    }
+
+    return StreamingResponse(
+        export.stream_export(kind, format, filters, tenant.session_factory),
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{format}"'}
+    )
+
+@app.post("/api/snapshot", dependencies=[Depends(rate_limit("export"))])
+def refresh_snapshot(
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant),
+    db: Session = Depends(get_db)
+):
+    """Refresh the columnar analytics snapshot (incremental)"""
+    import snapshot  # pyarrow is loaded on first use, not at startup
+    return snapshot.refresh(db, tenant.snapshot_dir)
+
+@app.post("/api/backup", dependencies=[Depends(rate_limit("export"))])
+def run_backup(
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """Online backup of this school's database (copied in steps; writers keep going)"""
+    return backups.run(tenant.name)
+
+@app.get("/api/backups")
+def get_backups(
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """This school's backup files (newest first) and recent runs with their durations"""
+    return {"backups": backups.list_backups(tenant.name), "runs": backups.history(tenant.name)}
+
+@app.get("/api/at-risk", response_model=List[AtRiskStudent])
+def get_at_risk(
+    class_name: Optional[str] = Query(None),
+    min_level: str = Query("medium"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(require_teacher),
+    db: Session = Depends(get_db)
+):
+    """At-risk students in my classes, highest risk first (scores from the last risk job run)"""
+    if min_level not in risk.LEVELS:
+        raise HTTPException(status_code=400, detail="min_level must be high, medium or low")
+    return risk.at_risk(db, current_user.id, class_name, min_level, limit)
+
+@app.post("/api/at-risk/refresh", dependencies=[Depends(rate_limit("export"))])
+def refresh_at_risk(
+    full: bool = Query(False),
+    current_user: User = Depends(require_teacher),
+    db: Session = Depends(get_db)
+):
+    """Rescore students changed since the last run (everyone with full=true)"""
+    return risk.run(db, full)
+
+@app.get("/api/analytics/school")
+def get_school_analytics(
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant)
+):
+    """School-wide averages and attendance trends, read from the snapshot"""
+    import snapshot
+
+    try:
+        return {
+            "subject_averages": snapshot.subject_averages(tenant.snapshot_dir),
+            "class_subject_averages": snapshot.class_subject_averages(tenant.snapshot_dir),
+            "attendance_trend": snapshot.attendance_trend(tenant.snapshot_dir)
+        }
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -424,23 +899,26 @@ def update_student(
 ):
     """Update student details"""
 
-    db_student = db.query(Student).filter(Student.id == student_id).first()
+    # Updates the user and student rows and moves the class rollups
+    db_student = edit_student(
+        db,
+        student_id,
+        name=student.name,
+        email=student.email,
+        password=student.password,
+        class_name=student.class_name,
+        roll_no=student.roll_no
+    )
 
     if not db_student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # Update User table
-    user = db.query(User).filter(User.id == db_student.user_id).first()
-
-    user.name = student.name
-    user.email = student.email
-    user.password = student.password
-
-    # Update Student table
-    db_student.class_name = student.class_name
-    db_student.roll_no = student.roll_no
-
-    db.commit()
+    change = changes.stage(
+        db, "student", "update", db_student.id,
+        changes.student_payload(db_student, db_student.user),
+        student_id=db_student.id, class_name=db_student.class_name
+    )
+    changes.commit(db, change)
 
     return {"message": "Student updated successfully"}
 
@@ -452,20 +930,82 @@ def delete_student(
 ):
     """Delete student"""
 
-    student = db.query(Student).filter(Student.id == student_id).first()
+    class_name = db.query(Student.class_name).filter(Student.id == student_id).scalar()
+
+    # Removes the user, marks and attendance too, without loading them
+    if not remove_student(db, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    change = changes.stage(db, "student", "delete", student_id, student_id=student_id, class_name=class_name)
+    changes.commit(db, change)
 
+    return {"message": "Student deleted successfully"}
+
+
+@app.get("/api/classes/{class_name}/analytics")
+def get_class_analytics(
+    class_name: str,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(require_teacher),
+    db: Session = Depends(get_db)
+):
+    """Daily presence and subject averages for a class, read from rollups"""
+    return rollups.class_analytics(db, class_name, start, end)
+
+
+@app.get("/api/classes/{class_name}/leaderboard")
+def get_class_leaderboard(
+    class_name: str,
+    current_user: User = Depends(require_teacher),
+    db: Session = Depends(get_db)
+):
+    """Dense ranks and percentiles in class, overall and per subject"""
+    return leaderboards.class_leaderboard(db, class_name)
+
+
+@app.get("/api/students/{student_id}/rank")
+def get_student_rank(
+    student_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """A student's rank in class and in each subject"""
+    student = get_student_by_id(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # Delete related user also
-    user = db.query(User).filter(User.id == student.user_id).first()
+    # Students can only see their own rank
+    if current_user.role == "student" and student.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
 
-    db.delete(student)
-    db.delete(user)
+    return leaderboards.student_rank(db, student_id, student.class_name)
 
-    db.commit()
 
-    return {"message": "Student deleted successfully"}
+@app.delete("/api/classes/{class_name}")
+def delete_class(
+    class_name: str,
+    archive: bool = Query(True),
+    current_user: User = Depends(require_teacher),
+    tenant: Tenant = Depends(current_tenant),
+    db: Session = Depends(get_db)
+):
+    """Remove a whole class (e.g. a graduating class), archiving it by default"""
+
+    removed = archive_class(
+        db,
+        class_name,
+        archive_path=tenant.archive_path if archive else None
+    )
+
+    # The class delete is recorded in the feed by archive_class, in its transaction
+    if removed is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+
+    return {
+        "message": f"Class {class_name} {'archived' if archive else 'deleted'}",
+        "removed": removed
+    }
 
 
 @app.put("/api/teachers/{teacher_id}")
@@ -490,9 +1030,10 @@ def update_teacher(
 
     db_teacher.name = teacher.name
     db_teacher.email = teacher.email
-    db_teacher.password = teacher.password
+    db_teacher.password = hash_password(teacher.password)
 
-    db.commit()
+    change = changes.stage(db, "user", "update", db_teacher.id, changes.user_payload(db_teacher))
+    changes.commit(db, change)
 
     return {"message": "Teacher updated"}
 
@@ -516,6 +1057,7 @@ def delete_teacher(
         raise HTTPException(404, "Teacher not found")
 
     db.delete(teacher)
-    db.commit()
+    change = changes.stage(db, "user", "delete", teacher_id)
+    changes.commit(db, change)
 
     return {"message": "Teacher deleted"}
@@ -0,0 +1,27 @@
+"""
+Schema setup: tables, hot-table indexes and ids, and the student search index
+
+Everything here is idempotent (creates only what is missing). The app runs
+it from its lifespan hook on startup; deployments that run it as a separate
+step set MIGRATE_ON_STARTUP=0 so workers skip it:
+
+    python migrate.py
+"""
+from database import engine as default_engine
+from models import Base, Mark
+from partitions import init_partitions
+from search import init_search
+
+
+def init_db(engine=default_engine):
+    """Create missing tables, indexes, the search index and its triggers"""
+    Base.metadata.create_all(bind=engine)
+    for index in Mark.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    init_partitions(engine)
+    init_search(engine)
+
+
+if __name__ == "__main__":
+    init_db()
+    print("✅ Database schema is up to date")
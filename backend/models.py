@@ -1,7 +1,7 @@
 """
 Database models
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Text, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Text, Float, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -43,6 +43,11 @@ class Mark(Base):
     
     # Relationships
     student = relationship("Student", back_populates="marks")
+    
+    # A student's marks, and the latest per subject (MAX(id), see risk.py)
+    __table_args__ = (
+        Index("ix_marks_student_subject", "student_id", "subject"),
+    )
 
 class Attendance(Base):
     __tablename__ = "attendance"
@@ -53,4 +58,91 @@ class Attendance(Base):
     status = Column(String(10), nullable=False)  # "present" or "absent"
     
     # Relationships
-    student = relationship("Student", back_populates="attendance")
\ No newline at end of file
+    student = relationship("Student", back_populates="attendance")
+
+    # Hot partition only: completed academic years live in attendance_y<year> (see partitions.py)
+    __table_args__ = (
+        Index("ix_attendance_student_date", "student_id", "date"),
+        Index("ix_attendance_date", "date"),
+        # Never reuse ids of rows that were rolled over into a partition
+        {"sqlite_autoincrement": True},
+    )
+
+class AttendanceBitmap(Base):
+    __tablename__ = "attendance_bitmaps"
+    
+    # One row per student per term (academic year), bit i = i-th day of the term
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    term = Column(Integer, primary_key=True)
+    recorded = Column(LargeBinary, nullable=False)  # attendance was taken that day
+    present = Column(LargeBinary, nullable=False)  # student was present that day
+
+# Rollups: maintained by the marks/attendance write paths (see rollups.py)
+class StudentMonthAttendance(Base):
+    __tablename__ = "student_month_attendance"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    present = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+class StudentSubjectMarks(Base):
+    __tablename__ = "student_subject_marks"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    subject = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    min_marks = Column(Float, nullable=False)
+    max_marks = Column(Float, nullable=False)
+
+class ClassDayPresence(Base):
+    __tablename__ = "class_day_presence"
+    
+    class_name = Column(String(50), primary_key=True)
+    date = Column(Date, primary_key=True)
+    present = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+# Change feed: one row per write, the id is the clients' sync cursor (see changes.py)
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)  # user, student, mark, attendance, class
+    entity_id = Column(Integer)
+    op = Column(String(10), nullable=False)  # create, update, delete
+    student_id = Column(Integer)  # scopes the feed for student logins
+    class_name = Column(String(50))
+    payload = Column(Text)  # JSON of the row as clients cache it
+    created_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_change_log_student", "student_id", "id"),
+        # Cursors must never go backwards, even after pruning
+        {"sqlite_autoincrement": True},
+    )
+
+# At-risk scores: one row per student, refreshed by the risk job (see risk.py)
+class StudentRisk(Base):
+    __tablename__ = "student_risk"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    class_name = Column(String(50), nullable=False)
+    score = Column(Float, nullable=False)  # 0-100, higher = more at risk
+    level = Column(String(10), nullable=False)  # "high", "medium" or "low"
+    weak_subjects = Column(Text, nullable=False)  # JSON list
+    reasons = Column(Text, nullable=False)  # JSON list of short explanations
+    computed_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_student_risk_class_score", "class_name", "score"),
+    )
+
+# How far incremental batch jobs have read the change feed
+class JobCursor(Base):
+    __tablename__ = "job_cursors"
+    
+    job = Column(String(50), primary_key=True)
+    cursor = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
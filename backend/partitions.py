@@ -0,0 +1,344 @@
+"""
+Academic-year partitioning for attendance
+
+The ORM `attendance` table is the hot partition and only holds years that
+have not been rolled over yet. Completed academic years are moved into their
+own `attendance_y<year>` tables, clustered by (student_id, date), frozen with
+triggers and compacted. Handlers never touch partitions directly: every read
+and write goes through the helpers below (usually via crud).
+
+Roll over at the start of each academic year:
+
+    python partitions.py rollover          # every completed year
+    python partitions.py rollover 2024     # a single year
+"""
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Date, Integer, MetaData, PrimaryKeyConstraint, String, Table, func, select
+)
+from sqlalchemy.orm import Session
+
+from models import Attendance
+from read_models import ATTENDANCE_COLUMNS, AttendanceRecord, wanted
+
+# Academic years run from June to May and are named after their starting year
+ACADEMIC_YEAR_START_MONTH = 6
+
+PARTITION_PREFIX = "attendance_y"
+
+# Partition tables live outside Base.metadata so create_all never touches them
+partition_metadata = MetaData()
+
+
+# ---------------- ACADEMIC YEARS ---------------- #
+
+def academic_year(day: date) -> int:
+    """Academic year a date belongs to"""
+    return day.year if day.month >= ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def current_academic_year() -> int:
+    """Academic year of today"""
+    return academic_year(date.today())
+
+
+def academic_year_bounds(year: int) -> Tuple[date, date]:
+    """First day of the year and first day of the next one"""
+    return (
+        date(year, ACADEMIC_YEAR_START_MONTH, 1),
+        date(year + 1, ACADEMIC_YEAR_START_MONTH, 1)
+    )
+
+
+# ---------------- PARTITION TABLES ---------------- #
+
+def partition_name(year: int) -> str:
+    return f"{PARTITION_PREFIX}{year}"
+
+
+def partition_table(year: int) -> Table:
+    """Core table for an archived year"""
+    name = partition_name(year)
+
+    if name not in partition_metadata.tables:
+        Table(
+            name,
+            partition_metadata,
+            Column("id", Integer, nullable=False),
+            Column("student_id", Integer, nullable=False),
+            Column("date", Date, nullable=False),
+            Column("status", String(10), nullable=False),
+            PrimaryKeyConstraint("student_id", "date", "id"),
+            sqlite_with_rowid=False,
+        )
+
+    return partition_metadata.tables[name]
+
+
+def archived_years(db: Session) -> List[int]:
+    """Academic years that have been rolled out of the hot table, oldest first"""
+    names = db.connection().exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+        (f"{PARTITION_PREFIX}%",)
+    ).scalars()
+
+    return sorted(int(name[len(PARTITION_PREFIX):]) for name in names)
+
+
+def _autoincrement(conn) -> bool:
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'attendance'"
+    ).scalar()
+    return ddl is not None and "AUTOINCREMENT" in ddl.upper()
+
+
+def _rebuild_with_autoincrement(engine):
+    """Recreate the hot table with AUTOINCREMENT, ids above every partition's
+
+    The option only exists at CREATE TABLE, and databases created before it
+    reuse ids once a rollover empties the table. Runs in one explicit
+    transaction (DDL included) so a crash leaves the old table in place.
+    """
+    # AUTOCOMMIT: no implicit BEGIN from the driver, the statements below manage it
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            if _autoincrement(conn):
+                conn.exec_driver_sql("ROLLBACK")
+                return
+
+            conn.exec_driver_sql("ALTER TABLE attendance RENAME TO attendance_rowid")
+            # Indexes kept their names on the renamed table
+            for index in Attendance.__table__.indexes:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+
+            Attendance.__table__.create(bind=conn)
+            copied = conn.exec_driver_sql(
+                "INSERT INTO attendance (id, student_id, date, status) "
+                "SELECT id, student_id, date, status FROM attendance_rowid ORDER BY id"
+            ).rowcount
+            conn.exec_driver_sql("DROP TABLE attendance_rowid")
+
+            highest = conn.exec_driver_sql("SELECT MAX(id) FROM attendance").scalar() or 0
+            names = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+                (f"{PARTITION_PREFIX}%",)
+            ).scalars().all()
+            for name in names:
+                highest = max(highest, conn.exec_driver_sql(f"SELECT MAX(id) FROM {name}").scalar() or 0)
+
+            conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'attendance'")
+            conn.exec_driver_sql(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('attendance', ?)", (highest,)
+            )
+            conn.exec_driver_sql("COMMIT")
+        except Exception:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+
+    print(f"Attendance table rebuilt with AUTOINCREMENT: {copied} rows, next id above {highest}")
+
+
+def init_partitions(engine):
+    """Create hot-table indexes and AUTOINCREMENT ids on databases that predate them"""
+    with engine.connect() as conn:
+        if not _autoincrement(conn):
+            _rebuild_with_autoincrement(engine)
+    for index in Attendance.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+# ---------------- WRITES ---------------- #
+
+def insert_attendance(
+    db: Session, student_id: int, day: date, status: str
+) -> Tuple[Attendance, Optional[str]]:
+    """Record a student's status for a day in the hot table and flush it (caller commits)
+
+    One status per student and day: recording a day again (re-taking roll
+    call) updates its row. Returns the row and the status it replaced (None
+    for a new day). Archived years are read-only and raise ValueError.
+    """
+    year = academic_year(day)
+
+    if year in archived_years(db):
+        raise ValueError(f"Attendance for academic year {year} is archived and read-only")
+
+    # Latest row of the day (ix_attendance_student_date); older databases may hold several
+    record = db.query(Attendance).filter(
+        Attendance.student_id == student_id, Attendance.date == day
+    ).order_by(Attendance.id.desc()).first()
+
+    if record is not None:
+        previous = record.status
+        record.status = status
+        db.flush()
+        return record, previous
+
+    record = Attendance(student_id=student_id, date=day, status=status)
+
+    db.add(record)
+    db.flush()
+    return record, None
+
+
+def delete_student_attendance(db: Session, student_ids):
+    """Remove attendance for the given student ids (or id subquery) from every partition"""
+    removed = db.query(Attendance).filter(
+        Attendance.student_id.in_(student_ids)
+    ).delete(synchronize_session=False)
+
+    for year in archived_years(db):
+        table = partition_table(year)
+        removed += db.execute(
+            table.delete().where(table.c.student_id.in_(student_ids))
+        ).rowcount
+
+    return removed
+
+
+# ---------------- READS ---------------- #
+
+def _columns(table: Table, fields: Optional[dict]):
+    return [table.c[name] for name in wanted(ATTENDANCE_COLUMNS, fields)]
+
+
+def _records(rows) -> List[AttendanceRecord]:
+    return [AttendanceRecord(**row._mapping) for row in rows]
+
+
+def _tables_for(db: Session, year: Optional[int]):
+    """Tables that may hold rows for `year` (all of them when None), oldest first"""
+    archived = archived_years(db)
+
+    if year is not None:
+        return [partition_table(year)] if year in archived else [Attendance.__table__]
+
+    return [partition_table(y) for y in archived] + [Attendance.__table__]
+
+
+def get_attendance(
+    db: Session,
+    student_id: int,
+    year: Optional[int] = None,
+    fields: Optional[dict] = None
+) -> List[AttendanceRecord]:
+    """Attendance for one student, for one academic year or the whole history"""
+    records = []
+
+    for table in _tables_for(db, year):
+        query = select(*_columns(table, fields)).where(table.c.student_id == student_id)
+
+        if year is not None and table is Attendance.__table__:
+            start, end = academic_year_bounds(year)
+            query = query.where(table.c.date >= start, table.c.date < end)
+
+        records += _records(db.execute(query.order_by(table.c.date)))
+
+    return records
+
+
+def recent_attendance(db: Session, limit: int = 10, fields: Optional[dict] = None) -> List[AttendanceRecord]:
+    """Latest attendance rows, topped up from archived years when the hot table is short"""
+    records = []
+
+    for table in reversed(_tables_for(db, None)):
+        rows = db.execute(
+            select(*_columns(table, fields))
+            .order_by(table.c.date.desc())
+            .limit(limit - len(records))
+        )
+        records += _records(rows)
+
+        if len(records) >= limit:
+            break
+
+    return records
+
+
+# ---------------- ROLLOVER ---------------- #
+
+def rollover(engine, year: int) -> int:
+    """Move a completed academic year out of the hot table, freeze and compact it"""
+    if year >= current_academic_year():
+        raise ValueError(f"Academic year {year} is not over yet")
+
+    name = partition_name(year)
+    start, end = academic_year_bounds(year)
+
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).first()
+
+        if exists:
+            raise ValueError(f"Academic year {year} is already archived")
+
+        # Without AUTOINCREMENT, emptying the hot table would let new ids repeat archived ones
+        if not _autoincrement(conn):
+            raise ValueError("The attendance table predates AUTOINCREMENT ids: run python migrate.py first")
+
+        # Clustered on (student_id, date): a student's year is one contiguous range
+        partition_table(year).create(bind=conn)
+        conn.exec_driver_sql(f"CREATE INDEX ix_{name}_date ON {name} (date)")
+
+        moved = conn.exec_driver_sql(
+            f"INSERT INTO {name} (id, student_id, date, status) "
+            f"SELECT id, student_id, date, status FROM attendance "
+            f"WHERE date >= ? AND date < ? ORDER BY student_id, date",
+            (start.isoformat(), end.isoformat())
+        ).rowcount
+
+        conn.exec_driver_sql(
+            "DELETE FROM attendance WHERE date >= ? AND date < ?",
+            (start.isoformat(), end.isoformat())
+        )
+
+        # Frozen: rows only leave again when a student or class is removed
+        for event in ("INSERT", "UPDATE"):
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER {name}_read_only_{event.lower()} BEFORE {event} ON {name} "
+                f"BEGIN SELECT RAISE(ABORT, 'attendance for {year} is archived and read-only'); END"
+            )
+
+    # Reclaim the pages freed in the hot table
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+
+    print(f"Academic year {year}: {moved} attendance rows moved to {name}")
+    return moved
+
+
+def rollover_completed_years(engine) -> int:
+    """Roll over every completed academic year still sitting in the hot table"""
+    with engine.connect() as conn:
+        oldest = conn.exec_driver_sql("SELECT MIN(date) FROM attendance").scalar()
+
+    if oldest is None:
+        return 0
+
+    with Session(engine) as db:
+        done = set(archived_years(db))
+
+    moved = 0
+    for year in range(academic_year(date.fromisoformat(oldest)), current_academic_year()):
+        if year not in done:
+            moved += rollover(engine, year)
+
+    return moved
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rollover":
+        print("Usage: python partitions.py rollover [year]")
+        sys.exit(1)
+
+    if len(sys.argv) > 2:
+        rollover(engine, int(sys.argv[2]))
+    else:
+        rollover_completed_years(engine)
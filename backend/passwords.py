@@ -0,0 +1,202 @@
+"""
+Password hashing: salted scrypt, computed off the request path
+
+Stored format:
+
+    scrypt$<log2 n>$<r>$<p>$<salt, base64>$<hash, base64>
+
+One hash costs ~65 ms of CPU and 16 MB of memory (n = 2^14, r = 8). That is
+the point of a KDF, and also why it must not run on the event loop or in as
+many request threads as happen to be logging in. Every hash and verify goes
+through one small executor instead:
+
+    HASH_WORKERS   threads computing hashes (hashlib.scrypt releases the GIL,
+                   so threads run in parallel with each other and the app)
+    MAX_PENDING    hashes queued or running; beyond that PasswordHasherBusy
+                   is raised (login answers 503) instead of queueing for seconds
+
+Legacy hashes (unsalted SHA-256 hex digests) still verify. A successful
+verify of a legacy hash, or of scrypt with older parameters, also returns a
+fresh hash for the caller to store. Raw passwords stored by older
+create/update handlers never verify; hash them in place once with:
+
+    python passwords.py upgrade-plaintext
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SCHEME = "scrypt"
+SCRYPT_N_LOG2 = 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_PENDING = int(os.environ.get("HASH_MAX_PENDING", 64))
+HASH_NICE = 10
+
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+# Verified instead of a real hash when the email is unknown, so that a
+# missing account takes as long to reject as a wrong password
+_DUMMY_HASH = f"{SCHEME}${SCRYPT_N_LOG2}${SCRYPT_R}${SCRYPT_P}$AAAAAAAAAAAAAAAAAAAAAA==${'A' * 43}="
+
+
+class PasswordHasherBusy(Exception):
+    """More hashes pending than MAX_PENDING"""
+
+
+# ---------------- KDF ---------------- #
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password: str, salt: bytes, n_log2: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=2 ** n_log2, r=r, p=p,
+        maxmem=256 * r * 2 ** n_log2, dklen=HASH_BYTES
+    )
+
+
+def _hash(password: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N_LOG2, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N_LOG2}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+def is_legacy(stored: str) -> bool:
+    """Unsalted SHA-256 hex digest (the original hash_password)"""
+    return bool(_LEGACY_SHA256.fullmatch(stored))
+
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(f"{SCHEME}$") or is_legacy(stored)
+
+
+def _verify(password: str, stored: str) -> Tuple[bool, bool]:
+    """(matches, should be rehashed with the current parameters)"""
+    if is_legacy(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != SCHEME:
+        return False, False
+
+    n_log2, r, p = (int(part) for part in parts[1:4])
+    digest = _scrypt(password, base64.b64decode(parts[4]), n_log2, r, p)
+    stale = (n_log2, r, p) != (SCRYPT_N_LOG2, SCRYPT_R, SCRYPT_P)
+    return hmac.compare_digest(digest, base64.b64decode(parts[5])), stale
+
+
+def _verify_and_upgrade(password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+    matches, stale = _verify(password, stored if stored is not None else _DUMMY_HASH)
+    if stored is None:
+        return False, None
+    return matches, _hash(password) if matches and stale else None
+
+
+# ---------------- EXECUTOR ---------------- #
+
+def _lower_priority():
+    """Run this hashing thread at a lower CPU priority than request handling"""
+    try:
+        # Linux schedules threads individually, so this renices only this thread
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), HASH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=HASH_WORKERS, thread_name_prefix="password-hash", initializer=_lower_priority
+)
+_lock = threading.Lock()
+_pending = 0
+_counters = {"hashed": 0, "verified": 0, "rehashed": 0, "busy": 0}
+
+
+def _finished(future: Future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _submit(counter: str, fn: Callable, *args) -> Future:
+    global _pending
+    with _lock:
+        if _pending >= MAX_PENDING:
+            _counters["busy"] += 1
+            raise PasswordHasherBusy(f"{_pending} password hashes pending")
+        _pending += 1
+        _counters[counter] += 1
+
+    future = _executor.submit(fn, *args)
+    future.add_done_callback(_finished)
+    return future
+
+
+def hash_password(password: str) -> str:
+    """Salted scrypt hash; blocks the calling thread until the pool has computed it"""
+    return _submit("hashed", _hash, password).result()
+
+
+def verify_password(password: str, stored: str) -> bool:
+    return _submit("verified", _verify, password, stored).result()[0]
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit("hashed", _hash, password))
+
+
+async def verify_password_async(password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash to store or None); stored=None checks against a dummy hash"""
+    matches, new_hash = await asyncio.wrap_future(
+        _submit("verified", _verify_and_upgrade, password, stored)
+    )
+    if new_hash is not None:
+        with _lock:
+            _counters["rehashed"] += 1
+    return matches, new_hash
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_counters, workers=HASH_WORKERS, pending=_pending, max_pending=MAX_PENDING)
+
+
+def upgrade_plaintext(db) -> int:
+    """Hash every password stored in the clear; returns how many were upgraded"""
+    from models import User
+
+    upgraded = 0
+    for user in db.query(User).all():
+        if not is_hashed(user.password):
+            user.password = hash_password(user.password)
+            upgraded += 1
+    db.commit()
+    return upgraded
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["upgrade-plaintext"]:
+        print("Usage: python passwords.py upgrade-plaintext")
+        sys.exit(1)
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"✅ Hashed {upgrade_plaintext(db)} plaintext passwords")
+    finally:
+        db.close()
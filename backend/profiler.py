@@ -0,0 +1,225 @@
+"""
+On-demand request profiling
+
+A teacher adds `profile=1` to the query string (or sends `X-Profile: 1`) and
+that one request runs under a sampling profiler:
+
+    call tree        nested {name, samples, self} (app code and libraries)
+    collapsed        "frame;frame;frame count" lines, for flamegraph.pl or
+                     speedscope
+    sql              every statement with its time and call site (sql_metrics)
+
+The response carries `X-Profile-Id`; the last MAX_PROFILES profiles are kept in
+memory and served by /api/debug/profiles, to teachers of the same school.
+Requests without the flag pay one check of their query string and headers,
+nothing else.
+
+Sampling rather than cProfile: sync handlers run on threadpool threads, which
+a per-thread deterministic profiler started in the middleware wouldn't see.
+The sampler reads every thread's stack (sys._current_frames) each
+SAMPLE_INTERVAL and keeps those running app code, so requests served
+concurrently by the same worker show up too: profile on a quiet worker, or
+read the subtree under the handler. The process's GIL switch interval is
+left alone (lowering it would slow every other request), so while a handler
+runs pure Python the sampler gets the GIL about every 5 ms rather than every
+SAMPLE_INTERVAL; time spent in SQLite or I/O releases it and samples finely.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import sql_metrics
+from auth import TokenManager
+from database import DEFAULT_TENANT
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_INTERVAL = 0.001  # seconds
+MAX_PROFILES = 20
+MIN_TREE_SHARE = 0.005  # call-tree nodes under 0.5% of samples are folded away
+
+_profiles_lock = threading.Lock()
+_profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+# ---------------- SAMPLER ---------------- #
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_DIR):
+        filename = os.path.relpath(filename, APP_DIR)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Collects stacks of every thread running app code until stopped"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self.samples = 0
+        self.threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or (code.co_filename.startswith(APP_DIR) and "site-packages" not in code.co_filename)
+                    stack.append(_frame_name(code))
+                    frame = frame.f_back
+                if not in_app:
+                    continue  # idle worker threads, the event loop waiting in select()
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+                self.threads.add(ident)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def collapsed(stacks: Dict[Tuple[str, ...], int]) -> str:
+    """Brendan Gregg's collapsed-stack format"""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in sorted(stacks.items()))
+
+
+def call_tree(stacks: Dict[Tuple[str, ...], int], total: int) -> List[Dict[str, Any]]:
+    root: Dict[str, Any] = {"children": {}}
+    for stack, count in stacks.items():
+        node = root
+        for name in stack:
+            node = node["children"].setdefault(name, {"name": name, "samples": 0, "self": 0, "children": {}})
+            node["samples"] += count
+        node["self"] += count
+
+    minimum = max(1, total * MIN_TREE_SHARE)
+
+    def prune(children: Dict[str, Any]) -> List[Dict[str, Any]]:
+        kept = [child for child in children.values() if child["samples"] >= minimum]
+        return [
+            dict(child, children=prune(child["children"]))
+            for child in sorted(kept, key=lambda child: child["samples"], reverse=True)
+        ]
+
+    return prune(root["children"])
+
+
+# ---------------- STORAGE ---------------- #
+
+def _store(profile: Dict[str, Any]):
+    with _profiles_lock:
+        _profiles[profile["id"]] = profile
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+
+
+def list_profiles(tenant: str = DEFAULT_TENANT) -> List[Dict[str, Any]]:
+    with _profiles_lock:
+        return [
+            {key: profile[key] for key in ("id", "created_at", "method", "path", "status", "duration_ms", "samples")}
+            for profile in reversed(_profiles.values())
+            if profile["school"] == tenant
+        ]
+
+
+def get_profile(profile_id: str, tenant: str = DEFAULT_TENANT) -> Optional[Dict[str, Any]]:
+    with _profiles_lock:
+        profile = _profiles.get(profile_id)
+    return profile if profile is not None and profile["school"] == tenant else None
+
+
+# ---------------- MIDDLEWARE ---------------- #
+
+def _requested(scope) -> Optional[str]:
+    """The request's token if it asks to be profiled, else None"""
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    flagged = query.get("profile") == ["1"] or any(
+        name == b"x-profile" and value == b"1" for name, value in scope["headers"]
+    )
+    if not flagged:
+        return None
+
+    return query.get("token", [None])[0]
+
+
+class ProfilerMiddleware:
+    """Profiles requests flagged by a teacher; passes everything else straight through"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (token := _requested(scope)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        token_data = TokenManager.validate_token(token)
+        if not token_data or token_data["role"] != "teacher":
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status = {"code": None}
+
+        # Record every statement of this request (the SQL middleware's stats)
+        stats = sql_metrics.current()
+        if stats is not None:
+            stats.log = []
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = Sampler()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - start
+
+            queries = stats.log if stats is not None else []
+            _store({
+                "id": profile_id,
+                "school": token_data["tenant"],
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "duration_ms": duration * 1000,
+                "samples": sampler.samples,
+                "interval_ms": sampler.interval * 1000,
+                "threads": len(sampler.threads),
+                "sql": {
+                    "statements": len(queries),
+                    "db_time_ms": sum(query["ms"] for query in queries),
+                    "queries": queries
+                },
+                "tree": call_tree(sampler.stacks, sampler.samples),
+                "collapsed": collapsed(sampler.stacks)
+            })
+            print(f"🔬 Profiled {scope['method']} {scope['path']}: {duration * 1000:.1f} ms, "
+                  f"{sampler.samples} samples, {len(queries)} statements (profile {profile_id})")
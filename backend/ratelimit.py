@@ -0,0 +1,182 @@
+"""
+Admission control for expensive endpoints
+
+Every limited route belongs to a cost class. A request is admitted when both
+of these hold:
+
+    concurrency   fewer than `concurrency` requests of the class are running
+                  (all users together: one SQLite file, one threadpool)
+    rate          the user's token bucket for the class has a token; buckets
+                  hold up to `burst` tokens and refill at `rate` per second
+                  (one per school and user id: ids repeat across schools)
+
+Otherwise RateLimited is raised and the app answers 429 with Retry-After.
+Nothing queues: a rejected request costs a dictionary lookup.
+
+State lives in a LimiterBackend. LocalBackend keeps it in this process, so
+with several workers each worker enforces the limits on its own. Plug a
+shared backend into set_backend() to enforce them across workers (e.g.
+Redis: the bucket update as a Lua script, slots as INCR/DECR with a TTL).
+It has the same interface.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, Tuple
+
+from database import DEFAULT_TENANT
+
+MAX_BUCKETS = 10_000
+
+
+@dataclass(frozen=True)
+class CostClass:
+    rate: float  # tokens per second, per user
+    burst: int  # bucket size
+    concurrency: int  # running at once, all users
+
+
+COST_CLASSES = {
+    "ai": CostClass(rate=1 / 20, burst=3, concurrency=4),  # Gemini call per report
+    "export": CostClass(rate=1 / 5, burst=5, concurrency=2),  # full-table scans
+    "debug": CostClass(rate=1 / 2, burst=5, concurrency=2),  # unpaginated dumps
+}
+
+
+class RateLimited(Exception):
+    def __init__(self, cost_class: str, reason: str, retry_after: float):
+        super().__init__(f"{cost_class}: {reason}, retry after {retry_after:.1f}s")
+        self.cost_class = cost_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+# ---------------- BACKENDS ---------------- #
+
+class LimiterBackend(ABC):
+    """Token buckets and concurrency slots"""
+
+    @abstractmethod
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """0 if a token was taken, else seconds until one is available"""
+
+    @abstractmethod
+    def acquire(self, name: str, limit: int) -> bool:
+        """Take one of `limit` slots; False if all are in use"""
+
+    @abstractmethod
+    def release(self, name: str):
+        """Give back a slot taken by acquire()"""
+
+
+class LocalBackend(LimiterBackend):
+    """In-process state"""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated at)
+        self._slots: Dict[str, int] = {}
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_buckets:
+                    self._drop_full(now, rate, burst)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+    def _drop_full(self, now: float, rate: float, burst: int):
+        # A refilled bucket is the same as no bucket
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+    def acquire(self, name: str, limit: int) -> bool:
+        with self._lock:
+            if self._slots.get(name, 0) >= limit:
+                return False
+            self._slots[name] = self._slots.get(name, 0) + 1
+            return True
+
+    def release(self, name: str):
+        with self._lock:
+            self._slots[name] -= 1
+
+
+# ---------------- LIMITER ---------------- #
+
+class Limiter:
+    def __init__(self, backend: LimiterBackend, cost_classes: Dict[str, CostClass]):
+        self.backend = backend
+        self.cost_classes = cost_classes
+        self._lock = threading.Lock()
+        self._metrics = {
+            name: {"admitted": 0, "rejected_rate": 0, "rejected_concurrency": 0, "in_flight": 0, "peak_in_flight": 0}
+            for name in cost_classes
+        }
+
+    def _count(self, cost_class: str, key: str, delta: int = 1):
+        with self._lock:
+            metrics = self._metrics[cost_class]
+            metrics[key] += delta
+            metrics["peak_in_flight"] = max(metrics["peak_in_flight"], metrics["in_flight"])
+
+    @contextmanager
+    def admit(self, cost_class: str, user_id: int, tenant: str = DEFAULT_TENANT) -> Iterator[None]:
+        """Hold a slot of cost_class for the block, or raise RateLimited"""
+        limits = self.cost_classes[cost_class]
+
+        if not self.backend.acquire(cost_class, limits.concurrency):
+            self._count(cost_class, "rejected_concurrency")
+            raise RateLimited(cost_class, "too many running", 1)
+
+        wait = self.backend.take(f"{cost_class}:{tenant}:{user_id}", limits.rate, limits.burst)
+        if wait:
+            self.backend.release(cost_class)
+            self._count(cost_class, "rejected_rate")
+            raise RateLimited(cost_class, "rate limit", wait)
+
+        self._count(cost_class, "admitted")
+        self._count(cost_class, "in_flight")
+        try:
+            yield
+        finally:
+            self._count(cost_class, "in_flight", -1)
+            self.backend.release(cost_class)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: dict(self._metrics[name], **asdict(limits))
+                for name, limits in self.cost_classes.items()
+            }
+
+
+limiter = Limiter(LocalBackend(), COST_CLASSES)
+
+
+def admit(cost_class: str, user_id: int, tenant: str = DEFAULT_TENANT):
+    return limiter.admit(cost_class, user_id, tenant)
+
+
+def set_backend(backend: LimiterBackend):
+    limiter.backend = backend
+
+
+def stats() -> Dict[str, Any]:
+    return limiter.stats()
@@ -0,0 +1,129 @@
+"""
+ORM-free read path for hot list endpoints
+
+Selects only the columns the response schemas need and returns them as
+slotted records: no identity map, no instance state, no lazy loads. The
+records have the same attribute names as the ORM models, so the response
+schemas (from_attributes) and fast_json accept them unchanged.
+
+Every query takes an optional field tree (see fieldsets.py): only those
+columns are selected, the rest of the record stays None, and the users join
+is skipped when `user` isn't requested.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Mark, Student, User
+
+
+@dataclass(slots=True)
+class UserRecord:
+    id: Optional[int] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+
+
+@dataclass(slots=True)
+class StudentRecord:
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    class_name: Optional[str] = None
+    roll_no: Optional[str] = None
+    user: Optional[UserRecord] = None
+
+
+@dataclass(slots=True)
+class MarkRecord:
+    id: Optional[int] = None
+    student_id: Optional[int] = None
+    subject: Optional[str] = None
+    marks: Optional[float] = None
+
+
+@dataclass(slots=True)
+class AttendanceRecord:
+    id: Optional[int] = None
+    student_id: Optional[int] = None
+    date: Optional[date] = None
+    status: Optional[str] = None
+
+
+USER_COLUMNS = ["id", "name", "email", "role"]
+STUDENT_COLUMNS = ["id", "user_id", "teacher_id", "class_name", "roll_no"]
+MARK_COLUMNS = ["id", "student_id", "subject", "marks"]
+ATTENDANCE_COLUMNS = ["id", "student_id", "date", "status"]
+
+
+def wanted(columns: List[str], fields: Optional[dict]) -> List[str]:
+    """Columns to select for a field tree (all of them when no tree is given)"""
+    if fields is None:
+        return columns
+    return [name for name in columns if name in fields]
+
+
+# ---------------- QUERIES ---------------- #
+
+def list_users(db: Session, role: Optional[str] = None, fields: Optional[dict] = None) -> List[UserRecord]:
+    """Users (optionally one role) without the password column"""
+    columns = wanted(USER_COLUMNS, fields)
+    query = select(*[getattr(User, name) for name in columns])
+    if role:
+        query = query.where(User.role == role)
+
+    return [UserRecord(**row._mapping) for row in db.execute(query.order_by(User.id))]
+
+
+def list_students(
+    db: Session,
+    teacher_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    fields: Optional[dict] = None
+) -> List[StudentRecord]:
+    """Students with their user, joined in the same query"""
+    columns = wanted(STUDENT_COLUMNS, fields)
+    user_columns = (
+        wanted(USER_COLUMNS, fields["user"] if fields else None)
+        if fields is None or "user" in fields else []
+    )
+
+    query = select(
+        *[getattr(Student, name) for name in columns],
+        *[getattr(User, name).label(f"user__{name}") for name in user_columns]
+    ).select_from(Student)
+    if user_columns:
+        query = query.join(User, User.id == Student.user_id)
+
+    if teacher_id is not None:
+        query = query.where(Student.teacher_id == teacher_id)
+    if user_id is not None:
+        query = query.where(Student.user_id == user_id)
+
+    records = []
+    for row in db.execute(query.order_by(Student.id)):
+        data = row._mapping
+        records.append(StudentRecord(
+            **{name: data[name] for name in columns},
+            user=UserRecord(**{name: data[f"user__{name}"] for name in user_columns}) if user_columns else None
+        ))
+
+    return records
+
+
+def list_marks(db: Session, student_id: int, fields: Optional[dict] = None) -> List[MarkRecord]:
+    """Marks for one student"""
+    columns = wanted(MARK_COLUMNS, fields)
+    query = select(*[getattr(Mark, name) for name in columns]).where(Mark.student_id == student_id)
+    return [MarkRecord(**row._mapping) for row in db.execute(query.order_by(Mark.id))]
+
+
+def recent_marks(db: Session, limit: int = 10, fields: Optional[dict] = None) -> List[MarkRecord]:
+    """Most recently entered marks"""
+    columns = wanted(MARK_COLUMNS, fields)
+    query = select(*[getattr(Mark, name) for name in columns]).order_by(Mark.id.desc()).limit(limit)
+    return [MarkRecord(**row._mapping) for row in db.execute(query)]
@@ -0,0 +1,309 @@
+"""
+At-risk students: a risk score per student, refreshed incrementally
+
+Three signals, each scaled to 0..1 and weighted (WEIGHTS) into a 0-100 score:
+
+    weak subjects    share of subjects with a mark below WEAK_MARK (the AI
+                     report's rule)
+    falling marks    per subject, how far the latest mark is below the average
+                     of the earlier ones (FULL_MARK_DROP points counts fully)
+    attendance       rate over the latest RECENT_MONTHS months with attendance,
+                     below ATTENDANCE_TARGET, and its drop from earlier months
+
+Scores live in student_risk with a level (high >= HIGH_RISK, medium >=
+MEDIUM_RISK, else low) and the reasons behind them; /api/at-risk reads a
+teacher's classes from there with one indexed query.
+
+The job reads the change feed (changes.py) from its cursor in job_cursors and
+rescores only students with new marks, attendance or profile changes, in
+chunks of CHUNK students with one short write transaction each. A cursor
+older than the pruned feed, or --full, rescores everyone. Inputs come from
+the rollups plus each subject's latest mark, so a student costs the same
+however long their history is.
+
+    python risk.py run [--full]
+
+With RISK_INTERVAL_MINUTES > 0 the app refreshes every open school on that
+interval; otherwise refresh from cron or POST /api/at-risk/refresh.
+"""
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import changes
+import rollups
+import tenants
+from ai import WEAK_MARK
+from database import RISK_INTERVAL_MINUTES
+from models import ChangeLog, JobCursor, Mark, Student, StudentMonthAttendance, StudentRisk, User
+
+JOB = "risk"
+CHUNK = 500
+SCORED_ENTITIES = ("mark", "attendance", "student")
+
+WEIGHTS = {"weak_subjects": 0.35, "falling_marks": 0.25, "low_attendance": 0.25, "falling_attendance": 0.15}
+FULL_MARK_DROP = 15.0  # points
+RECENT_MONTHS = 2
+ATTENDANCE_TARGET = 90.0  # percent
+FULL_ATTENDANCE_GAP = 30.0  # points below target
+FULL_ATTENDANCE_DROP = 20.0  # points below the earlier months
+HIGH_RISK = 50.0
+MEDIUM_RISK = 25.0
+LEVELS = {"high": HIGH_RISK, "medium": MEDIUM_RISK, "low": 0.0}
+
+
+# ---------------- SCORING ---------------- #
+
+def _scaled(value: float, full: float) -> float:
+    return max(0.0, min(1.0, value / full))
+
+
+def _rate(months: List[StudentMonthAttendance]) -> Optional[float]:
+    total = sum(month.total for month in months)
+    return 100 * sum(month.present for month in months) / total if total else None
+
+
+def score_student(
+    subjects: List[Dict],
+    latest_marks: Dict[str, float],
+    months: List[StudentMonthAttendance]
+) -> Dict[str, Any]:
+    """Score, level, weak subjects and reasons from one student's rollups (months oldest first)"""
+    reasons = []
+
+    weak = [subject["subject"] for subject in subjects if subject["min"] < WEAK_MARK]
+    if weak:
+        reasons.append(f"Below {WEAK_MARK} in {', '.join(weak)}")
+
+    # Latest mark against the average of the earlier ones, per subject
+    drops = [
+        (subject["average"] * subject["count"] - latest_marks[subject["subject"]]) / (subject["count"] - 1)
+        - latest_marks[subject["subject"]]
+        for subject in subjects
+        if subject["count"] > 1 and subject["subject"] in latest_marks
+    ]
+    mark_drop = sum(drops) / len(drops) if drops else 0.0
+    if mark_drop >= FULL_MARK_DROP / 3:
+        reasons.append(f"Latest marks {mark_drop:.1f} points below earlier ones")
+
+    months = [month for month in months if month.total]
+    recent_rate = _rate(months[-RECENT_MONTHS:])
+    earlier_rate = _rate(months[:-RECENT_MONTHS])
+    attendance_drop = earlier_rate - recent_rate if recent_rate is not None and earlier_rate is not None else 0.0
+    if recent_rate is not None and recent_rate < ATTENDANCE_TARGET:
+        reasons.append(f"Attendance {recent_rate:.0f}% in the last {RECENT_MONTHS} months")
+    if attendance_drop >= FULL_ATTENDANCE_DROP / 4:
+        reasons.append(f"Attendance down from {earlier_rate:.0f}%")
+
+    signals = {
+        "weak_subjects": len(weak) / len(subjects) if subjects else 0.0,
+        "falling_marks": _scaled(mark_drop, FULL_MARK_DROP),
+        "low_attendance": _scaled(ATTENDANCE_TARGET - recent_rate, FULL_ATTENDANCE_GAP) if recent_rate is not None else 0.0,
+        "falling_attendance": _scaled(attendance_drop, FULL_ATTENDANCE_DROP)
+    }
+    score = round(100 * sum(WEIGHTS[name] * value for name, value in signals.items()), 1)
+    level = "high" if score >= HIGH_RISK else "medium" if score >= MEDIUM_RISK else "low"
+
+    return {"score": score, "level": level, "weak_subjects": weak, "reasons": reasons}
+
+
+def _latest_marks(db: Session, student_ids: List[int]) -> Dict[int, Dict[str, float]]:
+    """Latest mark per student and subject (highest id; ix_marks_student_subject)"""
+    latest_ids = select(func.max(Mark.id)).where(Mark.student_id.in_(student_ids)).group_by(
+        Mark.student_id, Mark.subject
+    )
+    latest: Dict[int, Dict[str, float]] = {}
+    for row in db.query(Mark.student_id, Mark.subject, Mark.marks).filter(Mark.id.in_(latest_ids)):
+        latest.setdefault(row.student_id, {})[row.subject] = row.marks
+    return latest
+
+
+def _score_chunk(db: Session, student_ids: List[int], now: datetime) -> int:
+    """Rescore some students and drop the rows of those deleted (caller commits)"""
+    students = db.query(Student.id, Student.class_name).filter(Student.id.in_(student_ids)).all()
+    subjects = rollups.subject_summaries(db, student_ids)
+    latest = _latest_marks(db, student_ids)
+    months: Dict[int, List[StudentMonthAttendance]] = {}
+    for month in db.query(StudentMonthAttendance).filter(
+        StudentMonthAttendance.student_id.in_(student_ids)
+    ).order_by(StudentMonthAttendance.student_id, StudentMonthAttendance.month):
+        months.setdefault(month.student_id, []).append(month)
+
+    rows = []
+    for student in students:
+        result = score_student(subjects.get(student.id, []), latest.get(student.id, {}), months.get(student.id, []))
+        rows.append({
+            "student_id": student.id,
+            "class_name": student.class_name,
+            "score": result["score"],
+            "level": result["level"],
+            "weak_subjects": json.dumps(result["weak_subjects"]),
+            "reasons": json.dumps(result["reasons"]),
+            "computed_at": now
+        })
+
+    if rows:
+        table = StudentRisk.__table__
+        stmt = insert(table).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.student_id],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "student_id"}
+        ))
+
+    gone = set(student_ids) - {student.id for student in students}
+    if gone:
+        db.query(StudentRisk).filter(StudentRisk.student_id.in_(gone)).delete(synchronize_session=False)
+    return len(rows)
+
+
+# ---------------- JOB ---------------- #
+
+def run(db: Session, full: bool = False) -> Dict[str, Any]:
+    """Rescore the students changed since the last run (everyone with full=True)"""
+    start = time.perf_counter()
+    # Read the head first so nothing committed meanwhile is skipped
+    latest = changes.latest_cursor(db)
+    state = db.get(JobCursor, JOB)
+    full = full or state is None or state.cursor < changes.oldest_kept(db, latest)
+
+    if full:
+        student_ids = [row.id for row in db.query(Student.id)]
+        removed_classes = True
+    else:
+        new = db.query(ChangeLog).filter(ChangeLog.id > state.cursor, ChangeLog.id <= latest)
+        student_ids = [
+            row.student_id for row in new.filter(
+                ChangeLog.entity.in_(SCORED_ENTITIES), ChangeLog.student_id.isnot(None)
+            ).with_entities(ChangeLog.student_id).distinct()
+        ]
+        removed_classes = new.filter(ChangeLog.entity == "class").first() is not None
+
+    now = datetime.utcnow()
+    scored = 0
+    for offset in range(0, len(student_ids), CHUNK):
+        scored += _score_chunk(db, student_ids[offset:offset + CHUNK], now)
+        db.commit()
+
+    # Class removals delete their risk rows themselves; this catches rows left
+    # behind by anything else (e.g. a restored backup)
+    if removed_classes:
+        db.query(StudentRisk).filter(
+            ~StudentRisk.student_id.in_(select(Student.id))
+        ).delete(synchronize_session=False)
+
+    db.merge(JobCursor(job=JOB, cursor=latest, updated_at=now))
+    db.commit()
+
+    result = {"full": full, "students": scored, "cursor": latest, "seconds": time.perf_counter() - start}
+    print(f"🚩 Risk scores {'rebuilt' if full else 'refreshed'}: {scored} students "
+          f"in {result['seconds'] * 1000:.0f} ms (cursor {latest})")
+    return result
+
+
+# ---------------- READS ---------------- #
+
+def at_risk(
+    db: Session,
+    teacher_id: int,
+    class_name: Optional[str] = None,
+    min_level: str = "medium",
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Scored students in the teacher's classes (or one class), highest score first"""
+    my_classes = select(Student.class_name).where(Student.teacher_id == teacher_id).distinct()
+    query = db.query(StudentRisk, Student.roll_no, User.name).join(
+        Student, Student.id == StudentRisk.student_id
+    ).join(User, User.id == Student.user_id).filter(StudentRisk.score >= LEVELS[min_level])
+
+    if class_name is not None:
+        query = query.filter(StudentRisk.class_name == class_name)
+    else:
+        query = query.filter(StudentRisk.class_name.in_(my_classes))
+
+    return [
+        {
+            "student_id": risk.student_id,
+            "name": name,
+            "class_name": risk.class_name,
+            "roll_no": roll_no,
+            "score": risk.score,
+            "level": risk.level,
+            "weak_subjects": json.loads(risk.weak_subjects),
+            "reasons": json.loads(risk.reasons),
+            "computed_at": risk.computed_at
+        }
+        for risk, roll_no, name in query.order_by(StudentRisk.score.desc()).limit(limit)
+    ]
+
+
+def last_run(db: Session) -> Optional[datetime]:
+    state = db.get(JobCursor, JOB)
+    return state.updated_at if state else None
+
+
+# ---------------- SCHEDULE ---------------- #
+
+class RiskScheduler:
+    """Refreshes the scores of every open school every `interval_minutes`"""
+
+    def __init__(self, interval_minutes: float = RISK_INTERVAL_MINUTES):
+        self.interval_minutes = interval_minutes
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None and self.interval_minutes > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="risk-scores", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        # Open schools only: scores of idle ones catch up when a teacher brings them back
+        while not self._stop.wait(self.interval_minutes * 60):
+            for school in tenants.registry.open_names():
+                try:
+                    db = tenants.get(school).session_factory()
+                    try:
+                        run(db)
+                    finally:
+                        db.close()
+                except Exception as e:
+                    print(f"❌ Risk scores of {school} failed: {e}")
+
+
+scheduler = RiskScheduler()
+
+
+def start():
+    scheduler.start()
+
+
+def stop():
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if len(sys.argv) < 2 or sys.argv[1] != "run":
+        print("Usage: python risk.py run [--full]")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        run(db, full="--full" in sys.argv)
+    finally:
+        db.close()
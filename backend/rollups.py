@@ -0,0 +1,274 @@
+"""
+Incrementally maintained attendance and marks rollups
+
+    student_month_attendance   student x month   present / total days
+    student_subject_marks      student x subject count, total, min, max
+    class_day_presence         class x day       present / total students
+
+Every mark and attendance insert updates the rollups in its own transaction
+(caller commits), so reports and class analytics read a handful of rollup rows
+instead of a student's or a class's whole history. Reconcile them with:
+
+    python rollups.py rebuild
+"""
+import sys
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import ClassDayPresence, Student, StudentMonthAttendance, StudentSubjectMarks
+from partitions import archived_years, partition_name
+
+ROLLUP_MODELS = [StudentMonthAttendance, StudentSubjectMarks, ClassDayPresence]
+
+
+def is_present(status: str) -> int:
+    return 1 if status and status.lower() == "present" else 0
+
+
+def attendance_tables(db: Session) -> List[str]:
+    """Hot table plus every archived attendance partition"""
+    return [partition_name(year) for year in archived_years(db)] + ["attendance"]
+
+
+def latest_per_day(table: str, where: str = "") -> str:
+    """SQL selecting the row that counts for each student and day: the latest one
+
+    Writes keep one row per day; databases from before that may hold several,
+    and the bitmap index (attendance_index.py) keeps the last of them too.
+    """
+    condition = f" WHERE {where}" if where else ""
+    return (
+        f"SELECT student_id, date, status FROM {table} WHERE id IN "
+        f"(SELECT MAX(id) FROM {table}{condition} GROUP BY student_id, date)"
+    )
+
+
+# ---------------- WRITE PATHS ---------------- #
+
+def record_mark(db: Session, student_id: int, subject: str, marks: float):
+    """Fold one new mark into student_subject_marks"""
+    table = StudentSubjectMarks.__table__
+    stmt = insert(table).values(
+        student_id=student_id, subject=subject, count=1, total=marks, min_marks=marks, max_marks=marks
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id, table.c.subject],
+        set_={
+            "count": table.c.count + 1,
+            "total": table.c.total + stmt.excluded.total,
+            "min_marks": func.min(table.c.min_marks, stmt.excluded.min_marks),
+            "max_marks": func.max(table.c.max_marks, stmt.excluded.max_marks),
+        }
+    ))
+
+
+def record_attendance(
+    db: Session,
+    student_id: int,
+    day: date,
+    status: str,
+    class_name: Optional[str] = None,
+    previous: Optional[str] = None
+):
+    """Fold a student's status for a day into the month and class-day rollups
+
+    `previous` is the status it replaced when the day was recorded again: the
+    day then still counts once, with the new status.
+    """
+    if class_name is None:
+        class_name = db.query(Student.class_name).filter(Student.id == student_id).scalar()
+
+    present = is_present(status)
+    total = 1
+    if previous is not None:
+        present -= is_present(previous)
+        total = 0
+
+    month_table = StudentMonthAttendance.__table__
+    stmt = insert(month_table).values(
+        student_id=student_id, month=day.replace(day=1), present=present, total=total
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[month_table.c.student_id, month_table.c.month],
+        set_={
+            "present": month_table.c.present + stmt.excluded.present,
+            "total": month_table.c.total + stmt.excluded.total
+        }
+    ))
+
+    day_table = ClassDayPresence.__table__
+    stmt = insert(day_table).values(class_name=class_name, date=day, present=present, total=total)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[day_table.c.class_name, day_table.c.date],
+        set_={
+            "present": day_table.c.present + stmt.excluded.present,
+            "total": day_table.c.total + stmt.excluded.total
+        }
+    ))
+
+
+def _shift_class_days(db: Session, student_id: int, class_name: str, sign: int):
+    """Add (sign=1) or remove (sign=-1) a student's attendance from a class's daily counts"""
+    for table in attendance_tables(db):
+        db.execute(text(
+            f"INSERT INTO class_day_presence (class_name, date, present, total) "
+            f"SELECT :class_name, date, :sign * SUM(lower(status) = 'present'), :sign * COUNT(*) "
+            f"FROM ({latest_per_day(table, 'student_id = :student_id')}) GROUP BY date "
+            f"ON CONFLICT (class_name, date) DO UPDATE SET "
+            f"present = present + excluded.present, total = total + excluded.total"
+        ), {"class_name": class_name, "sign": sign, "student_id": student_id})
+
+    db.execute(text(
+        "DELETE FROM class_day_presence WHERE class_name = :class_name AND total <= 0"
+    ), {"class_name": class_name})
+
+
+def remove_student(db: Session, student_id: int, class_name: str):
+    """Drop a student's rollups (call before their attendance rows are deleted)"""
+    _shift_class_days(db, student_id, class_name, -1)
+
+    for model in (StudentMonthAttendance, StudentSubjectMarks):
+        db.query(model).filter(model.student_id == student_id).delete(synchronize_session=False)
+
+
+def move_student(db: Session, student_id: int, old_class: str, new_class: str):
+    """Carry a student's daily presence over when they change class"""
+    if old_class != new_class:
+        _shift_class_days(db, student_id, old_class, -1)
+        _shift_class_days(db, student_id, new_class, 1)
+
+
+# ---------------- REBUILD ---------------- #
+
+def rebuild(db: Session):
+    """Recompute every rollup from the raw marks and attendance tables"""
+    for model in ROLLUP_MODELS:
+        db.query(model).delete(synchronize_session=False)
+
+    db.execute(text(
+        "INSERT INTO student_subject_marks (student_id, subject, count, total, min_marks, max_marks) "
+        "SELECT student_id, subject, COUNT(*), SUM(marks), MIN(marks), MAX(marks) "
+        "FROM marks GROUP BY student_id, subject"
+    ))
+
+    attendance = " UNION ALL ".join(latest_per_day(table) for table in attendance_tables(db))
+
+    db.execute(text(
+        f"INSERT INTO student_month_attendance (student_id, month, present, total) "
+        f"SELECT student_id, strftime('%Y-%m-01', date), SUM(lower(status) = 'present'), COUNT(*) "
+        f"FROM ({attendance}) GROUP BY student_id, strftime('%Y-%m-01', date)"
+    ))
+
+    db.execute(text(
+        f"INSERT INTO class_day_presence (class_name, date, present, total) "
+        f"SELECT s.class_name, a.date, SUM(lower(a.status) = 'present'), COUNT(*) "
+        f"FROM ({attendance}) a JOIN students s ON s.id = a.student_id "
+        f"GROUP BY s.class_name, a.date"
+    ))
+
+    db.commit()
+
+    return {model.__tablename__: db.query(model).count() for model in ROLLUP_MODELS}
+
+
+# ---------------- READS ---------------- #
+
+def _subject_row(row: StudentSubjectMarks) -> Dict:
+    return {
+        "subject": row.subject,
+        "count": row.count,
+        "average": row.total / row.count,
+        "min": row.min_marks,
+        "max": row.max_marks
+    }
+
+
+def subject_summary(db: Session, student_id: int) -> List[Dict]:
+    """Per-subject mark aggregates for a student"""
+    rows = db.query(StudentSubjectMarks).filter(
+        StudentSubjectMarks.student_id == student_id
+    ).order_by(StudentSubjectMarks.subject).all()
+
+    return [_subject_row(row) for row in rows]
+
+
+def subject_summaries(db: Session, student_ids: List[int]) -> Dict[int, List[Dict]]:
+    """subject_summary for many students in one query"""
+    rows = db.query(StudentSubjectMarks).filter(
+        StudentSubjectMarks.student_id.in_(student_ids)
+    ).order_by(StudentSubjectMarks.student_id, StudentSubjectMarks.subject)
+
+    summaries: Dict[int, List[Dict]] = {}
+    for row in rows:
+        summaries.setdefault(row.student_id, []).append(_subject_row(row))
+    return summaries
+
+
+def attendance_totals(db: Session, student_id: int) -> Dict[str, int]:
+    """Present and total days for a student across all months"""
+    present, total = db.query(
+        func.coalesce(func.sum(StudentMonthAttendance.present), 0),
+        func.coalesce(func.sum(StudentMonthAttendance.total), 0)
+    ).filter(StudentMonthAttendance.student_id == student_id).one()
+
+    return {"present": present, "total": total}
+
+
+def class_analytics(
+    db: Session,
+    class_name: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> Dict:
+    """Daily presence and subject averages for a class"""
+    days = db.query(ClassDayPresence).filter(ClassDayPresence.class_name == class_name)
+    if start:
+        days = days.filter(ClassDayPresence.date >= start)
+    if end:
+        days = days.filter(ClassDayPresence.date <= end)
+    days = days.order_by(ClassDayPresence.date).all()
+
+    subjects = db.execute(
+        select(
+            StudentSubjectMarks.subject,
+            func.sum(StudentSubjectMarks.total) / func.sum(StudentSubjectMarks.count),
+            func.sum(StudentSubjectMarks.count)
+        )
+        .join(Student, Student.id == StudentSubjectMarks.student_id)
+        .where(Student.class_name == class_name)
+        .group_by(StudentSubjectMarks.subject)
+        .order_by(StudentSubjectMarks.subject)
+    ).all()
+
+    present = sum(day.present for day in days)
+    total = sum(day.total for day in days)
+
+    return {
+        "class_name": class_name,
+        "attendance_percentage": (present / total) * 100 if total > 0 else 0,
+        "daily_presence": [
+            {"date": day.date, "present": day.present, "total": day.total} for day in days
+        ],
+        "subject_averages": [
+            {"subject": subject, "average": average, "count": count}
+            for subject, average, count in subjects
+        ]
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python rollups.py rebuild")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        print(f"Rollups rebuilt: {rebuild(db)}")
+    finally:
+        db.close()
@@ -2,8 +2,8 @@
 Pydantic schemas for data validation
 """
 from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional, List
-from datetime import date
+from typing import Any, Dict, Optional, List
+from datetime import date, datetime
 
 # User schemas
 class UserBase(BaseModel):
@@ -17,6 +17,7 @@ class UserCreate(UserBase):
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
+    school: Optional[str] = None  # tenant name; the default school when omitted
 
 class UserResponse(UserBase):
     id: int
@@ -41,6 +42,13 @@ class StudentResponse(StudentBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class StudentSearchResult(BaseModel):
+    id: int
+    name: str
+    email: str
+    class_name: str
+    roll_no: str
+
 # Marks schemas
 class MarkBase(BaseModel):
     subject: str
@@ -69,6 +77,17 @@ class AttendanceResponse(AttendanceBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class AttendanceStreaks(BaseModel):
+    current: int
+    longest: int
+
+class AttendanceSummary(BaseModel):
+    student_id: int
+    present_days: int
+    total_days: int
+    percentage: float
+    streaks: AttendanceStreaks
+
 # Dashboard schemas
 class DashboardStats(BaseModel):
     total_students: int
@@ -76,6 +95,47 @@ class DashboardStats(BaseModel):
     recent_marks: List[MarkResponse]
     recent_attendance: List[AttendanceResponse]
 
+class DashboardResponse(DashboardStats):
+    # Teachers only
+    my_students_count: Optional[int] = None
+    my_students: Optional[List[StudentResponse]] = None
+
+# Page bootstrap: everything the dashboard needs on load
+class StudentSummary(BaseModel):
+    id: int
+    class_name: str
+    roll_no: str
+    name: str
+    teacher_id: Optional[int] = None
+
+class TeacherSummary(BaseModel):
+    id: int
+    name: str
+    email: EmailStr
+
+class BootstrapResponse(BaseModel):
+    user: UserResponse
+    dashboard: DashboardResponse
+    students: List[StudentSummary]
+    teachers: List[TeacherSummary]
+    cursor: int  # change-feed position the data above is current to
+
+# Change feed (delta sync)
+class ChangeEntry(BaseModel):
+    cursor: int
+    entity: str
+    entity_id: Optional[int] = None
+    op: str
+    student_id: Optional[int] = None
+    class_name: Optional[str] = None
+    payload: Optional[Dict[str, Any]] = None
+
+class ChangesResponse(BaseModel):
+    cursor: int
+    changes: List[ChangeEntry]
+    more: bool
+    reset: bool
+
 # AI Report schemas
 class AIReportRequest(BaseModel):
     student_id: int
@@ -88,6 +148,18 @@ class AIReportResponse(BaseModel):
     success: bool
     message: Optional[str] = None
 
+# At-risk students
+class AtRiskStudent(BaseModel):
+    student_id: int
+    name: str
+    class_name: str
+    roll_no: str
+    score: float
+    level: str
+    weak_subjects: List[str]
+    reasons: List[str]
+    computed_at: datetime
+
 # Login response
 class LoginResponse(BaseModel):
     token: str
@@ -0,0 +1,150 @@
+"""
+Student search: an FTS5 index over name, email, roll number and class
+
+    student_search(rowid = students.id, name, email, roll_no, class_name)
+
+Triggers on `students` and `users` keep the index in step with every write
+path, including the set-based deletes and class archiving that never load
+ORM objects. Prefix indexes on 2- and 3-character prefixes make typeahead
+queries cheap. Rebuild the index (e.g. after a bulk import with triggers
+off) with:
+
+    python search.py rebuild
+"""
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+SEARCH_TABLE = "student_search"
+SEARCH_LIMIT = 20
+
+# bm25 weights per column: name, email, roll_no, class_name
+RANK_WEIGHTS = (10.0, 2.0, 5.0, 1.0)
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    name, email, roll_no, class_name,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+_INDEX_STUDENT = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, name, email, roll_no, class_name)
+    SELECT NEW.id, u.name, u.email, NEW.roll_no, NEW.class_name
+    FROM users u WHERE u.id = NEW.user_id;
+"""
+
+TRIGGERS = {
+    "student_search_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS student_search_ai AFTER INSERT ON students BEGIN
+            {_INDEX_STUDENT}
+        END
+    """,
+    "student_search_au": f"""
+        CREATE TRIGGER IF NOT EXISTS student_search_au AFTER UPDATE ON students BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;
+            {_INDEX_STUDENT}
+        END
+    """,
+    "student_search_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS student_search_ad AFTER DELETE ON students BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;
+        END
+    """,
+    "student_search_user_au": f"""
+        CREATE TRIGGER IF NOT EXISTS student_search_user_au AFTER UPDATE OF name, email ON users BEGIN
+            DELETE FROM {SEARCH_TABLE} WHERE rowid IN (SELECT id FROM students WHERE user_id = NEW.id);
+            INSERT INTO {SEARCH_TABLE} (rowid, name, email, roll_no, class_name)
+            SELECT s.id, NEW.name, NEW.email, s.roll_no, s.class_name
+            FROM students s WHERE s.user_id = NEW.id;
+        END
+    """,
+}
+
+_POPULATE = f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, name, email, roll_no, class_name)
+    SELECT s.id, u.name, u.email, s.roll_no, s.class_name
+    FROM students s JOIN users u ON u.id = s.user_id
+"""
+
+
+def init_search(engine):
+    """Create the index and its triggers; fill it on databases that predate it"""
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": SEARCH_TABLE}
+        ).first()
+
+        conn.execute(text(CREATE_TABLE))
+        for trigger in TRIGGERS.values():
+            conn.execute(text(trigger))
+
+        if not exists:
+            conn.execute(text(_POPULATE))
+
+
+def rebuild(engine) -> int:
+    """Re-index every student from scratch"""
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        conn.execute(text(_POPULATE))
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+        return conn.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+def match_query(q: str) -> Optional[str]:
+    """FTS5 query for user input: every word must match, the last one as a prefix
+
+    Words are quoted, so FTS5 operators and column filters typed by the user
+    are searched for literally instead of being parsed.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_students(
+    db: Session,
+    q: str,
+    class_name: Optional[str] = None,
+    limit: int = SEARCH_LIMIT
+) -> List[Dict[str, Any]]:
+    """Best matches first (bm25, name matches weigh most)"""
+    match = match_query(q)
+    if match is None:
+        return []
+
+    sql = f"""
+        SELECT rowid AS id, name, email, roll_no, class_name
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match
+    """
+    params = {"match": match, "limit": limit}
+
+    if class_name is not None:
+        sql += " AND class_name = :class_name"
+        params["class_name"] = class_name
+
+    weights = ", ".join(str(weight) for weight in RANK_WEIGHTS)
+    sql += f" ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT :limit"
+
+    return [dict(row._mapping) for row in db.execute(text(sql), params)]
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python search.py rebuild")
+        sys.exit(1)
+
+    print(f"Search index rebuilt: {rebuild(engine)} students")
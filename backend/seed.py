@@ -0,0 +1,210 @@
+"""
+Synthetic school data generator
+
+Generates teachers, classes, students, marks and daily attendance for one or
+more academic years with bulk inserts (executemany in large batches, in one
+transaction), then rebuilds everything derived from the raw rows:
+rollups, attendance bitmaps and, with --rollover, the yearly partitions.
+
+    python seed.py                                       # small school
+    python seed.py --classes 48 --students-per-class 40 --years 3 --rollover
+    DATABASE_URL=sqlite:///../bench.db python seed.py    # seed another file
+
+Every seeded account's password is "password" (teacher1@school.com, ...).
+Seeding only appends: point DATABASE_URL at a fresh file for clean runs.
+"""
+import argparse
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+import attendance_index
+import rollups
+from crud import hash_password
+from migrate import init_db
+from partitions import academic_year_bounds, current_academic_year, rollover_completed_years
+
+BATCH_SIZE = 50_000
+SEED_PASSWORD = "password"
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Rohan", "Saanvi",
+    "Arjun", "Priya", "Kabir", "Nisha", "Dev", "Tara", "Yash", "Zoya", "Farhan", "Leela",
+    "Neel", "Riya", "Omar", "Sara", "Vikram", "Anika", "Kiran", "Maya", "Rahul", "Isha"
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Iyer", "Nair", "Reddy", "Gupta", "Khan", "Das", "Patel", "Mehta",
+    "Joshi", "Rao", "Singh", "Bose", "Menon", "Kapoor", "Chopra", "Pillai", "Sen", "Malhotra"
+]
+SECTIONS = "ABCDEFGH"
+
+
+@dataclass
+class SchoolConfig:
+    teachers: int = 10
+    classes: int = 12
+    students_per_class: int = 30
+    years: int = 1  # current academic year plus years - 1 completed ones
+    subjects: List[str] = field(default_factory=lambda: ["Math", "Science", "English", "History", "Computer"])
+    exams_per_year: int = 4  # marks per student per subject per year
+    attendance_rate: float = 0.92  # school-wide mean
+    seed: int = 42
+
+
+def class_names(count: int) -> List[str]:
+    """1A .. 12A, 1B .. 12B, ..."""
+    return [f"{i % 12 + 1}{SECTIONS[i // 12 % len(SECTIONS)]}" for i in range(count)]
+
+
+def school_days(year: int, until: date) -> List[date]:
+    """Weekdays of an academic year, up to (and including) `until`"""
+    start, end = academic_year_bounds(year)
+    last = min(end - timedelta(days=1), until)
+    days, day = [], start
+    while day <= last:
+        if day.weekday() < 5:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def batches(rows: Iterable[Tuple], size: int = BATCH_SIZE) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(conn, table: str, columns: Sequence[str], rows: Iterable[Tuple]) -> int:
+    """executemany straight through the driver, in batches"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    count = 0
+    for batch in batches(rows):
+        conn.exec_driver_sql(sql, batch)
+        count += len(batch)
+    return count
+
+
+@contextmanager
+def unsynchronized(conn):
+    """synchronous = OFF around a transaction, restored before the connection goes back to the pool
+
+    SQLite only changes it outside transactions, so this runs on the driver
+    connection, around conn.begin().
+    """
+    raw = conn.connection.driver_connection
+    previous = raw.execute("PRAGMA synchronous").fetchone()[0]
+    raw.execute("PRAGMA synchronous = OFF")
+    try:
+        yield
+    finally:
+        raw.execute(f"PRAGMA synchronous = {int(previous)}")
+
+
+def seed(engine, config: SchoolConfig) -> Dict[str, int]:
+    """Append a synthetic school to the database behind `engine`"""
+    init_db(engine)
+
+    rng = random.Random(config.seed)
+    password = hash_password(SEED_PASSWORD)
+    today = date.today()
+    years = list(range(current_academic_year() - config.years + 1, current_academic_year() + 1))
+    classes = class_names(config.classes)
+    counts: Dict[str, int] = {}
+
+    with engine.connect() as conn, unsynchronized(conn), conn.begin():
+        next_user = (conn.exec_driver_sql("SELECT MAX(id) FROM users").scalar() or 0) + 1
+        next_student = (conn.exec_driver_sql("SELECT MAX(id) FROM students").scalar() or 0) + 1
+
+        # Teachers, then one user + student row per student (ids assigned here)
+        teacher_ids = list(range(next_user, next_user + config.teachers))
+        counts["teachers"] = bulk_insert(conn, "users", ("id", "name", "email", "password", "role"), (
+            (uid, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"teacher{uid}@school.com", password, "teacher")
+            for uid in teacher_ids
+        ))
+
+        students = []  # (student id, user id, class, teacher, ability, attendance rate)
+        uid, sid = next_user + config.teachers, next_student
+        for index, class_name in enumerate(classes):
+            teacher_id = teacher_ids[index % len(teacher_ids)]
+            for _ in range(config.students_per_class):
+                ability = min(max(rng.gauss(70, 12), 25), 98)
+                rate = min(max(rng.gauss(config.attendance_rate, 0.06), 0.4), 1.0)
+                students.append((sid, uid, class_name, teacher_id, ability, rate))
+                uid, sid = uid + 1, sid + 1
+
+        bulk_insert(conn, "users", ("id", "name", "email", "password", "role"), (
+            (s[1], f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", f"student{s[1]}@school.com", password, "student")
+            for s in students
+        ))
+        counts["students"] = bulk_insert(conn, "students", ("id", "user_id", "class_name", "roll_no", "teacher_id"), (
+            (s[0], s[1], s[2], str(s[0] - next_student + 1), s[3]) for s in students
+        ))
+
+        subject_offsets = {subject: rng.uniform(-8, 8) for subject in config.subjects}
+        counts["marks"] = bulk_insert(conn, "marks", ("student_id", "subject", "marks"), (
+            (s[0], subject, round(min(max(rng.gauss(s[4] + offset, 8), 0), 100), 1))
+            for _ in years
+            for s in students
+            for subject, offset in subject_offsets.items()
+            for _ in range(config.exams_per_year)
+        ))
+
+        # Day by day, the way attendance is taken (keeps the table in date order)
+        counts["attendance"] = bulk_insert(conn, "attendance", ("student_id", "date", "status"), (
+            (s[0], day.isoformat(), "present" if rng.random() < s[5] else "absent")
+            for year in years
+            for day in school_days(year, today)
+            for s in students
+        ))
+
+    with Session(engine) as db:
+        counts.update(rollups.rebuild(db))
+        counts["attendance_bitmaps"] = attendance_index.rebuild(db)
+
+    return counts
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    defaults = SchoolConfig()
+    parser = argparse.ArgumentParser(description="Generate a synthetic school")
+    parser.add_argument("--teachers", type=int, default=defaults.teachers)
+    parser.add_argument("--classes", type=int, default=defaults.classes)
+    parser.add_argument("--students-per-class", type=int, default=defaults.students_per_class)
+    parser.add_argument("--years", type=int, default=defaults.years)
+    parser.add_argument("--subjects", default=",".join(defaults.subjects))
+    parser.add_argument("--exams-per-year", type=int, default=defaults.exams_per_year)
+    parser.add_argument("--attendance-rate", type=float, default=defaults.attendance_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--rollover", action="store_true", help="move completed years into partitions")
+    args = parser.parse_args()
+
+    config = SchoolConfig(
+        teachers=args.teachers,
+        classes=args.classes,
+        students_per_class=args.students_per_class,
+        years=args.years,
+        subjects=[subject.strip() for subject in args.subjects.split(",") if subject.strip()],
+        exams_per_year=args.exams_per_year,
+        attendance_rate=args.attendance_rate,
+        seed=args.seed
+    )
+
+    start = time.perf_counter()
+    counts = seed(engine, config)
+    if args.rollover:
+        counts["rolled_over"] = rollover_completed_years(engine)
+
+    print(f"✅ Seeded in {time.perf_counter() - start:.1f}s: {counts}")
+    print(f"Login: teacher<id>@school.com / {SEED_PASSWORD}")
@@ -0,0 +1,296 @@
+"""
+Columnar analytics snapshot
+
+Marks, attendance and the roster are copied out of SQLite into Arrow IPC
+files under SNAPSHOT_DIR. Analytics then read them through memory maps:
+Arrow IPC is laid out exactly like Arrow's in-memory format, so opening a
+file maps its pages without decoding or copying, and heavy reads never touch
+the SQLite file that serves attendance writes.
+
+Refreshes are incremental. Marks and attendance are appended to, so each
+refresh writes a new segment holding the rows with ids above the previous
+high-water mark. A table is rewritten in one piece only when rows below the
+mark have disappeared (student/class removal), attendance was re-taken for a
+day (an "update" in the change feed since the last refresh), or it has too
+many segments.
+The roster is small and mutable and is rewritten every time. Refreshes of
+one snapshot directory run one at a time within a process; with several
+workers, refresh from one of them (or from cron).
+
+    python snapshot.py
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import changes
+from database import SNAPSHOT_DIR
+from models import Attendance, ChangeLog, Mark, Student, User
+from partitions import archived_years, partition_table
+
+MANIFEST = "manifest.json"
+
+# Rows fetched from SQLite per record batch
+BATCH_SIZE = 50000
+
+# Segments per table before a refresh compacts them into one file
+MAX_SEGMENTS = 32
+
+SCHEMAS = {
+    "marks": pa.schema([
+        ("id", pa.int64()),
+        ("student_id", pa.int64()),
+        ("subject", pa.string()),
+        ("marks", pa.float64()),
+    ]),
+    "attendance": pa.schema([
+        ("id", pa.int64()),
+        ("student_id", pa.int64()),
+        ("date", pa.date32()),
+        ("status", pa.string()),
+    ]),
+    "roster": pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("name", pa.string()),
+        ("class_name", pa.string()),
+        ("roll_no", pa.string()),
+        ("teacher_id", pa.int64()),
+    ]),
+}
+
+
+# ---------------- SOURCE QUERIES ---------------- #
+
+def _attendance_tables(db: Session):
+    return [partition_table(year) for year in archived_years(db)] + [Attendance.__table__]
+
+
+def _queries(db: Session, name: str, above_id: int = 0):
+    """Selects producing the rows of a snapshot table with id > above_id"""
+    if name == "marks":
+        yield select(Mark.id, Mark.student_id, Mark.subject, Mark.marks).where(Mark.id > above_id)
+
+    elif name == "attendance":
+        for table in _attendance_tables(db):
+            yield select(table.c.id, table.c.student_id, table.c.date, table.c.status).where(
+                table.c.id > above_id
+            )
+
+    else:
+        yield select(
+            Student.id, Student.user_id, User.name, Student.class_name, Student.roll_no, Student.teacher_id
+        ).join(User, User.id == Student.user_id)
+
+
+def _source_stats(db: Session, name: str, up_to_id: int):
+    """(rows with id <= up_to_id, max id) currently in SQLite"""
+    if name == "marks":
+        tables = [Mark.__table__]
+    else:
+        tables = _attendance_tables(db)
+
+    rows, max_id = 0, 0
+    for table in tables:
+        count, top = db.execute(select(
+            func.count().filter(table.c.id <= up_to_id),
+            func.coalesce(func.max(table.c.id), 0)
+        )).one()
+        rows += count
+        max_id = max(max_id, top)
+
+    return rows, max_id
+
+
+# ---------------- WRITING ---------------- #
+
+def _write_segment(db: Session, name: str, path: str, above_id: int = 0) -> Dict:
+    """Stream rows into one Arrow IPC file, batch by batch"""
+    schema = SCHEMAS[name]
+    rows, max_id = 0, above_id
+
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for query in _queries(db, name, above_id):
+            result = db.execute(query.execution_options(yield_per=BATCH_SIZE))
+
+            for batch in result.partitions():
+                columns = list(zip(*batch))
+                writer.write_batch(pa.record_batch(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                rows += len(batch)
+                max_id = max(max_id, max(columns[0]))
+
+    return {"rows": rows, "max_id": max_id}
+
+
+def load_manifest(directory: str = SNAPSHOT_DIR) -> Dict:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"generation": 0, "tables": {}}
+
+
+_locks_guard = threading.Lock()
+_locks: Dict[str, threading.Lock] = {}
+
+
+def _lock_for(directory: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(directory), threading.Lock())
+
+
+def refresh(db: Session, directory: str = SNAPSHOT_DIR) -> Dict:
+    """Bring the snapshot up to date, appending only rows added since the last refresh"""
+    # One refresh per snapshot at a time: two would write the same next
+    # segment and one manifest update would be lost
+    with _lock_for(directory):
+        return _refresh(db, directory)
+
+
+def _refresh(db: Session, directory: str) -> Dict:
+    os.makedirs(directory, exist_ok=True)
+
+    manifest = load_manifest(directory)
+    manifest["generation"] += 1
+    generation = manifest["generation"]
+    obsolete: List[str] = []
+    report = {}
+
+    # Attendance rows updated in place since the last refresh (or unknown: pruned feed)
+    latest = changes.latest_cursor(db)
+    since = manifest.get("cursor")
+    attendance_updated = since is None or since < changes.oldest_kept(db, latest) or db.query(
+        ChangeLog.id
+    ).filter(
+        ChangeLog.id > since, ChangeLog.id <= latest,
+        ChangeLog.entity == "attendance", ChangeLog.op == "update"
+    ).first() is not None
+
+    for name in ("marks", "attendance"):
+        state = manifest["tables"].get(name, {"segments": [], "rows": 0, "high_water": 0})
+        kept_rows, max_id = _source_stats(db, name, state["high_water"])
+
+        # Rows vanished below the high-water mark, re-taken attendance, or too many segments: rewrite
+        full = kept_rows != state["rows"] or len(state["segments"]) >= MAX_SEGMENTS
+        full = full or (name == "attendance" and attendance_updated and state["rows"] > 0)
+
+        if full:
+            obsolete += state["segments"]
+            state = {"segments": [], "rows": 0, "high_water": 0}
+
+        if max_id > state["high_water"] or full:
+            segment = f"{name}-{generation:06d}.arrow"
+            written = _write_segment(db, name, os.path.join(directory, segment), state["high_water"])
+            state["segments"].append(segment)
+            state["rows"] += written["rows"]
+            state["high_water"] = written["max_id"]
+            report[name] = {"mode": "rewrite" if full else "append", "rows_written": written["rows"]}
+        else:
+            report[name] = {"mode": "unchanged", "rows_written": 0}
+
+        manifest["tables"][name] = state
+
+    # The roster is small and updated in place: always rewritten
+    roster = manifest["tables"].get("roster")
+    if roster:
+        obsolete += roster["segments"]
+    segment = f"roster-{generation:06d}.arrow"
+    written = _write_segment(db, "roster", os.path.join(directory, segment))
+    manifest["tables"]["roster"] = {"segments": [segment], "rows": written["rows"], "high_water": 0}
+    report["roster"] = {"mode": "rewrite", "rows_written": written["rows"]}
+
+    manifest["refreshed_at"] = time.time()
+    manifest["cursor"] = latest
+
+    # Swap the manifest atomically; readers still mapping old files keep them until closed
+    tmp = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+    for segment in obsolete:
+        os.remove(os.path.join(directory, segment))
+
+    print(f"Snapshot generation {generation}: {report}")
+    return {"generation": generation, "tables": report}
+
+
+# ---------------- READING ---------------- #
+
+def open_table(name: str, directory: str = SNAPSHOT_DIR) -> pa.Table:
+    """Memory-mapped, zero-copy view of a snapshot table"""
+    state = load_manifest(directory)["tables"].get(name)
+
+    if state is None:
+        raise FileNotFoundError("No analytics snapshot yet, refresh it first")
+
+    tables = [
+        pa.ipc.open_file(pa.memory_map(os.path.join(directory, segment), "r")).read_all()
+        for segment in state["segments"]
+    ]
+    return pa.concat_tables(tables) if tables else SCHEMAS[name].empty_table()
+
+
+# ---------------- ANALYTICS ---------------- #
+
+def _rows(table: pa.Table, renames: Dict[str, str]) -> List[Dict]:
+    return [
+        {renames.get(key, key): value for key, value in row.items()}
+        for row in table.to_pylist()
+    ]
+
+
+def subject_averages(directory: str = SNAPSHOT_DIR) -> List[Dict]:
+    """School-wide average per subject"""
+    marks = open_table("marks", directory)
+    result = marks.group_by("subject").aggregate([("marks", "mean"), ("marks", "count")])
+    return _rows(result.sort_by("subject"), {"marks_mean": "average", "marks_count": "count"})
+
+
+def class_subject_averages(directory: str = SNAPSHOT_DIR) -> List[Dict]:
+    """Average per class and subject"""
+    marks = open_table("marks", directory)
+    roster = open_table("roster", directory).select(["id", "class_name"])
+
+    joined = marks.join(roster, keys="student_id", right_keys="id")
+    result = joined.group_by(["class_name", "subject"]).aggregate([("marks", "mean"), ("marks", "count")])
+    return _rows(
+        result.sort_by([("class_name", "ascending"), ("subject", "ascending")]),
+        {"marks_mean": "average", "marks_count": "count"}
+    )
+
+
+def attendance_trend(directory: str = SNAPSHOT_DIR) -> List[Dict]:
+    """School-wide attendance percentage per month, across every year"""
+    attendance = open_table("attendance", directory)
+
+    months = pa.table({
+        "month": pc.strftime(attendance["date"], format="%Y-%m"),
+        "present": pc.cast(pc.equal(pc.utf8_lower(attendance["status"]), "present"), pa.int64()),
+    })
+    result = months.group_by("month").aggregate([("present", "mean"), ("present", "count")])
+
+    return [
+        {"month": row["month"], "percentage": row["present_mean"] * 100, "days": row["present_count"]}
+        for row in result.sort_by("month").to_pylist()
+    ]
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refresh(db)
+    finally:
+        db.close()
@@ -0,0 +1,176 @@
+"""
+SQL instrumentation through SQLAlchemy engine events
+
+    per request     statements executed and time spent executing them, kept in
+                    a ContextVar by SQLMetricsMiddleware; with SQL_DEBUG=1 they
+                    are sent back as X-DB-Statements, X-DB-Time-Ms and a
+                    Server-Timing entry (shown by browser dev tools)
+    slow queries    statements slower than SLOW_QUERY_MS are printed with their
+                    parameters and the app code that issued them
+    query budgets   `with query_budget(3): client.get(...)` raises when more
+                    statements than budgeted run inside the block;
+                    benchmarks/query_budgets.py checks the main endpoints
+
+Sync handlers run in the threadpool with a copy of the request's context.
+The copy points at the same RequestStats object, so their statements are
+counted too. Time is measured around cursor.execute. For SQLite that covers
+computing the first row; rows fetched later are not included.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+from database import SLOW_QUERY_MS, SQL_DEBUG
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_current: ContextVar[Optional["RequestStats"]] = ContextVar("sql_stats", default=None)
+
+# Open query_budget blocks, fed by every statement in the process
+_collectors_lock = threading.Lock()
+_collectors: List["RequestStats"] = []
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_time: float = 0.0  # seconds
+    log: Optional[List[Dict[str, Any]]] = None  # statement, ms and call site, when recording
+
+    def add(self, statement: str, elapsed: float):
+        self.statements += 1
+        self.db_time += elapsed
+        if self.log is not None:
+            self.log.append({"statement": _compact(statement), "ms": elapsed * 1000, "site": call_site()})
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# ---------------- ENGINE EVENTS ---------------- #
+
+def call_site(depth: int = 3) -> str:
+    """Innermost app frames (outside SQLAlchemy and this module) issuing the current query"""
+    sites = []
+    frame = sys._getframe(1)
+    while frame is not None and len(sites) < depth:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename != __file__ and "site-packages" not in filename:
+            sites.append(f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " <- ".join(sites) or "?"
+
+
+def _compact(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, elapsed)
+
+    if _collectors:
+        with _collectors_lock:
+            for collector in _collectors:
+                collector.add(statement, elapsed)
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        shown = "(executemany)" if executemany else repr(parameters)[:300]
+        print(f"🐢 Slow query {elapsed * 1000:.1f} ms at {call_site()}: {_compact(statement)[:500]} {shown}")
+
+
+def install(engine):
+    """Instrument an engine (once)"""
+    if not event.contains(engine, "after_cursor_execute", _after_execute):
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+# ---------------- PER REQUEST ---------------- #
+
+@contextmanager
+def track(record: bool = False) -> Iterator[RequestStats]:
+    """Count the statements run in this context (and threadpool calls made from it)"""
+    stats = RequestStats(log=[] if record else None)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class SQLMetricsMiddleware:
+    """Tracks each HTTP request; adds the totals as response headers when debug is on"""
+
+    def __init__(self, app, headers: bool = SQL_DEBUG):
+        self.app = app
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track() as stats:
+            async def send_with_totals(message):
+                if message["type"] == "http.response.start" and self.headers:
+                    db_ms = stats.db_time * 1000
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-db-statements", str(stats.statements).encode()),
+                        (b"x-db-time-ms", f"{db_ms:.2f}".encode()),
+                        (b"server-timing", f"db;dur={db_ms:.2f};desc=\"{stats.statements} statements\"".encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_totals)
+
+
+# ---------------- QUERY BUDGETS ---------------- #
+
+@contextmanager
+def query_budget(max_statements: int) -> Iterator[RequestStats]:
+    """
+    Fail if the block runs more than max_statements statements
+
+    Counts every statement in the process while open (including requests a
+    TestClient serves on its own thread), so use it one request at a time:
+
+        with query_budget(4):
+            client.get(f"/api/dashboard?token={token}")
+    """
+    stats = RequestStats(log=[])
+    with _collectors_lock:
+        _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        with _collectors_lock:
+            _collectors.remove(stats)
+
+    if stats.statements > max_statements:
+        listing = "\n".join(
+            f"  {i + 1}. {entry['statement'][:200]}  ({entry['site']})" for i, entry in enumerate(stats.log)
+        )
+        raise QueryBudgetExceeded(
+            f"{stats.statements} statements, budget {max_statements}:\n{listing}"
+        )
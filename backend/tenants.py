@@ -0,0 +1,287 @@
+"""
+Multi-school tenancy: one SQLite database per school
+
+    default school    SQLALCHEMY_DATABASE_URL (database.py), as before
+    other schools     <TENANTS_DIR>/<school>.db, with their own archive file
+                      (<school>.archive.db) and snapshot directory next to it
+
+Users log in with their school (UserLogin.school, default school when left
+out); the school is kept with the token and get_db opens each request's
+session on that school's engine. A user only exists in their own school's
+file, so schools can't see each other's rows.
+
+Engines are opened on first use and kept in an LRU of MAX_OPEN_TENANTS.
+When another school needs a slot, the least recently used one is closed
+(pooled connections released, on_evict hooks run, e.g. its group-commit
+writer stopped) and reopened the next time one of its users shows up.
+Per-school pools are small (TENANT_POOL_SIZE idle connections, each with a
+TENANT_CACHE_KB page cache), so connections, file handles and SQLite caches
+stay bounded however many schools the process serves.
+
+State keyed by ids that repeat across schools is scoped by school name:
+cached lists (cache.py), live event streams (events.py), rate-limit buckets
+(ratelimit.py) and the group-commit writers (write_queue.py).
+
+    python tenants.py create <school> <admin email> <password> [admin name]
+    python tenants.py list
+
+Maintenance CLIs (rollups.py, partitions.py, changes.py ...) work on one
+school at a time: point DATABASE_URL at <TENANTS_DIR>/<school>.db.
+"""
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Depends, Query
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import sql_metrics
+from auth import TokenManager
+from database import (
+    ARCHIVE_DATABASE_PATH,
+    DEFAULT_TENANT,
+    MAX_OPEN_TENANTS,
+    MIGRATE_ON_STARTUP,
+    SNAPSHOT_DIR,
+    TENANTS_DIR,
+    SessionLocal,
+    engine as default_engine
+)
+from migrate import init_db
+
+TENANT_NAME = re.compile(r"[a-z0-9][a-z0-9_-]{0,63}")
+TENANT_POOL_SIZE = 2  # idle connections kept per school
+TENANT_MAX_OVERFLOW = 8  # extra connections under load, closed when returned
+TENANT_CACHE_KB = 8192  # SQLite page cache per connection
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+@dataclass
+class Tenant:
+    name: str
+    engine: Engine
+    session_factory: Callable[[], Session]
+    archive_path: str
+    snapshot_dir: str
+
+
+def _limit_cache(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA cache_size = -{TENANT_CACHE_KB}")
+    cursor.close()
+
+
+def database_path(name: str, directory: str = TENANTS_DIR) -> str:
+    if name == DEFAULT_TENANT or not TENANT_NAME.fullmatch(name):
+        raise UnknownTenant(name)
+    return os.path.join(directory, f"{name}.db")
+
+
+# ---------------- REGISTRY ---------------- #
+
+class TenantRegistry:
+    def __init__(self, directory: str = TENANTS_DIR, max_open: int = MAX_OPEN_TENANTS):
+        self.directory = directory
+        self.max_open = max_open
+        self.default = Tenant(DEFAULT_TENANT, default_engine, SessionLocal, ARCHIVE_DATABASE_PATH, SNAPSHOT_DIR)
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._opening: Dict[str, threading.Lock] = {}
+        self._migrated = set()
+        self._evict_hooks: List[Callable[[Tenant], None]] = []
+        self.opened = 0
+        self.evicted = 0
+
+    def on_evict(self, hook: Callable[[Tenant], None]):
+        """Call hook(tenant) when a school's engine is closed"""
+        self._evict_hooks.append(hook)
+
+    def get(self, name: str, create: bool = False) -> Tenant:
+        """Open school by name (opening its engine if needed); UnknownTenant if it has no database"""
+        if name == DEFAULT_TENANT:
+            return self.default
+
+        with self._lock:
+            tenant = self._open.get(name)
+            if tenant is not None:
+                self._open.move_to_end(name)
+                return tenant
+            opening = self._opening.setdefault(name, threading.Lock())
+
+        # One opener per school (init_db runs once); migrating a school must
+        # not hold up requests for the others
+        with opening:
+            with self._lock:
+                tenant = self._open.get(name)
+                if tenant is not None:
+                    # Opened by the request we waited for
+                    self._open.move_to_end(name)
+                    return tenant
+
+            try:
+                tenant = self._open_tenant(name, create)
+            except Exception:
+                with self._lock:
+                    self._opening.pop(name, None)
+                raise
+
+            with self._lock:
+                self._open[name] = tenant
+                self.opened += 1
+                evicted = []
+                while len(self._open) > self.max_open:
+                    evicted.append(self._open.popitem(last=False)[1])
+                    self.evicted += 1
+
+        for old in evicted:
+            self._close(old)
+        return tenant
+
+    def _open_tenant(self, name: str, create: bool) -> Tenant:
+        path = database_path(name, self.directory)
+        if not create and not os.path.exists(path):
+            raise UnknownTenant(name)
+        os.makedirs(self.directory, exist_ok=True)
+
+        engine = create_engine(
+            f"sqlite:///{path}",
+            connect_args={"check_same_thread": False},
+            pool_size=TENANT_POOL_SIZE,
+            max_overflow=TENANT_MAX_OVERFLOW
+        )
+        event.listen(engine, "connect", _limit_cache)
+        sql_metrics.install(engine)
+
+        # Schema setup once per school and process, like init_db at startup
+        if create or (MIGRATE_ON_STARTUP and name not in self._migrated):
+            init_db(engine)
+            self._migrated.add(name)
+
+        return Tenant(
+            name=name,
+            engine=engine,
+            session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"tenant": name}),
+            archive_path=os.path.join(self.directory, f"{name}.archive.db"),
+            snapshot_dir=os.path.join(self.directory, f"{name}.snapshot")
+        )
+
+    def _close(self, tenant: Tenant):
+        # Sessions still checked out keep working; their connections close on return
+        for hook in self._evict_hooks:
+            hook(tenant)
+        print(f"🏫 Closed idle school {tenant.name}")
+        tenant.engine.dispose()
+
+    def close_all(self):
+        with self._lock:
+            tenants = list(self._open.values())
+            self._open.clear()
+        for tenant in tenants:
+            self._close(tenant)
+
+    def open_names(self) -> List[str]:
+        """Default school plus every school with an open engine"""
+        with self._lock:
+            return [DEFAULT_TENANT] + list(self._open)
+
+    def names(self) -> List[str]:
+        """Every school with a database, default first"""
+        if not os.path.isdir(self.directory):
+            return [DEFAULT_TENANT]
+        found = sorted(
+            filename[:-3] for filename in os.listdir(self.directory)
+            if filename.endswith(".db") and TENANT_NAME.fullmatch(filename[:-3])
+        )
+        return [DEFAULT_TENANT] + found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = list(self._open.values())
+            opened, evicted = self.opened, self.evicted
+        return {
+            "max_open": self.max_open,
+            "opened": opened,
+            "evicted": evicted,
+            # Least recently used first
+            "open": [
+                {"school": tenant.name, "connections": tenant.engine.pool.checkedin() + tenant.engine.pool.checkedout()}
+                for tenant in tenants
+            ]
+        }
+
+
+registry = TenantRegistry()
+
+
+def get(name: str) -> Tenant:
+    return registry.get(name)
+
+
+def on_evict(hook: Callable[[Tenant], None]):
+    registry.on_evict(hook)
+
+
+def stats() -> Dict[str, Any]:
+    return registry.stats()
+
+
+# ---------------- REQUEST DEPENDENCIES ---------------- #
+
+def current_tenant(token: Optional[str] = Query(None)) -> Tenant:
+    """Dependency: school of the request's user (default school without a token)"""
+    return registry.get(TokenManager.get_tenant(token))
+
+
+def get_db(tenant: Tenant = Depends(current_tenant)):
+    """Dependency: session on the request's school"""
+    db = tenant.session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ---------------- CLI ---------------- #
+
+def create(name: str, admin_email: str, admin_password: str, admin_name: str = "Admin") -> Tenant:
+    """New school database with its first teacher"""
+    from models import User
+    from passwords import hash_password
+
+    if os.path.exists(database_path(name, registry.directory)):
+        raise ValueError(f"School {name} already exists")
+
+    tenant = registry.get(name, create=True)
+    db = tenant.session_factory()
+    try:
+        db.add(User(name=admin_name, email=admin_email, password=hash_password(admin_password), role="teacher"))
+        db.commit()
+    finally:
+        db.close()
+    return tenant
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "create" and len(sys.argv) >= 5:
+        try:
+            create(*sys.argv[2:6])
+        except (ValueError, UnknownTenant) as e:
+            print(f"❌ Cannot create school: {e}")
+            sys.exit(1)
+        print(f"✅ School {sys.argv[2]} created ({database_path(sys.argv[2])})")
+    elif command == "list":
+        for name in registry.names():
+            print(name)
+    else:
+        print("usage: python tenants.py create <school> <admin email> <password> [admin name] | list")
+        sys.exit(1)
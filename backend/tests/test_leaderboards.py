@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import leaderboards
+from models import Base, Student, StudentSubjectMarks, User
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, name="Teacher", email="t@school.com", password="x", role="teacher"))
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def add_student(db, student_id: int, class_name: str, marks: dict):
+    db.add(User(id=student_id + 1, name=f"Student {student_id}", email=f"s{student_id}@school.com", password="x", role="student"))
+    db.add(Student(id=student_id, user_id=student_id + 1, class_name=class_name, roll_no=str(student_id), teacher_id=1))
+    for subject, mark in marks.items():
+        db.add(StudentSubjectMarks(student_id=student_id, subject=subject, count=1, total=mark, min_marks=mark, max_marks=mark))
+    db.commit()
+
+
+def test_student_alone_is_top(db):
+    add_student(db, 1, "10A", {"Math": 40})
+
+    board = leaderboards._compute(db, "10A")
+
+    assert board["overall"][0]["rank"] == 1
+    assert board["overall"][0]["percentile"] == 100
+    assert board["subjects"]["Math"][0]["percentile"] == 100
+
+
+def test_alone_in_one_subject(db):
+    add_student(db, 1, "10A", {"Math": 90, "Art": 70})
+    add_student(db, 2, "10A", {"Math": 60})
+
+    board = leaderboards._compute(db, "10A")
+
+    assert [entry["percentile"] for entry in board["subjects"]["Math"]] == [100, 0]
+    assert board["subjects"]["Art"][0]["percentile"] == 100
+
+
+def test_everyone_tied(db):
+    add_student(db, 1, "10A", {"Math": 75})
+    add_student(db, 2, "10A", {"Math": 75})
+
+    board = leaderboards._compute(db, "10A")
+
+    assert [entry["rank"] for entry in board["overall"]] == [1, 1]
+    assert [entry["percentile"] for entry in board["overall"]] == [100, 100]
@@ -0,0 +1,259 @@
+"""
+Group commit for high-frequency writes (marks, attendance)
+
+Committing each mark or attendance row on its own costs SQLite one write-lock
+round and one fsync per row. During roll call, with hundreds of rows a second,
+that turns into lock waits and "database is locked" errors. With
+GROUP_COMMIT=1 those handlers hand their write to this queue instead:
+
+    one writer thread, one session
+    waits up to GROUP_WINDOW after the first write for more (at most MAX_BATCH)
+    stages every write and its change-log entry, then commits once
+    publishes the changes (cache invalidation, live events), then answers
+    each caller with its own row (id included)
+
+If the batch fails (e.g. one row for an archived year), it is rolled back and
+its writes are retried one commit each, so only the bad write fails. Callers
+block in the threadpool while they wait, for a few milliseconds.
+
+Each school (tenants.py) has its own writer, started on its first write and
+stopped when the school's engine is evicted. A stopped writer is closed for
+good; a write that raced the eviction goes to the school's next writer.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import changes
+import tenants
+from crud import stage_attendance, stage_mark
+from database import DEFAULT_TENANT
+
+GROUP_WINDOW = 0.005  # seconds
+MAX_BATCH = 256
+RESULT_TIMEOUT = 30  # seconds a caller waits for its commit
+
+
+class WriterClosed(RuntimeError):
+    pass
+
+
+@dataclass
+class _Write:
+    kind: str  # "mark" or "attendance"
+    data: Any  # MarkCreate / AttendanceCreate
+    student_id: int
+    class_name: Optional[str]
+    future: Future = field(default_factory=Future)
+
+
+def _stage(db, write: _Write) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Stage one write and its change-log entry; (row for the caller, event to publish)"""
+    if write.kind == "mark":
+        row, op = changes.mark_payload(stage_mark(db, write.data)), "create"
+    else:
+        attendance, op = stage_attendance(db, write.data, write.class_name)
+        row = changes.attendance_payload(attendance)
+
+    change = changes.stage(
+        db, write.kind, op, row["id"], row,
+        student_id=write.student_id, class_name=write.class_name
+    )
+    return row, changes.to_dict(change)
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        session_factory: Callable,
+        window: float = GROUP_WINDOW,
+        max_batch: int = MAX_BATCH,
+        tenant: str = DEFAULT_TENANT
+    ):
+        self.session_factory = session_factory
+        self.tenant = tenant
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.retried_batches = 0
+        self.largest_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _start(self):
+        # Caller holds _lock
+        if self._closed:
+            raise WriterClosed(f"Writer of {self.tenant} is stopped")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.tenant}", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def stop(self):
+        """Commit what is queued, then stop the writer for good"""
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                # Queued under the lock, so every accepted write is ahead of it
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+        # Left behind only if the writer died; don't let their callers wait out RESULT_TIMEOUT
+        while True:
+            try:
+                write = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if write is not None:
+                write.future.set_exception(WriterClosed(f"Writer of {self.tenant} stopped"))
+
+    def submit(self, kind: str, data, student_id: int, class_name: Optional[str]) -> Dict[str, Any]:
+        """Queue a write and wait for its commit; returns the written row (WriterClosed once stopped)"""
+        write = _Write(kind, data, student_id, class_name)
+        with self._lock:
+            self._start()
+            self._queue.put(write)
+        return write.future.result(timeout=RESULT_TIMEOUT)
+
+    # ---------------- WRITER ---------------- #
+
+    def _collect(self, first: _Write) -> Tuple[List[_Write], bool]:
+        """The first write plus whatever arrives within the window; (batch, stop requested)"""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                write = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if write is None:
+                return batch, True
+            batch.append(write)
+        return batch, False
+
+    def _run(self):
+        db = self.session_factory()
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, stopping = self._collect(first)
+                self._commit(db, batch)
+        finally:
+            db.close()
+
+    def _commit(self, db, batch: List[_Write]):
+        try:
+            results = [_stage(db, write) for write in batch]
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self.retried_batches += 1
+            for write in batch:
+                self._commit_one(db, write)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+        # Publish first: a caller's next read must not hit a stale cache entry
+        for _, event in results:
+            changes.publish(event, self.tenant)
+        for write, (row, _) in zip(batch, results):
+            write.future.set_result(row)
+
+    def _commit_one(self, db, write: _Write):
+        try:
+            row, event = _stage(db, write)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            write.future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.writes += 1
+        changes.publish(event, self.tenant)
+        write.future.set_result(row)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "queued": self._queue.qsize(),
+                "batches": self.batches,
+                "writes": self.writes,
+                "average_batch": self.writes / self.batches if self.batches else 0,
+                "largest_batch": self.largest_batch,
+                "retried_batches": self.retried_batches
+            }
+
+
+_writers_lock = threading.Lock()
+_writers: Dict[str, WriteQueue] = {}
+
+
+def writer(tenant: str = DEFAULT_TENANT) -> WriteQueue:
+    """The school's writer (created, not started, on first use)"""
+    with _writers_lock:
+        if tenant not in _writers:
+            _writers[tenant] = WriteQueue(tenants.get(tenant).session_factory, tenant=tenant)
+        return _writers[tenant]
+
+
+def _stop_evicted(tenant: "tenants.Tenant"):
+    with _writers_lock:
+        evicted = _writers.pop(tenant.name, None)
+    if evicted is not None:
+        evicted.stop()
+
+
+tenants.on_evict(_stop_evicted)
+
+
+def start(tenant: str = DEFAULT_TENANT):
+    writer(tenant).start()
+
+
+def stop():
+    """Stop every school's writer (the next write starts a new one)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for school_writer in writers:
+        school_writer.stop()
+
+
+def submit(kind: str, data, student_id: int, class_name: Optional[str], tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+    while True:
+        try:
+            return writer(tenant).submit(kind, data, student_id, class_name)
+        except WriterClosed:
+            # School evicted between writer() and submit(): its next writer takes the write
+            continue
+
+
+def stats(tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+    return writer(tenant).stats()
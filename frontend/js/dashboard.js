@@ -7,6 +7,29 @@ let currentUser = null;
 let currentToken = null;
 let allStudents = [];
 
+// Recent rows kept for the home section tables
+const RECENT_LIMIT = 10;
+
+// Fallback polling interval when the browser has no EventSource
+const SYNC_INTERVAL_MS = 30000;
+
+// Live change stream (Server-Sent Events)
+let eventSource = null;
+let renderPending = false;
+
+// Student search box (server-side FTS, debounced)
+const SEARCH_DEBOUNCE_MS = 150;
+let searchTimer = null;
+let searchResults = null;
+
+// Local cache: filled by /api/bootstrap, then kept current from /api/changes
+const cache = {
+    cursor: 0,
+    dashboard: null,
+    students: new Map(),
+    teachers: new Map()
+};
+
 // Token management functions
 function getToken() {
     const token = localStorage.getItem('token');
@@ -48,16 +71,25 @@ document.addEventListener('DOMContentLoaded', async function () {
     console.log('Token retrieved:', currentToken ? 'Yes' : 'No');
 
     try {
-        // Initialize user info and dashboard
-        await initializeUser();
-        await loadDashboard();
+        // One round trip for user, dashboard, roster and teachers
+        const bootstrap = await loadBootstrap();
+        if (!bootstrap) {
+            return;
+        }
+
+        initializeUser(bootstrap.user);
+        fillCache(bootstrap);
+        renderDashboard(cache.dashboard);
 
         // Update datetime every minute
         updateDateTime();
         setInterval(updateDateTime, 60000);
 
-        // Setup form handlers
-        setupFormHandlers();
+        // Setup form handlers (dropdowns filled from the bootstrap roster)
+        setupFormHandlers(allStudents);
+
+        // Changes are pushed as they happen; no polling
+        connectEvents();
 
         // Setup section switching
         setupSectionNavigation();
@@ -69,102 +101,247 @@ document.addEventListener('DOMContentLoaded', async function () {
     }
 });
 
+/**
+ * Load everything the page needs on start
+ */
+async function loadBootstrap() {
+    console.log('Loading bootstrap data...');
+
+    const response = await fetch(`http://localhost:8000/api/bootstrap?token=${currentToken}`);
+
+    if (!response.ok) {
+        if (response.status === 401) {
+            console.log('Token expired, redirecting to login');
+            logout();
+            return null;
+        }
+        throw new Error(`HTTP ${response.status}: Failed to load dashboard`);
+    }
+
+    return await response.json();
+}
+
 /**
  * Initialize user information
  */
-async function initializeUser() {
+function initializeUser(user) {
+    currentUser = user;
+    localStorage.setItem('user', JSON.stringify(user));
+
+    // Update UI with user info
+    document.getElementById('userName').textContent = currentUser.name;
+    document.getElementById('userRole').textContent = currentUser.role === 'teacher' ? 'Teacher' : 'Student';
+    document.getElementById('welcomeMessage').textContent = `Welcome back, ${currentUser.name}!`;
+
+    // Show/hide menu based on role
+    if (currentUser.role === 'teacher') {
+        document.getElementById('teacherMenu').style.display = 'block';
+    } else {
+        document.getElementById('studentMenu').style.display = 'block';
+    }
+
+    console.log('User initialized:', currentUser.name, currentUser.role);
+}
+
+/**
+ * Fill the local cache from a bootstrap response
+ */
+function fillCache(bootstrap) {
+    cache.cursor = bootstrap.cursor;
+    cache.dashboard = bootstrap.dashboard;
+    cache.students = new Map(bootstrap.students.map(student => [student.id, student]));
+    cache.teachers = new Map(bootstrap.teachers.map(teacher => [teacher.id, teacher]));
+    allStudents = bootstrap.students;
+}
+
+/**
+ * Fetch changes since the cached cursor and apply them
+ */
+async function syncChanges() {
     try {
-        console.log('Initializing user...');
+        let more = true;
 
-        const response = await fetch(`http://localhost:8000/api/dashboard?token=${currentToken}`);
+        while (more) {
+            const response = await fetch(`http://localhost:8000/api/changes?since=${cache.cursor}&token=${currentToken}`);
 
-        if (!response.ok) {
-            if (response.status === 401) {
-                console.log('Token expired, redirecting to login');
-                logout();
+            if (!response.ok) {
+                if (response.status === 401) {
+                    logout();
+                }
                 return;
             }
-            throw new Error(`HTTP ${response.status}: Failed to load user data`);
-        }
-
-        const data = await response.json();
-
-        // Get user from localStorage
-        const storedUser = JSON.parse(localStorage.getItem('user'));
-        if (!storedUser) {
-            throw new Error('User data not found in localStorage');
-        }
 
-        currentUser = storedUser;
+            const feed = await response.json();
 
-        // Update UI with user info
-        document.getElementById('userName').textContent = currentUser.name;
-        document.getElementById('userRole').textContent = currentUser.role === 'teacher' ? 'Teacher' : 'Student';
-        document.getElementById('welcomeMessage').textContent = `Welcome back, ${currentUser.name}!`;
+            if (feed.reset) {
+                // Our cursor is older than the kept history: start over
+                const bootstrap = await loadBootstrap();
+                if (bootstrap) {
+                    fillCache(bootstrap);
+                }
+                break;
+            }
 
-        // Show/hide menu based on role
-        if (currentUser.role === 'teacher') {
-            document.getElementById('teacherMenu').style.display = 'block';
-        } else {
-            document.getElementById('studentMenu').style.display = 'block';
+            feed.changes.forEach(applyChange);
+            cache.cursor = feed.cursor;
+            more = feed.more;
         }
 
-        console.log('User initialized:', currentUser.name, currentUser.role);
+        renderFromCache();
 
     } catch (error) {
-        console.error('Error initializing user:', error);
-        throw error;
+        console.error('Error syncing changes:', error);
     }
 }
 
 /**
- * Load dashboard data
+ * Subscribe to pushed change events
  */
-async function loadDashboard() {
-    try {
-        console.log('Loading dashboard data...');
+function connectEvents() {
+    if (!window.EventSource) {
+        setInterval(syncChanges, SYNC_INTERVAL_MS);
+        return;
+    }
 
-        const response = await fetch(`http://localhost:8000/api/dashboard?token=${currentToken}`);
+    eventSource = new EventSource(`http://localhost:8000/api/events?token=${currentToken}`);
 
-        if (!response.ok) {
-            if (response.status === 401) {
-                logout();
-                return;
+    // (Re)connected: catch up on anything pushed while we were away
+    eventSource.addEventListener('open', () => syncChanges());
+
+    eventSource.addEventListener('message', (e) => {
+        const change = JSON.parse(e.data);
+        applyChange(change);
+        cache.cursor = Math.max(cache.cursor, change.cursor);
+        scheduleRender();
+    });
+
+    // We fell behind and the server dropped us: resync, the browser reconnects
+    eventSource.addEventListener('reset', () => syncChanges());
+}
+
+/**
+ * Re-render once for a burst of pushed events
+ */
+function scheduleRender() {
+    if (renderPending) {
+        return;
+    }
+    renderPending = true;
+    setTimeout(() => {
+        renderPending = false;
+        renderFromCache();
+    }, 100);
+}
+
+/**
+ * Apply one change-feed entry to the local cache
+ */
+function applyChange(change) {
+    const dashboard = cache.dashboard;
+    const payload = change.payload;
+    const removed = new Set();
+
+    switch (change.entity) {
+        case 'user':
+            if (change.op === 'delete') {
+                cache.teachers.delete(change.entity_id);
+            } else if (payload.role === 'teacher') {
+                cache.teachers.set(payload.id, { id: payload.id, name: payload.name, email: payload.email });
             }
-            throw new Error(`HTTP ${response.status}: Failed to load dashboard`);
-        }
+            break;
+        case 'student':
+            if (change.op === 'delete') {
+                cache.students.delete(change.entity_id);
+                removed.add(change.entity_id);
+            } else {
+                cache.students.set(payload.id, payload);
+            }
+            break;
+        case 'class':
+            cache.students.forEach(student => {
+                if (student.class_name === change.class_name) {
+                    cache.students.delete(student.id);
+                    removed.add(student.id);
+                }
+            });
+            break;
+        case 'mark':
+            dashboard.recent_marks = prependRecent(dashboard.recent_marks, payload);
+            break;
+        case 'attendance':
+            dashboard.recent_attendance = prependRecent(dashboard.recent_attendance, payload);
+            break;
+    }
 
-        const data = await response.json();
-        console.log('Dashboard data received:', data);
+    if (removed.size > 0) {
+        dashboard.recent_marks = (dashboard.recent_marks || []).filter(mark => !removed.has(mark.student_id));
+        dashboard.recent_attendance = (dashboard.recent_attendance || []).filter(record => !removed.has(record.student_id));
+    }
 
-        // Update stats
-        document.getElementById('totalStudents').textContent = data.total_students || 0;
-        document.getElementById('totalTeachers').textContent = data.total_teachers || 0;
+    // Teachers see every student and teacher, so the counts follow the cache
+    if (currentUser.role === 'teacher') {
+        const students = [...cache.students.values()];
+        dashboard.total_students = students.length;
+        dashboard.total_teachers = cache.teachers.size;
+        dashboard.my_students_count = students.filter(student => student.teacher_id === currentUser.id).length;
+    }
+}
 
-        // Teacher-specific stats
-        if (currentUser.role === 'teacher') {
-            document.getElementById('myStudentsCard').style.display = 'flex';
-            document.getElementById('myStudentsCount').textContent = data.my_students_count || 0;
-            allStudents = data.my_students || [];
-        }
+/**
+ * Newest-first recent list; a row seen twice (pushed and pulled) is kept once
+ */
+function prependRecent(rows, row) {
+    const others = (rows || []).filter(existing => existing.id !== row.id);
+    return [row, ...others].slice(0, RECENT_LIMIT);
+}
 
-        // Update recent marks table
-        updateRecentMarksTable(data.recent_marks || []);
+/**
+ * Re-render everything shown from the cache
+ */
+function renderFromCache() {
+    allStudents = [...cache.students.values()];
 
-        // Update recent attendance table
-        updateRecentAttendanceTable(data.recent_attendance || []);
+    renderDashboard(cache.dashboard);
 
-        // Hide loading, show content
-        document.getElementById('loading').style.display = 'none';
-        document.getElementById('dashboardContent').style.display = 'block';
+    if (currentUser.role === 'teacher') {
+        if (searchResults) {
+            // Results may include students that just changed
+            searchStudents(document.getElementById('studentSearch').value.trim());
+        }
+        loadStudentsTable();
+        loadTeachersTable();
+        loadStudentsDropdown('marksStudent', allStudents);
+        loadStudentsDropdown('attendanceStudent', allStudents);
+    }
+}
+
+/**
+ * Render dashboard stats and recent activity
+ */
+function renderDashboard(data) {
+    console.log('Dashboard data received:', data);
 
-        console.log('Dashboard loaded successfully');
+    // Update stats
+    document.getElementById('totalStudents').textContent = data.total_students || 0;
+    document.getElementById('totalTeachers').textContent = data.total_teachers || 0;
 
-    } catch (error) {
-        console.error('Error loading dashboard:', error);
-        document.getElementById('loading').style.display = 'none';
-        showError('Failed to load dashboard data. Please refresh the page.');
+    // Teacher-specific stats
+    if (currentUser.role === 'teacher') {
+        document.getElementById('myStudentsCard').style.display = 'flex';
+        document.getElementById('myStudentsCount').textContent = data.my_students_count || 0;
     }
+
+    // Update recent marks table
+    updateRecentMarksTable(data.recent_marks || []);
+
+    // Update recent attendance table
+    updateRecentAttendanceTable(data.recent_attendance || []);
+
+    // Hide loading, show content
+    document.getElementById('loading').style.display = 'none';
+    document.getElementById('dashboardContent').style.display = 'block';
+
+    console.log('Dashboard loaded successfully');
 }
 
 /**
@@ -269,7 +446,7 @@ function showSuccess(message) {
 /**
  * Setup form handlers
  */
-function setupFormHandlers() {
+function setupFormHandlers(students) {
     console.log('Setting up form handlers...');
 
     // Add Teacher Form
@@ -290,11 +467,20 @@ function setupFormHandlers() {
         });
     }
 
+    // Student search
+    const studentSearch = document.getElementById('studentSearch');
+    if (studentSearch) {
+        studentSearch.addEventListener('input', function () {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => searchStudents(studentSearch.value.trim()), SEARCH_DEBOUNCE_MS);
+        });
+    }
+
     // Add Marks Form
     const addMarksForm = document.getElementById('addMarksForm');
     if (addMarksForm) {
         // Load students into dropdown
-        loadStudentsDropdown('marksStudent');
+        loadStudentsDropdown('marksStudent', students);
 
         addMarksForm.addEventListener('submit', async function (e) {
             e.preventDefault();
@@ -306,7 +492,7 @@ function setupFormHandlers() {
     const addAttendanceForm = document.getElementById('addAttendanceForm');
     if (addAttendanceForm) {
         // Load students into dropdown
-        loadStudentsDropdown('attendanceStudent');
+        loadStudentsDropdown('attendanceStudent', students);
 
         // Set today's date as default
         const today = new Date().toISOString().split('T')[0];
@@ -353,7 +539,7 @@ async function handleAddTeacher() {
             const data = await response.json();
             showSuccess(`Teacher "${data.name}" added successfully!`);
             document.getElementById('addTeacherForm').reset();
-            await loadTeachersTable();
+            await syncChanges();
         } else {
             const error = await response.json();
             showError(error.detail || 'Failed to add teacher');
@@ -403,15 +589,12 @@ async function handleAddStudent() {
         console.log('Add student response status:', response.status);
 
         if (response.ok) {
-            const student = await response.json();
-            showSuccess(`Student "${student.user.name}" added successfully!`);
+            const data = await response.json();
+            showSuccess(`Student "${data.student.name}" added successfully!`);
             document.getElementById('addStudentForm').reset();
 
-            // Refresh data
-            await loadStudentsTable();
-            await loadDashboard();
-            await loadStudentsDropdown('marksStudent');
-            await loadStudentsDropdown('attendanceStudent');
+            // Pull the new student (and anything else that changed)
+            await syncChanges();
 
         } else {
             const error = await response.json();
@@ -459,7 +642,7 @@ async function handleAddMarks() {
         if (response.ok) {
             showSuccess('Marks added successfully!');
             document.getElementById('addMarksForm').reset();
-            await loadDashboard();
+            await syncChanges();
         } else {
             const error = await response.json();
             showError(error.detail || 'Failed to add marks');
@@ -507,7 +690,7 @@ async function handleAddAttendance() {
             // Set date back to today
             const today = new Date().toISOString().split('T')[0];
             document.getElementById('attendanceDate').value = today;
-            await loadDashboard();
+            await syncChanges();
         } else {
             const error = await response.json();
             showError(error.detail || 'Failed to record attendance');
@@ -523,115 +706,126 @@ async function handleAddAttendance() {
 /**
  * Load students into dropdown
  */
-async function loadStudentsDropdown(dropdownId) {
+function loadStudentsDropdown(dropdownId, students) {
     try {
-        const response = await fetch(`http://localhost:8000/api/students?token=${currentToken}`);
+        const dropdown = document.getElementById(dropdownId);
 
-        if (response.ok) {
-            const students = await response.json();
-            const dropdown = document.getElementById(dropdownId);
-
-            // Clear existing options except first
-            while (dropdown.options.length > 1) {
-                dropdown.remove(1);
-            }
+        // Clear existing options except first
+        while (dropdown.options.length > 1) {
+            dropdown.remove(1);
+        }
 
-            // Add student options
-            students.forEach(student => {
-                const option = document.createElement('option');
-                option.value = student.id;
-                option.textContent = `${student.user.name} (${student.class_name} - ${student.roll_no})`;
-                dropdown.appendChild(option);
-            });
+        // Add student options
+        students.forEach(student => {
+            const option = document.createElement('option');
+            option.value = student.id;
+            option.textContent = `${student.name} (${student.class_name} - ${student.roll_no})`;
+            dropdown.appendChild(option);
+        });
 
-            console.log(`Loaded ${students.length} students into ${dropdownId}`);
-        }
+        console.log(`Loaded ${students.length} students into ${dropdownId}`);
     } catch (error) {
         console.error('Error loading students dropdown:', error);
     }
 }
 
 /**
- * Load teachers table
+ * Render teachers table from the cache
  */
-async function loadTeachersTable() {
+function loadTeachersTable() {
     try {
-        const response = await fetch(`http://localhost:8000/api/teachers?token=${currentToken}`);
-
-        if (response.ok) {
-            const teachers = await response.json();
-            const tbody = document.querySelector('#teachersTable tbody');
-            tbody.innerHTML = '';
-
-            teachers.forEach(teacher => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>${teacher.id}</td>
-                    <td>${teacher.name}</td>
-                    <td>${teacher.email}</td>
-                    <td>
-                        <button class="btn btn-secondary btn-sm" onclick="viewTeacher(${teacher.id})">
-                            <i class="fas fa-eye"></i> View
-                        </button>
-                        <button class="btn btn-secondary btn-sm" onclick="editTeacher(${teacher.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-                        <button class="btn btn-danger btn-sm" onclick="deleteTeacher(${teacher.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                `;
-                tbody.appendChild(row);
-            });
-        }
+        const teachers = [...cache.teachers.values()];
+        const tbody = document.querySelector('#teachersTable tbody');
+        tbody.innerHTML = '';
+
+        teachers.forEach(teacher => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td>${teacher.id}</td>
+                <td>${teacher.name}</td>
+                <td>${teacher.email}</td>
+                <td>
+                    <button class="btn btn-secondary btn-sm" onclick="viewTeacher(${teacher.id})">
+                        <i class="fas fa-eye"></i> View
+                    </button>
+                    <button class="btn btn-secondary btn-sm" onclick="editTeacher(${teacher.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+                    <button class="btn btn-danger btn-sm" onclick="deleteTeacher(${teacher.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            `;
+            tbody.appendChild(row);
+        });
     } catch (error) {
         console.error('Error loading teachers:', error);
     }
 }
 
 /**
- * Load students table
+ * Search students on the server (ranked, prefix matching)
  */
-async function loadStudentsTable() {
-    try {
-        const response = await fetch(`http://localhost:8000/api/students?token=${currentToken}`);
+async function searchStudents(query) {
+    if (!query) {
+        searchResults = null;
+        loadStudentsTable();
+        return;
+    }
 
-        if (response.ok) {
-            const students = await response.json();
-            const tbody = document.querySelector('#studentsTable tbody');
-            tbody.innerHTML = '';
-
-            students.forEach(student => {
-                const row = document.createElement('tr');
-                row.innerHTML = `
-                    <td>${student.id}</td>
-                    <td>${student.user.name}</td>
-                    <td>${student.class_name}</td>
-                    <td>${student.roll_no}</td>
-                    <td>
-                        <button class="btn btn-secondary btn-sm" onclick="viewStudent(${student.id})">
-                            <i class="fas fa-eye"></i>
-                        </button>
-
-                        <button class="btn btn-secondary btn-sm" onclick="editStudent(${student.id})">
-                            <i class="fas fa-edit"></i>
-                        </button>
-
-
-                        <button class="btn btn-primary btn-sm" onclick="generateReport(${student.id})">
-                            <i class="fas fa-robot"></i>
-                        </button>
-
-                        <button class="btn btn-danger btn-sm" onclick="deleteStudent(${student.id})">
-                            <i class="fas fa-trash"></i>
-                        </button>
-                    </td>
-                `;
-                tbody.appendChild(row);
-            });
+    try {
+        const response = await fetch(`http://localhost:8000/api/students/search?q=${encodeURIComponent(query)}&token=${currentToken}`);
 
-            console.log(`Loaded ${students.length} students into table`);
+        // Ignore answers to queries the user has already typed past
+        if (response.ok && document.getElementById('studentSearch').value.trim() === query) {
+            searchResults = await response.json();
+            loadStudentsTable();
         }
+    } catch (error) {
+        console.error('Error searching students:', error);
+    }
+}
+
+/**
+ * Render students table from the cache
+ */
+function loadStudentsTable() {
+    try {
+        // While a search is active the table shows its ranked results
+        const students = searchResults || allStudents;
+        const tbody = document.querySelector('#studentsTable tbody');
+        tbody.innerHTML = '';
+
+        students.forEach(student => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td>${student.id}</td>
+                <td>${student.name}</td>
+                <td>${student.class_name}</td>
+                <td>${student.roll_no}</td>
+                <td>
+                    <button class="btn btn-secondary btn-sm" onclick="viewStudent(${student.id})">
+                        <i class="fas fa-eye"></i>
+                    </button>
+
+                    <button class="btn btn-secondary btn-sm" onclick="editStudent(${student.id})">
+                        <i class="fas fa-edit"></i>
+                    </button>
+
+
+                    <button class="btn btn-primary btn-sm" onclick="generateReport(${student.id})">
+                        <i class="fas fa-robot"></i>
+                    </button>
+
+                    <button class="btn btn-danger btn-sm" onclick="deleteStudent(${student.id})">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </td>
+            `;
+            tbody.appendChild(row);
+        });
+
+        console.log(`Loaded ${students.length} students into table`);
 
     } catch (error) {
         console.error('Error loading students:', error);
@@ -808,6 +1002,10 @@ function generateReport(studentId) {
 async function logout() {
     console.log('Logging out...');
 
+    if (eventSource) {
+        eventSource.close();
+    }
+
     try {
         if (currentToken) {
             await fetch(`http://localhost:8000/api/logout?token=${currentToken}`, {
@@ -844,8 +1042,7 @@ async function deleteStudent(studentId) {
 
             showSuccess("Student deleted successfully ✅");
 
-            await loadStudentsTable();
-            await loadDashboard();
+            await syncChanges();
 
         } else {
 
@@ -890,7 +1087,7 @@ async function editStudent(id) {
 
         if (res.ok) {
             showSuccess("Student updated");
-            loadStudentsTable();
+            await syncChanges();
         } else {
             const err = await res.json();
             showError(err.detail);
@@ -921,8 +1118,8 @@ async function deleteTeacher(teacherId) {
 
             showSuccess("Teacher deleted successfully!");
 
-            // Reload table
-            await loadTeachersTable();
+            // Pull the change into the cache and re-render
+            await syncChanges();
 
         } else {
 
@@ -974,7 +1171,7 @@ async function updateTeacher(teacherId) {
         if (response.ok) {
 
             showSuccess("Teacher updated successfully!");
-            await loadTeachersTable();
+            await syncChanges();
 
         } else {
 
@@ -1032,7 +1229,7 @@ async function updateTeacher(id, name, email, password) {
 
         if (response.ok) {
             showSuccess("Teacher updated successfully!");
-            loadTeachersTable();
+            await syncChanges();
         } else {
             const error = await response.json();
             showError(error.detail || "Update failed");
@@ -1064,7 +1261,7 @@ async function deleteTeacher(id) {
 
         if (response.ok) {
             showSuccess("Teacher deleted successfully!");
-            loadTeachersTable();
+            await syncChanges();
         } else {
             const error = await response.json();
             showError(error.detail || "Delete failed");
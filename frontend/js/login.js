@@ -7,7 +7,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const token = localStorage.getItem('token');
     if (token) {
         // Validate token by fetching user info
-        fetch(`http://localhost:8000/api/dashboard?token=${token}`)
+        fetch(`http://localhost:8000/api/me?token=${token}`)
             .then(response => {
                 if (response.ok) {
                     // Token is valid, redirect to dashboard
@@ -25,12 +25,20 @@ document.addEventListener('DOMContentLoaded', function() {
     // Form submission handler
     const loginForm = document.getElementById('loginForm');
     const messageDiv = document.getElementById('message');
+    const schoolInput = document.getElementById('school');
+
+    // A school's login link can carry it: index.html?school=north
+    const schoolParam = new URLSearchParams(window.location.search).get('school');
+    if (schoolParam) {
+        schoolInput.value = schoolParam;
+    }
 
     loginForm.addEventListener('submit', async function(e) {
         e.preventDefault();
         
         const email = document.getElementById('email').value;
         const password = document.getElementById('password').value;
+        const school = schoolInput.value.trim().toLowerCase();
         
         // Show loading state
         messageDiv.className = 'message';
@@ -45,7 +53,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 },
                 body: JSON.stringify({
                     email: email,
-                    password: password
+                    password: password,
+                    // Left out for the main school
+                    school: school || null
                 })
             });
             